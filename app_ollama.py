@@ -1,44 +1,87 @@
 import pandas as pd
 import streamlit as st
-import re
 import os
 from dotenv import load_dotenv
-from haystack import component
-from haystack import Pipeline
+from haystack import tracing
 from haystack.utils import Secret
-from haystack.components.routers import ConditionalRouter
-from haystack.components.builders.prompt_builder import PromptBuilder
-from haystack.dataclasses import ChatMessage
-from haystack_integrations.components.generators.ollama import OllamaGenerator
-from sqlalchemy import create_engine, text, inspect
-import json
+from haystack.dataclasses import ChatMessage, StreamingChunk
+from sqlalchemy import text
 import time 
-import uuid 
+import datetime
+import decimal
 
 # RAG imports
-from haystack_integrations.document_stores.pgvector import PgvectorDocumentStore
-from haystack_integrations.components.retrievers.pgvector import PgvectorEmbeddingRetriever
-from haystack.components.embedders import SentenceTransformersTextEmbedder
-from template.prompt import SQL_PROMPT_TEMPLATE, EXPLAIN_PROMPT_TEMPLATE
-from haystack.components.retrievers import InMemoryBM25Retriever
 from haystack.dataclasses import Document
-from haystack.components.joiners import DocumentJoiner
-from haystack.document_stores.in_memory import InMemoryDocumentStore
+
+from utils.config import (
+    MODEL_NAME, STREAMING_ENABLED,
+    VIOLATIONS_PAGE_SIZE, VIOLATIONS_PAGE_TTL_SECONDS, VIOLATIONS_FILTERS_TTL_SECONDS,
+    RESULT_LOG_MAX_BYTES, RESULT_LOG_MAX_AGE_SECONDS, RESULT_LOG_BATCH_SIZE, RESULT_LOG_FLUSH_INTERVAL,
+    RESULT_LOG_MAX_FIELD_CHARS, RESULT_LOG_MAX_LIST_ITEMS, RESULT_LOG_DROP_FIELDS,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_SIZE,
+    SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_TABLES, RESULT_CACHE_ENABLED,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS, DB_APPLICATION_NAME, BM25_INDEX_PATH, BM25_SYNC_INTERVAL,
+    EMBEDDING_CACHE_ENABLED, KNOWLEDGE_TABLE,
+    SCHEMA_MAX_TABLES, SCHEMA_MAX_COLUMNS, SCHEMA_SAMPLE_VALUES, SCHEMA_CHECK_INTERVAL,
+    SCHEMA_DEFAULT_TABLES, SCHEMA_EXCLUDE_TABLES,
+    HISTORY_TOKEN_BUDGET, HISTORY_RECENT_TURNS, HISTORY_ASSISTANT_MAX_CHARS,
+    SQL_GUARD_ENABLED, SQL_CANDIDATES, SQL_TEMPLATES_ENABLED, SQL_TEMPLATES_PATH, SQL_TEMPLATE_THRESHOLD,
+    TRACING_ENABLED,
+)
+from utils.bm25_index import SyncedBM25Index
+from utils.chat_history import append_chat_messages, get_chat_sessions, load_chat_history
+from utils.db import create_pooled_engine, libpq_connection_string, pool_status
+from utils.history import compact_history, estimate_tokens, is_follow_up
+from utils.jsonl_logger import AsyncJsonlLogger
+from utils.knowledge_store import build_document_store
+from utils.pipeline import (
+    RETRIEVAL_OUTPUTS, SQL_FENCE_RE, build_sql_pipeline, extract_sql, get_text_embedder, retrieval_inputs,
+    run_verified_sql,
+)
+from utils.schema_catalog import SchemaCatalog
+from utils.semantic_cache import SemanticCache
+from utils.table_versions import get_table_versions
+from utils.template_store import TemplateStore, question_entities
+from utils.tracing import SpanRecorder
 
 load_dotenv()
-MODEL_NAME = "hf.co/mradermacher/natural-sql-7b-i1-GGUF:Q4_K_M"
 # Create database connection
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     st.error("Error: DATABASE_URL is not available in the .env file")
     st.stop()
-engine = create_engine(DATABASE_URL)
+
+@st.cache_resource
+def get_engine():
+    """
+    One pooled engine per server process. Streamlit re-executes this script on
+    every interaction, so a module-level create_engine would build a new pool
+    (and new connections) on each rerun.
+    """
+    return create_pooled_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+        application_name=DB_APPLICATION_NAME
+    )
+
+engine = get_engine()
 
 # log file for analytics
 log_path = "output/logs/results.jsonl"
 os.makedirs(os.path.dirname(log_path), exist_ok= True)
 
 def _json_serializer(obj):
+    # Values from query results (timestamps, NUMERIC columns)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
     if isinstance(obj, ChatMessage):
         return {
             "content": obj.text,
@@ -54,248 +97,202 @@ def _json_serializer(obj):
         }
     raise TypeError(f"Object of type '{type(obj).__name__}' is not JSON serializable")
 
+@st.cache_resource
+def get_result_logger(path: str):
+    """One background JSONL writer per log file, shared by all sessions."""
+    return AsyncJsonlLogger(
+        path,
+        serializer=_json_serializer,
+        max_bytes=RESULT_LOG_MAX_BYTES,
+        max_age_seconds=RESULT_LOG_MAX_AGE_SECONDS,
+        batch_size=RESULT_LOG_BATCH_SIZE,
+        flush_interval=RESULT_LOG_FLUSH_INTERVAL,
+        max_field_chars=RESULT_LOG_MAX_FIELD_CHARS,
+        max_list_items=RESULT_LOG_MAX_LIST_ITEMS,
+        drop_fields=RESULT_LOG_DROP_FIELDS
+    )
+
+@st.cache_resource
+def get_span_recorder():
+    """Haystack tracer recording the component spans of each question (one per server process)."""
+    span_recorder = SpanRecorder()
+    tracing.enable_tracing(span_recorder)
+    return span_recorder
+
 def save_result(data: dict, path: str):
     """
-    Saves the dictionary to a JSONL file, correctly handling ChatMessage objects.
+    Queues the dictionary for the background JSONL writer, which handles
+    ChatMessage objects, trims bulky fields and rotates the file.
     """
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(data, default=_json_serializer, ensure_ascii=False) + "\n")
-
-def save_chat_history_to_db(engine, session_id, chat_history):
-    with engine.connect() as connection:
-        with connection.begin() as transaction:
-            try:
-                messsages_to_save = [
-                    {"role": msg.role.name.lower(), "content": msg.text}
-                    for msg in chat_history
-                ]
-
-                connection.execute(text("DELETE FROM chat_messages WHERE session_id = :session_id"), {"session_id": session_id})
-                for message in messsages_to_save:
-                    stmt = text(
-                        """
-                        INSERT INTO chat_messages(session_id, role, content)
-                        VALUES (:session_id, :role, :content)
-                        """
-                    )
-                    connection.execute(stmt, {
-                        "session_id": session_id,
-                        "role": message["role"],
-                        "content": message["content"]
-                    })
-
-            except Exception as e:
-                st.error(f"Error saving chat history: {e}")
-                raise
-
-def get_chat_sessions(engine):
-    with engine.connect() as connection:
-        result = connection.execute(text("SELECT id, start_time FROM chat_sessions ORDER BY start_time DESC"))
-        return result.fetchall()    
+    get_result_logger(path).log(data)
 
-def load_chat_history(engine, session_id):
-    """Load chat message history for a specific chat session."""
-    with engine.connect() as connection:
-        result = connection.execute(
-            text("SELECT role, content FROM chat_messages WHERE session_id = :session_id ORDER BY timestamp ASC"),
-            {"session_id": session_id}
-        )
-        # Convert database results into a list of ChatMessage objects
-        history = []
-        for row in result.fetchall():
-            role, content = row
-            if role == 'user':
-                history.append(ChatMessage.from_user(content))
-            else:
-                history.append(ChatMessage.from_assistant(content))
-        return history
+@st.cache_resource
+def get_schema_catalog():
+    """
+    Tables, columns, keys and sample values of the database, shared by all
+    sessions. Rebuilt only when the DDL changes.
+    """
+    return SchemaCatalog(
+        engine,
+        exclude_tables=SCHEMA_EXCLUDE_TABLES,
+        default_tables=SCHEMA_DEFAULT_TABLES,
+        max_tables=SCHEMA_MAX_TABLES,
+        max_columns=SCHEMA_MAX_COLUMNS,
+        sample_values=SCHEMA_SAMPLE_VALUES,
+        check_interval=SCHEMA_CHECK_INTERVAL
+    )
 
-@st.cache_data
-def get_table_schema(table_name):
+@st.cache_data(ttl=VIOLATIONS_PAGE_TTL_SECONDS)
+def fetch_violations_page(before_id=None, department=None, status=None, page_size=VIOLATIONS_PAGE_SIZE):
     """
-    Fetches the schema of a given table and formats it as a string.
-    Uses the global 'engine' object.
+    Fetches one page of violations, newest first, using keyset pagination on id.
+    Returns the page plus whether an older page exists. The cost is one index
+    range scan of page_size + 1 rows, independent of the table size.
     """
-    try:
-        inspector = inspect(engine)
-        columns = inspector.get_columns(table_name)
-        
-        schema_str = f'Table "{table_name}" has the following columns:\n'
-        for column in columns:
-            col_name = column['name']
-            col_type = str(column['type'])
-            schema_str += f'- {col_name} ({col_type})\n'
-            
-        return schema_str
-    except Exception as e:
-        return f"Could not inspect table '{table_name}'. Error: {e}"
+    conditions = []
+    params = {"limit": page_size + 1}
+    if before_id is not None:
+        conditions.append("id < :before_id")
+        params["before_id"] = before_id
+    if department:
+        conditions.append("department = :department")
+        params["department"] = department
+    if status:
+        conditions.append("status = :status")
+        params["status"] = status
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with engine.connect() as connection:
+        df = pd.read_sql(
+            text(f"SELECT * FROM violations {where} ORDER BY id DESC LIMIT :limit"),
+            connection,
+            params=params
+        )
+    has_more = len(df) > page_size
+    return df.head(page_size), has_more
+
+# Distinct statuses by skipping through violations_status_id_idx: one index probe per
+# status instead of a scan of the whole table
+DISTINCT_STATUSES_SQL = text("""
+    WITH RECURSIVE statuses AS (
+        SELECT MIN(status) AS status FROM violations
+        UNION ALL
+        SELECT (SELECT MIN(v.status) FROM violations v WHERE v.status > s.status)
+        FROM statuses s
+        WHERE s.status IS NOT NULL
+    )
+    SELECT status FROM statuses WHERE status IS NOT NULL
+""")
 
-def fetch_all_violations():
+@st.cache_data(ttl=VIOLATIONS_FILTERS_TTL_SECONDS)
+def fetch_violation_filters():
+    """Department and status options for the table filters."""
     with engine.connect() as connection:
-        df = pd.read_sql("SELECT * FROM violations", connection)
-        return df
-
-
-# Custom components 
-@component
-class MDconverter:
-    def __init__(self):
-        pass
-    @component.output_types(str_queries = list[str])
-    def run(self, replies: list[str]):
-        def extract_sql(text: str) -> str:
-            m = re.search(r"```(?:sql)?\s*(.*?)```", text, flags=re.S)
-            return m.group(1).strip() if m else text.strip()
-        str_queries = []
-        for text_reply in replies:
-            extracted = extract_sql(text_reply)
-            str_queries.append(extracted)
-        return {'str_queries': str_queries}
-    
-@component
-class SQLQuery:
-    def __init__(self, engine):
-        self._engine = engine
-        # No need to keep connection here, will manage in run function
-        # self.connection = self._engine.connect()
-
-    @component.output_types(results=list[str], queries = list[str])
-    def run(self, sql_queries: list[str]):
-        results = []
-        
-        for query in sql_queries:
-            try:
-                # Use 'with' to ensure connection is properly closed
-                with self._engine.connect() as connection:
-                    # Execute query and get results
-                    cursor_result = connection.execute(text(query))
-                    
-                    # Check if query returns rows (e.g., SELECT)
-                    if cursor_result.returns_rows:
-                        # Get all rows and column names
-                        rows = cursor_result.fetchall()
-                        columns = cursor_result.keys()
-                        # Create DataFrame from results
-                        result_df = pd.DataFrame(rows, columns=columns)
-                        results.append(result_df.to_string())
-                    else:
-                        # For queries that don't return rows (e.g., UPDATE, INSERT)
-                        results.append(f"Query executed successfully, {cursor_result.rowcount} rows affected.")
+        departments = connection.execute(text("SELECT department_name FROM departments ORDER BY department_name")).scalars().all()
+        statuses = connection.execute(DISTINCT_STATUSES_SQL).scalars().all()
+    return departments, statuses
 
-            except Exception as e:
-                results.append(f"SQL Error: {str(e)}")
-        return {'results': results, 'queries': sql_queries}
 
 @st.cache_resource
-def setup_pipeline():
+def get_document_store():
     # RAG components - Pgvector for semantic search
-    document_store = PgvectorDocumentStore(
-        connection_string= Secret.from_env_var("DATABASE_URL"),
-        table_name="haystack_documents_v2",
-        embedding_dimension = 384 
+    # The store keeps its own psycopg 3 connection (one per process, outside the
+    # SQLAlchemy pool), opened with the same statement timeout and application name
+    # The HNSW index is built by scripts/embed_knowledge.py, never here under the statement
+    # timeout; semantic retrieval goes through the pooled engine (see utils/knowledge_store.py)
+    document_store = build_document_store(
+        Secret.from_token(libpq_connection_string(DATABASE_URL, DB_STATEMENT_TIMEOUT_MS, DB_APPLICATION_NAME)),
+        manage_index=False,
     )
-    text_embedder = SentenceTransformersTextEmbedder(model="all-MiniLM-L6-v2")
-    
-    # Semantic retriever (reduced from 3 to 2 since we'll add BM25)
-    semantic_retriever = PgvectorEmbeddingRetriever(
-        document_store=document_store, 
-        top_k=2
+    return document_store
+
+@st.cache_resource
+def get_bm25_index():
+    """
+    BM25 index loaded from its disk snapshot. Only a missing snapshot costs a
+    full read of the knowledge table; otherwise the sync runs in the background.
+    """
+    bm25_index = SyncedBM25Index(
+        engine,
+        get_document_store(),
+        path=BM25_INDEX_PATH,
+        table_name=KNOWLEDGE_TABLE,
+        sync_interval=BM25_SYNC_INTERVAL
     )
+    if bm25_index.load():
+        bm25_index.maybe_sync()
+    else:
+        bm25_index.sync()
+    return bm25_index
+
+@st.cache_resource
+def setup_pipeline():
+    # Built in utils/pipeline.py so benchmarks can run the same pipeline outside Streamlit
+    return build_sql_pipeline(engine, get_document_store(), get_bm25_index(), model_name=MODEL_NAME)
 
-    # NEW: BM25 setup
-    # Load documents from pgvector into memory for BM25
-    all_docs = document_store.filter_documents()
-    bm25_store = InMemoryDocumentStore()
-    bm25_store.write_documents(all_docs)
-    
-    bm25_retriever = InMemoryBM25Retriever(
-        document_store=bm25_store,
-        top_k=2
+@st.cache_resource
+def get_semantic_cache():
+    """One answer cache shared by every session of this Streamlit server."""
+    return SemanticCache(
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_size=SEMANTIC_CACHE_MAX_SIZE,
+        ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS
     )
-    
-    # NEW: Joiner with deduplication
-    joiner = DocumentJoiner(
-        join_mode="reciprocal_rank_fusion",  # This already deduplicates by default
-        top_k=3,  # Limit final output to 3 documents
-        sort_by_score=True  # Ensure best documents come first
+
+# Pipeline outputs replayed on a semantic cache hit
+CACHED_OUTPUTS = ["router", "error_router", "sql_querier", "answer_router", "llm_explainer"]
+
+@st.cache_resource
+def get_template_store():
+    """Verified SQL templates, with example questions embedded once per server."""
+    template_store = TemplateStore(
+        SQL_TEMPLATES_PATH,
+        embedder=get_text_embedder(setup_pipeline()),
+        engine=engine,
+        threshold=SQL_TEMPLATE_THRESHOLD
     )
+    template_store.warm_up()
+    return template_store
 
-    # Existing components
-    sql_query = SQLQuery(engine)
-    prompt = PromptBuilder(template=SQL_PROMPT_TEMPLATE)
-    llm = OllamaGenerator(model = MODEL_NAME, keep_alive= -1)
-    converter = MDconverter()
-
-    explain_prompt = PromptBuilder(template=EXPLAIN_PROMPT_TEMPLATE)
-    llm_explainer = OllamaGenerator(model= MODEL_NAME)
-
-    routes = [
-        {
-            "condition": "{{'no_answer' not in str_queries[0].lower()}}",
-            "output": "{{[str_queries[0]]}}",
-            "output_name": "sql",
-            "output_type": list[str],
-        },
-        {
-            "condition": "{{'no_answer' in str_queries[0].lower()}}",
-            "output": "I cannot answer this question based on the available data. The database contains information about violations with columns for id, employee_name, department, violation_type, area, violation_time, and status. Please try asking a question related to these fields.",
-            "output_name": "no_answer",
-            "output_type": str,
-        },
-    ]
-    router = ConditionalRouter(routes)
-
-    error_routes = [
-        {
-            "condition": "{{'SQL Error:' in results[0]}}",
-            "output": "{{results[0]}}",
-            "output_name": "sql_error",
-            "output_type": str,
-        },
-        {
-            "condition": "{{'SQL Error:' not in results[0]}}",
-            "output": "{{results}}",
-            "output_name": "results_ok",
-            "output_type": list[str],
-        },
-    ]
-    error_router = ConditionalRouter(error_routes)
-
-    # Build pipeline
-    sql_pipeline = Pipeline()
-    
-    # Add RAG components
-    sql_pipeline.add_component('text_embedder', text_embedder)
-    sql_pipeline.add_component('semantic_retriever', semantic_retriever)
-    sql_pipeline.add_component('bm25_retriever', bm25_retriever)  # NEW
-    sql_pipeline.add_component('joiner', joiner)  # NEW
-    
-    # Add existing components
-    sql_pipeline.add_component('prompt', prompt)
-    sql_pipeline.add_component('llm', llm)
-    sql_pipeline.add_component('converter', converter)
-    sql_pipeline.add_component('router', router)
-    sql_pipeline.add_component('sql_querier', sql_query)
-    sql_pipeline.add_component('error_router', error_router)
-    sql_pipeline.add_component('explain_prompt', explain_prompt)
-    sql_pipeline.add_component('llm_explainer', llm_explainer)
-
-    # Connect hybrid retrieval (MODIFIED)
-    sql_pipeline.connect("text_embedder.embedding", "semantic_retriever.query_embedding")
-    sql_pipeline.connect("semantic_retriever.documents", "joiner.documents")  # NEW
-    sql_pipeline.connect("bm25_retriever.documents", "joiner.documents")      # NEW
-    sql_pipeline.connect("joiner.documents", "prompt.documents")  # Changed from semantic_retriever
-
-    # Connect existing components
-    sql_pipeline.connect("prompt.prompt", "llm.prompt")
-    sql_pipeline.connect("llm.replies", "converter.replies")
-    sql_pipeline.connect("converter.str_queries", "router.str_queries")
-    sql_pipeline.connect("router.sql", "sql_querier.sql_queries")
-    sql_pipeline.connect("sql_querier.results", "error_router.results")
-    sql_pipeline.connect("error_router.results_ok", "explain_prompt.result")
-    sql_pipeline.connect("explain_prompt.prompt", "llm_explainer.prompt")
-
-    return sql_pipeline
+class StreamingChatView:
+    """
+    Writes the generated SQL and the explainer tokens into one assistant
+    message while the pipeline is still running, and records when the
+    user first saw something.
+    """
+    def __init__(self, start_time: float):
+        self.start_time = start_time
+        self.time_to_first_token = None
+        self.container = st.chat_message("assistant")
+        with self.container:
+            self.sql_slot = st.empty()
+            self.answer_slot = st.empty()
+        self._sql_text = ""
+        self._sql_shown = False
+        self._answer_text = ""
+
+    def _mark_visible(self):
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.time() - self.start_time
+
+    def on_sql_chunk(self, chunk: StreamingChunk):
+        if self._sql_shown:
+            return
+        self._sql_text += chunk.content
+        # A fenced block can be shown as soon as it closes, a bare reply only once generation is done
+        m = SQL_FENCE_RE.search(self._sql_text)
+        if m or chunk.meta.get("done"):
+            sql = extract_sql(self._sql_text)
+            if sql and "no_answer" not in sql.lower():
+                self._sql_shown = True
+                self._mark_visible()
+                self.sql_slot.code(sql, language="sql")
+
+    def on_answer_chunk(self, chunk: StreamingChunk):
+        if not chunk.content:
+            return
+        self._answer_text += chunk.content
+        self._mark_visible()
+        self.answer_slot.markdown(self._answer_text + "▌")
 
 # Streamlit UI
 st.title("Violation Tracking Table")
@@ -321,6 +318,7 @@ with st.sidebar:
                 if st.button(f"Chat from {session_time_str}", key=session_id, use_container_width=True):
                     st.session_state.session_id = session_id
                     st.session_state.chat_history = load_chat_history(engine, session_id)
+                    st.session_state.persisted_count = len(st.session_state.chat_history)
                     st.rerun()
     except Exception as e:
         st.error(f"Error loading chat history: {e}")
@@ -332,11 +330,37 @@ if "session_id" not in st.session_state:
             result = connection.execute(text("INSERT INTO chat_sessions (start_time) VALUES (DEFAULT) RETURNING id"))
             st.session_state.session_id = result.scalar_one()
             st.session_state.chat_history = []
+            # Number of chat_history messages already written to chat_messages
+            st.session_state.persisted_count = 0
 st.write("Current Violations in the System")
 
-violations_df = fetch_all_violations()
+departments, statuses = fetch_violation_filters()
+filter_department_col, filter_status_col = st.columns(2)
+filter_department = filter_department_col.selectbox("Department", ["All", *departments])
+filter_status = filter_status_col.selectbox("Status", ["All", *statuses])
+filters = (filter_department, filter_status)
+# Stack of page cursors (the smallest id of each previous page); reset when the filters change
+if st.session_state.get("violations_filters") != filters:
+    st.session_state.violations_filters = filters
+    st.session_state.violations_cursors = []
+
+cursors = st.session_state.violations_cursors
+violations_df, has_more = fetch_violations_page(
+    before_id=cursors[-1] if cursors else None,
+    department=None if filter_department == "All" else filter_department,
+    status=None if filter_status == "All" else filter_status,
+)
 st.dataframe(violations_df, use_container_width=True)
 
+prev_col, page_col, next_col = st.columns([1, 2, 1])
+if prev_col.button("Previous", disabled=not cursors):
+    cursors.pop()
+    st.rerun()
+page_col.caption(f"Page {len(cursors) + 1}")
+if next_col.button("Next", disabled=not has_more):
+    cursors.append(int(violations_df["id"].iloc[-1]))
+    st.rerun()
+
 st.subheader("Ask questions about violations")
 
 # Display existing chat history
@@ -354,44 +378,171 @@ if user_question:
     with st.spinner("Processing..."):
         try:
             start_time = time.time()
+            # Spans of this question only, written to results.jsonl under 'trace'
+            span_recorder = get_span_recorder() if TRACING_ENABLED else None
+            trace = span_recorder.start_trace() if span_recorder else None
             sql_pipeline = setup_pipeline()
-            history_payload = [
-                {"role": m.role.name.lower(), "content": m.text} if isinstance(m, ChatMessage) else m
-                for m in st.session_state.chat_history
-            ]
-            result = sql_pipeline.run({
-                "text_embedder": {"text": user_question},
-                "bm25_retriever": {"query": user_question},  # NEW: Add BM25 query input
-                "prompt": {
-                    "question": user_question,
-                    "schema": get_table_schema("violations"),
-                    "history": history_payload
-                },
-                "explain_prompt": {"question": user_question},
-            }, include_outputs_from=["llm_explainer", "sql_querier", "llm", "prompt", "router", "error_router", "explain_prompt", "joiner"])  # Add "joiner"
+            # Picks up knowledge added since the last sync, without blocking this question
+            get_bm25_index().maybe_sync()
+            stream_view = StreamingChatView(start_time) if STREAMING_ENABLED else None
+
+            # Semantic cache: rephrasings of an already answered question skip the LLM calls.
+            # The cache is keyed on the question alone, so follow-ups that build on earlier turns bypass it.
+            cache_hit = None
+            question_embedding = None
+            follow_up = is_follow_up(user_question, st.session_state.chat_history[:-1])
+            if SEMANTIC_CACHE_ENABLED:
+                semantic_cache = get_semantic_cache()
+                with tracing.tracer.trace("semantic_cache"):
+                    question_embedding = get_text_embedder(sql_pipeline).run(text=user_question)["embedding"]
+                    # Department, status, date, ... values must match too, not only the embedding
+                    cache_literals = (get_template_store().literals(user_question) if SQL_TEMPLATES_ENABLED
+                                      else frozenset(question_entities(user_question)))
+                    if not follow_up:
+                        data_version = get_table_versions(engine, SEMANTIC_CACHE_TABLES)
+                        cache_hit = semantic_cache.lookup(question_embedding, data_version, cache_literals)
+
+            # Recurring questions with a verified SQL template skip the SQL generation
+            template_match = None
+            if not cache_hit and SQL_TEMPLATES_ENABLED:
+                with tracing.tracer.trace("sql_templates"):
+                    template_match = get_template_store().match(user_question, question_embedding)
+
+            if cache_hit:
+                result = dict(cache_hit["payload"])
+            elif template_match and template_match["hit"]:
+                result = run_verified_sql(sql_pipeline, user_question, template_match["sql"], stream_view)
+            else:
+                # Recent turns only, assistant replies reduced to their SQL and a short answer
+                history_payload, history_stats = compact_history(
+                    st.session_state.chat_history,
+                    question=user_question,
+                    budget_tokens=HISTORY_TOKEN_BUDGET,
+                    recent_turns=HISTORY_RECENT_TURNS,
+                    max_assistant_chars=HISTORY_ASSISTANT_MAX_CHARS
+                )
+                # Only the tables related to the question go into the prompt
+                schema_text, schema_tables = get_schema_catalog().render(user_question)
+                pipeline_inputs = {
+                    **retrieval_inputs(user_question, question_embedding),
+                    "prompt": {
+                        "question": user_question,
+                        "schema": schema_text,
+                        "history": history_payload
+                    },
+                    "explain_prompt": {"question": user_question},
+                }
+                if stream_view:
+                    pipeline_inputs["llm"] = {"streaming_callback": stream_view.on_sql_chunk}
+                    pipeline_inputs["llm_explainer"] = {"streaming_callback": stream_view.on_answer_chunk}
+                result = sql_pipeline.run(pipeline_inputs, include_outputs_from=["llm_explainer", "sql_querier", "llm", "prompt", "router", "error_router", "answer_router", "explain_prompt", *RETRIEVAL_OUTPUTS])
+                result['schema'] = {"tables": schema_tables, "chars": len(schema_text)}
+                # Estimated SQL prompt size with the compacted history and with the full one
+                prompt_tokens = estimate_tokens(result["prompt"]["prompt"])
+                result['history'] = {
+                    **history_stats,
+                    "prompt_tokens_after": prompt_tokens,
+                    "prompt_tokens_before": prompt_tokens - history_stats["tokens_after"] + history_stats["tokens_before"],
+                }
+            if not cache_hit:
+                # Only successful answers are worth replaying
+                answered = result.get("answer_router", {}).get("answer") or result.get("llm_explainer", {}).get("replies")
+                if SEMANTIC_CACHE_ENABLED and answered and not follow_up:
+                    semantic_cache.store(
+                        user_question, question_embedding, data_version,
+                        {name: result[name] for name in CACHED_OUTPUTS if name in result},
+                        cache_literals
+                    )
+            if SEMANTIC_CACHE_ENABLED:
+                result['semantic_cache'] = {
+                    "hit": cache_hit is not None,
+                    "skipped": "follow_up" if follow_up else None,
+                    "literals": sorted(cache_literals),
+                    "matched_question": cache_hit["question"] if cache_hit else None,
+                    "similarity": cache_hit["similarity"] if cache_hit else None,
+                    **semantic_cache.stats()
+                }
+            if template_match is not None:
+                result['sql_templates'] = {
+                    "hit": template_match["hit"],
+                    "template": template_match.get("template") or template_match.get("nearest"),
+                    "reason": template_match.get("reason"),
+                    "similarity": template_match.get("similarity"),
+                    "slots": template_match.get("slots"),
+                    **get_template_store().stats()
+                }
+            if RESULT_CACHE_ENABLED:
+                result['result_cache'] = sql_pipeline.get_component("sql_querier").result_cache.stats()
+            if EMBEDDING_CACHE_ENABLED:
+                result['embedding_cache'] = get_text_embedder(sql_pipeline).stats()
+            if SQL_CANDIDATES > 1:
+                result['sql_candidates'] = sql_pipeline.get_component("llm").stats()
+            if SQL_GUARD_ENABLED:
+                result['sql_guard'] = sql_pipeline.get_component("sql_querier").guard.stats()
+            result['db_pool'] = pool_status(engine)
+            result['bm25_index'] = get_bm25_index().last_stats
             end_time = time.time()
             execution_time = end_time - start_time
             result['execution_time'] = execution_time
+            if trace:
+                result['trace'] = span_recorder.finish_trace(trace)
+            # Without streaming nothing is visible before the pipeline finishes
+            if stream_view and stream_view.time_to_first_token is not None:
+                result['time_to_first_token'] = stream_view.time_to_first_token
+            else:
+                result['time_to_first_token'] = execution_time
             st.session_state.last_result = result
             assistant_text = None
+            # SQL of the turn, kept with the reply so later prompts can show it without the prose
+            assistant_meta = {}
+            if stream_view:
+                # Final answer replaces the streamed text inside the same message
+                stream_view.answer_slot.empty()
+                assistant_box = stream_view.container
+            else:
+                assistant_box = st.chat_message("assistant")
             if "no_answer" in result["router"]:
                 assistant_text = result["router"]["no_answer"]
-                with st.chat_message("assistant"):
+                with assistant_box:
                     st.warning(assistant_text)
             elif "sql_error" in result["error_router"]:
                 assistant_text = f"An error occurred while executing SQL:\n{result['error_router']['sql_error']}"
-                with st.chat_message("assistant"):
+                assistant_meta = {"sql": result['sql_querier']['queries'][0]}
+                if stream_view:
+                    stream_view.sql_slot.empty()
+                with assistant_box:
                     st.error(assistant_text)
                     st.code(result['sql_querier']['queries'][0], language='sql')
-            elif result["llm_explainer"]["replies"]:
-                assistant_text = result['llm_explainer']['replies'][0]
-                with st.chat_message("assistant"):
+            elif result.get("answer_router", {}).get("answer") or result.get("llm_explainer", {}).get("replies"):
+                fast_answer = result.get("answer_router", {}).get("answer")
+                # Fast path: templated answer, otherwise the explainer's reply
+                assistant_text = fast_answer or result['llm_explainer']['replies'][0]
+                assistant_meta = {"sql": result['sql_querier']['queries'][0]}
+                with assistant_box:
                     st.success(assistant_text)
+                    if result["sql_querier"]["truncated"][0]:
+                        shown = len(result["sql_querier"]["tables"][0]["rows"])
+                        st.caption(f"Large result: the answer is based on the first {shown} of {result['sql_querier']['row_counts'][0]:,} rows.")
+                    if cache_hit:
+                        st.caption(f"Answered from cache (similar to \"{cache_hit['question']}\", similarity {cache_hit['similarity']:.2f})")
+                    elif template_match and template_match["hit"]:
+                        st.caption(f"Answered with a verified query (\"{template_match['matched_question']}\")")
             if assistant_text:
-                st.session_state.chat_history.append(ChatMessage.from_assistant(assistant_text))
-            save_chat_history_to_db(engine, st.session_state.session_id, st.session_state.chat_history)
+                st.session_state.chat_history.append(ChatMessage.from_assistant(assistant_text, meta=assistant_meta))
+            try:
+                st.session_state.persisted_count = append_chat_messages(
+                    engine,
+                    st.session_state.session_id,
+                    st.session_state.chat_history,
+                    st.session_state.get("persisted_count", 0)
+                )
+            except Exception as e:
+                st.error(f"Error saving chat history: {e}")
+                raise
             # Attach chat history snapshot for logging (serializable via custom serializer)
-            result['chat_history'] = st.session_state.chat_history
+            # Copied, since the logger serializes it later on its own thread
+            result['chat_history'] = list(st.session_state.chat_history)
+            result['question'] = user_question
             save_result(result, log_path)
         except Exception as e:
             err_text = f"Error: {str(e)}"
@@ -0,0 +1,98 @@
+"""
+Compares the per-turn write cost of the two chat history persistence strategies:
+
+- rewrite: the previous save_chat_history_to_db, which deleted the session's
+  messages and re-inserted the whole history, one INSERT per message
+- append: utils.chat_history.append_chat_messages, which inserts only the new
+  messages of the turn in one statement
+
+Usage: python scripts/benchmark_chat_history.py [--turns 50] [--message-chars 400]
+Each strategy writes into its own throwaway chat session, deleted afterwards.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from haystack.dataclasses import ChatMessage
+from sqlalchemy import create_engine, text
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.chat_history import append_chat_messages  # noqa: E402
+
+load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise RuntimeError("Missing DATABASE_URL in .env")
+
+engine = create_engine(DATABASE_URL, future=True)
+
+
+def rewrite_chat_history(engine, session_id, chat_history):
+    """The original strategy: delete everything, then one INSERT per message."""
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM chat_messages WHERE session_id = :session_id"), {"session_id": session_id})
+        for msg in chat_history:
+            connection.execute(
+                text("INSERT INTO chat_messages(session_id, role, content) VALUES (:session_id, :role, :content)"),
+                {"session_id": session_id, "role": msg.role.name.lower(), "content": msg.text}
+            )
+
+
+def create_session() -> str:
+    with engine.begin() as connection:
+        return connection.execute(text("INSERT INTO chat_sessions (start_time) VALUES (DEFAULT) RETURNING id")).scalar_one()
+
+
+def delete_session(session_id):
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM chat_sessions WHERE id = :id"), {"id": session_id})
+
+
+def run_strategy(name: str, turns: int, message_chars: int) -> list[float]:
+    session_id = create_session()
+    history = []
+    persisted_count = 0
+    timings = []
+    try:
+        for turn in range(turns):
+            history.append(ChatMessage.from_user(f"Question {turn}: " + "q" * (message_chars // 4)))
+            history.append(ChatMessage.from_assistant(f"Answer {turn}: " + "a" * message_chars))
+            start = time.perf_counter()
+            if name == "rewrite":
+                rewrite_chat_history(engine, session_id, history)
+            else:
+                persisted_count = append_chat_messages(engine, session_id, history, persisted_count)
+            timings.append(time.perf_counter() - start)
+    finally:
+        delete_session(session_id)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--message-chars", type=int, default=400)
+    args = parser.parse_args()
+
+    results = {name: run_strategy(name, args.turns, args.message_chars) for name in ("rewrite", "append")}
+
+    # Average write time per turn, bucketed by conversation length
+    bucket = max(1, args.turns // 10)
+    print(f"{'turns':>12} | {'rewrite ms/turn':>16} | {'append ms/turn':>15} | {'rows written (rewrite/append)':>30}")
+    for start in range(0, args.turns, bucket):
+        end = min(start + bucket, args.turns)
+        rewrite_ms = 1000 * sum(results["rewrite"][start:end]) / (end - start)
+        append_ms = 1000 * sum(results["append"][start:end]) / (end - start)
+        # Rows per turn: rewrite re-inserts 2 * turn messages, append always writes 2
+        rows = f"{2 * end}/2"
+        print(f"{f'{start + 1}-{end}':>12} | {rewrite_ms:>16.2f} | {append_ms:>15.2f} | {rows:>30}")
+
+    for name, timings in results.items():
+        print(f"{name}: total {sum(timings):.3f}s over {args.turns} turns")
+
+
+if __name__ == "__main__":
+    main()
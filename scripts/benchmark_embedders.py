@@ -0,0 +1,124 @@
+"""
+Compares the embedder backends of utils/embedders.py on this machine:
+
+- query latency: p50/p95 of embedding one question of output/test_queries.md
+- indexing throughput: documents/s embedding data/knowledge_v2.json
+- vector tolerance: cosine similarity between torch and onnx-int8 vectors of the same text
+- retrieval recall@k: overlap of the top-k knowledge documents per question with
+  the torch results, for onnx-int8 end to end and for onnx-int8 questions
+  searched against torch-indexed documents (an index built before switching)
+
+Usage: python scripts/benchmark_embedders.py [--top-k 3] [--repeats 5]
+Runs fully in memory, no database needed.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from haystack import Document
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+from utils.embedders import EMBEDDING_BACKENDS, build_document_embedder, build_text_embedder  # noqa: E402
+
+QUESTION_RE = re.compile(r"^\d+\.\s+(.+)$")
+
+
+def load_questions(path: Path) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [m.group(1).strip() for m in map(QUESTION_RE.match, f) if m]
+
+
+def load_documents(path: Path) -> list[Document]:
+    with open(path, encoding="utf-8") as f:
+        return [Document(id=item["id"], content=item["content"]) for item in json.load(f)]
+
+
+def normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def top_k(query_vectors: np.ndarray, doc_vectors: np.ndarray, k: int) -> list[set]:
+    scores = query_vectors @ doc_vectors.T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+
+def recall(reference: list[set], candidate: list[set]) -> float:
+    return float(np.mean([len(ref & cand) / len(ref) for ref, cand in zip(reference, candidate)]))
+
+
+def run_backend(backend: str, questions: list[str], documents: list[Document], repeats: int) -> dict:
+    text_embedder = build_text_embedder(backend, progress_bar=False)
+    document_embedder = build_document_embedder(backend, progress_bar=False)
+    start = time.perf_counter()
+    text_embedder.warm_up()
+    document_embedder.warm_up()
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    query_vectors = []
+    for repeat in range(repeats + 1):
+        for question in questions:
+            start = time.perf_counter()
+            embedding = text_embedder.run(text=question)["embedding"]
+            elapsed = time.perf_counter() - start
+            if repeat == 0:
+                # First pass warms caches and provides the vectors
+                query_vectors.append(embedding)
+            else:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        embedded = document_embedder.run(documents=[Document(id=d.id, content=d.content) for d in documents])["documents"]
+    index_seconds = (time.perf_counter() - start) / repeats
+
+    return {
+        "load_seconds": load_seconds,
+        "query_p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "query_p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "docs_per_second": len(documents) / index_seconds,
+        "query_vectors": normalize(query_vectors),
+        "doc_vectors": normalize([d.embedding for d in embedded]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=str(ROOT / "output" / "test_queries.md"))
+    parser.add_argument("--knowledge", default=str(ROOT / "data" / "knowledge_v2.json"))
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    questions = load_questions(Path(args.questions))
+    documents = load_documents(Path(args.knowledge))
+    print(f"{len(questions)} questions, {len(documents)} documents, top_k={args.top_k}\n")
+
+    results = {backend: run_backend(backend, questions, documents, args.repeats) for backend in EMBEDDING_BACKENDS}
+
+    print(f"{'backend':>10} | {'load s':>7} | {'query p50 ms':>12} | {'query p95 ms':>12} | {'index docs/s':>12}")
+    for backend, r in results.items():
+        print(f"{backend:>10} | {r['load_seconds']:>7.2f} | {r['query_p50_ms']:>12.2f} | {r['query_p95_ms']:>12.2f} | {r['docs_per_second']:>12.1f}")
+
+    torch_r, onnx_r = results["torch"], results["onnx-int8"]
+    query_cos = np.sum(torch_r["query_vectors"] * onnx_r["query_vectors"], axis=1)
+    doc_cos = np.sum(torch_r["doc_vectors"] * onnx_r["doc_vectors"], axis=1)
+    print(f"\nvector dims: torch {torch_r['doc_vectors'].shape[1]}, onnx-int8 {onnx_r['doc_vectors'].shape[1]}")
+    print(f"cosine(torch, onnx-int8): questions min {query_cos.min():.4f} mean {query_cos.mean():.4f}, "
+          f"documents min {doc_cos.min():.4f} mean {doc_cos.mean():.4f}")
+
+    reference = top_k(torch_r["query_vectors"], torch_r["doc_vectors"], args.top_k)
+    onnx_only = top_k(onnx_r["query_vectors"], onnx_r["doc_vectors"], args.top_k)
+    mixed = top_k(onnx_r["query_vectors"], torch_r["doc_vectors"], args.top_k)
+    print(f"recall@{args.top_k} vs torch: onnx-int8 index+questions {recall(reference, onnx_only):.3f}, "
+          f"onnx-int8 questions on torch index {recall(reference, mixed):.3f}")
+
+
+if __name__ == "__main__":
+    main()
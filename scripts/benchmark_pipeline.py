@@ -0,0 +1,342 @@
+"""
+Runs the questions of output/test_queries.md through the app's pipeline (utils/pipeline.py)
+against a seeded database and writes machine-readable results, so that changes between
+commits show up as latency, validity or correctness regressions.
+
+Models:
+- fake: a deterministic stand-in for OllamaGenerator that replies with the reference SQL
+  of data/benchmark_queries.json. It measures the pipeline without the LLM: retrieval,
+  prompt building, SQL execution, routing.
+- any Ollama model name, e.g. hf.co/mradermacher/natural-sql-7b-i1-GGUF:Q4_K_M
+
+For every question the per-component time is recorded with utils/tracing.py. SQL is
+valid when it executes, and correct when its rows match those of the reference SQL
+(column order and names ignored; "relaxed" also accepts extra columns). Questions whose
+reference is null must be answered with no_answer.
+
+Usage: python scripts/benchmark_pipeline.py [--models fake <ollama model> ...] [--questions 25] [--repeat 3]
+                                            [--no-seed] [--baseline output/benchmarks/<earlier run>.json]
+The database is BENCHMARK_DATABASE_URL. It is reset with scripts/setup_db.py and the
+knowledge base is indexed into it, unless --no-seed is given; with --no-seed DATABASE_URL
+is used when BENCHMARK_DATABASE_URL is not set. Results go to output/benchmarks/.
+"""
+import argparse
+import datetime
+import decimal
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from haystack import Document, component, tracing
+from haystack.components.writers import DocumentWriter
+from haystack.dataclasses import StreamingChunk
+from haystack.utils import Secret
+from sqlalchemy import text
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "scripts"))
+from setup_db import setup_database  # noqa: E402
+from utils.bm25_index import SyncedBM25Index  # noqa: E402
+from utils.config import (  # noqa: E402
+    KNOWLEDGE_TABLE, SCHEMA_DEFAULT_TABLES, SCHEMA_EXCLUDE_TABLES, SCHEMA_MAX_COLUMNS, SCHEMA_MAX_TABLES,
+)
+from utils.db import create_pooled_engine, libpq_connection_string  # noqa: E402
+from utils.embedders import build_document_embedder  # noqa: E402
+from utils.knowledge_store import build_document_store  # noqa: E402
+from utils.pipeline import RETRIEVAL_OUTPUTS, build_sql_pipeline, retrieval_inputs  # noqa: E402
+from utils.schema_catalog import SchemaCatalog  # noqa: E402
+from utils.tracing import SpanRecorder  # noqa: E402
+
+QUESTION_RE = re.compile(r"^\d+\.\s+(.+)$")
+OUTPUT_DIR = ROOT / "output" / "benchmarks"
+
+load_dotenv()
+
+
+@component
+class ReplayGenerator:
+    """
+    Deterministic stand-in for OllamaGenerator: replies with the text stored for
+    the (longest) known question found in the prompt, or `default_reply`.
+    """
+
+    def __init__(self, replies: dict[str, str], default_reply: str):
+        self.replies = replies
+        self.default_reply = default_reply
+        self._questions = sorted(replies, key=len, reverse=True)
+
+    @component.output_types(replies=list[str], meta=list[dict])
+    def run(self, prompt: str, generation_kwargs: dict | None = None, *, streaming_callback=None):
+        reply = next((self.replies[q] for q in self._questions if q in prompt), self.default_reply)
+        if streaming_callback is not None:
+            streaming_callback(StreamingChunk(reply, {"done": True}))
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": max(1, len(reply) // 4)}
+        return {"replies": [reply], "meta": [{"model": "fake", "done": True, "usage": usage}]}
+
+
+def load_questions(path: Path, limit: int) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [m.group(1).strip() for m in map(QUESTION_RE.match, f) if m][:limit]
+
+
+def load_references(path: Path) -> dict[str, str | None]:
+    with open(path, encoding="utf-8") as f:
+        return {item["question"]: item["sql"] for item in json.load(f)}
+
+
+def index_knowledge(connection_string: Secret, path: Path):
+    """Same documents as scripts/embed_knowledge.py, written to the benchmark database."""
+    store = build_document_store(connection_string, recreate_table=True)
+    with open(path, encoding="utf-8") as f:
+        documents = [
+            Document(id=item["id"], content=item["content"],
+                     meta={"type": item["type"], "category": item["category"], "keywords": item.get("keywords", [])})
+            for item in json.load(f)
+        ]
+    embedder = build_document_embedder()
+    embedder.warm_up()
+    DocumentWriter(document_store=store).run(documents=embedder.run(documents=documents)["documents"])
+    return store
+
+
+def _normalize(value):
+    if isinstance(value, (float, decimal.Decimal)):
+        return str(round(float(value), 2))
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def compare_results(reference_rows: list, columns_rows: list) -> tuple[bool, bool]:
+    """(exact, relaxed): same rows ignoring column order, or every reference column present."""
+    reference = [tuple(_normalize(v) for v in row) for row in reference_rows]
+    generated = [tuple(_normalize(v) for v in row) for row in columns_rows]
+    exact = Counter(tuple(sorted(row)) for row in reference) == Counter(tuple(sorted(row)) for row in generated)
+    if len(reference) != len(generated):
+        return exact, False
+    generated_columns = [sorted(column) for column in zip(*generated)] if generated else []
+    relaxed = all(sorted(column) in generated_columns for column in zip(*reference)) if reference else not generated
+    return exact, relaxed
+
+
+def tokens_per_second(meta: dict, seconds: float) -> tuple[int, float | None]:
+    tokens = (meta.get("usage") or {}).get("completion_tokens", 0)
+    # Ollama reports its own generation time, without prompt evaluation and transfer
+    duration = meta.get("eval_duration", 0) / 1e9 or seconds
+    return tokens, tokens / duration if tokens and duration else None
+
+
+def stage_times(trace: dict) -> dict[str, float]:
+    """Milliseconds per span name, repeated runs of a component ("llm#2") added up."""
+    stages = {}
+    for name, span in trace["spans"].items():
+        name = name.split("#")[0]
+        stages[name] = stages.get(name, 0.0) + span["ms"]
+    return stages
+
+
+def run_question(sql_pipeline, recorder: SpanRecorder, catalog: SchemaCatalog, engine, question: str,
+                 reference: str | None, has_reference: bool) -> dict:
+    schema_text, _ = catalog.render(question)
+    inputs = {
+        **retrieval_inputs(question),
+        "prompt": {"question": question, "schema": schema_text, "history": []},
+        "explain_prompt": {"question": question},
+    }
+    trace = recorder.start_trace()
+    start = time.perf_counter()
+    error = None
+    try:
+        result = sql_pipeline.run(inputs, include_outputs_from=["llm", "router", "sql_querier", "llm_explainer",
+                                                                *RETRIEVAL_OUTPUTS])
+    except Exception as e:
+        result, error = {}, str(e)
+    total = time.perf_counter() - start
+    stages = stage_times(recorder.finish_trace(trace))
+
+    no_answer = "no_answer" in result.get("router", {})
+    querier = result.get("sql_querier", {})
+    sql = querier.get("queries", [None])[0]
+    table = querier.get("tables", [None])[0]
+    valid = table is not None
+
+    correct = relaxed = None
+    if has_reference:
+        if reference is None:
+            correct = relaxed = no_answer
+        elif not valid:
+            correct = relaxed = False
+        elif not table["truncated"]:
+            with engine.connect() as connection:
+                expected = connection.execute(text(reference)).fetchall()
+            correct, relaxed = compare_results(expected, table["rows"])
+
+    sql_tokens, sql_tps = tokens_per_second((result.get("llm", {}).get("meta") or [{}])[0], stages.get("llm", 0.0) / 1000)
+    explain_tokens, explain_tps = tokens_per_second(
+        (result.get("llm_explainer", {}).get("meta") or [{}])[0], stages.get("llm_explainer", 0.0) / 1000
+    )
+    return {
+        "question": question,
+        "sql": sql,
+        "error": error,
+        "no_answer": no_answer,
+        "valid_sql": valid,
+        "correct": correct,
+        "correct_relaxed": relaxed,
+        "total_ms": 1000 * total,
+        "stages_ms": stages,
+        "sql_tokens": sql_tokens,
+        "sql_tokens_per_s": sql_tps,
+        "explain_tokens": explain_tokens,
+        "explain_tokens_per_s": explain_tps,
+    }
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None}
+    return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95))}
+
+
+def _rate(values: list) -> float | None:
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summarize(runs: list[dict]) -> dict:
+    stage_names = sorted({name for run in runs for name in run["stages_ms"]})
+    return {
+        "runs": len(runs),
+        "sql_valid_rate": _rate([run["valid_sql"] for run in runs]),
+        "correct_rate": _rate([run["correct"] for run in runs]),
+        "correct_relaxed_rate": _rate([run["correct_relaxed"] for run in runs]),
+        "errors": sum(1 for run in runs if run["error"]),
+        "total_ms": _percentiles([run["total_ms"] for run in runs]),
+        "stages_ms": {
+            name: _percentiles([run["stages_ms"][name] for run in runs if name in run["stages_ms"]])
+            for name in stage_names
+        },
+        "sql_tokens_per_s": _percentiles([run["sql_tokens_per_s"] for run in runs if run["sql_tokens_per_s"]]),
+        "explain_tokens_per_s": _percentiles([run["explain_tokens_per_s"] for run in runs if run["explain_tokens_per_s"]]),
+    }
+
+
+def _fmt(value, pattern="{:.0f}"):
+    return "-" if value is None else pattern.format(value)
+
+
+def print_summary(model: str, summary: dict, baseline: dict | None):
+    print(f"\n{model}: {summary['runs']} runs, valid SQL {_fmt(summary['sql_valid_rate'], '{:.0%}')}, "
+          f"correct {_fmt(summary['correct_rate'], '{:.0%}')} (relaxed {_fmt(summary['correct_relaxed_rate'], '{:.0%}')}), "
+          f"errors {summary['errors']}")
+    print(f"  SQL tokens/s p50 {_fmt(summary['sql_tokens_per_s']['p50'])}, "
+          f"explainer tokens/s p50 {_fmt(summary['explain_tokens_per_s']['p50'])}")
+    print(f"  {'stage':>20} | {'p50 ms':>9} | {'p95 ms':>9} | {'p50 vs baseline':>15}")
+    rows = [("total", summary["total_ms"], (baseline or {}).get("total_ms"))]
+    rows += [(name, values, (baseline or {}).get("stages_ms", {}).get(name)) for name, values in summary["stages_ms"].items()]
+    for name, values, before in rows:
+        delta = "-"
+        if before and before.get("p50"):
+            delta = f"{100 * (values['p50'] - before['p50']) / before['p50']:+.0f}%"
+        print(f"  {name:>20} | {values['p50']:>9.1f} | {values['p95']:>9.1f} | {delta:>15}")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=["fake"])
+    parser.add_argument("--questions", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--baseline", type=Path)
+    args = parser.parse_args()
+
+    database_url = os.getenv("BENCHMARK_DATABASE_URL")
+    if not database_url and not args.no_seed:
+        raise RuntimeError("Seeding resets the database: set BENCHMARK_DATABASE_URL, or pass --no-seed")
+    database_url = database_url or os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("Missing BENCHMARK_DATABASE_URL or DATABASE_URL in .env")
+
+    engine = create_pooled_engine(database_url)
+    connection_string = Secret.from_token(libpq_connection_string(database_url))
+    if args.no_seed:
+        document_store = build_document_store(connection_string)
+    else:
+        setup_database(engine)
+        document_store = index_knowledge(connection_string, ROOT / "data" / "knowledge_v2.json")
+    bm25_index = SyncedBM25Index(engine, document_store, path=OUTPUT_DIR / "bm25_index.json", table_name=KNOWLEDGE_TABLE)
+    bm25_index.sync()
+    catalog = SchemaCatalog(engine, exclude_tables=SCHEMA_EXCLUDE_TABLES, default_tables=SCHEMA_DEFAULT_TABLES,
+                            max_tables=SCHEMA_MAX_TABLES, max_columns=SCHEMA_MAX_COLUMNS)
+
+    questions = load_questions(ROOT / "output" / "test_queries.md", args.questions)
+    references = load_references(ROOT / "data" / "benchmark_queries.json")
+    recorder = SpanRecorder()
+    tracing.enable_tracing(recorder)
+
+    runs, summaries = [], {}
+    for model in args.models:
+        llm = llm_explainer = None
+        if model == "fake":
+            llm = ReplayGenerator(
+                {q: f"```sql\n{sql}\n```" if sql else "no_answer" for q, sql in references.items()},
+                default_reply="no_answer"
+            )
+            llm_explainer = ReplayGenerator({}, default_reply="The query result answers the question.")
+        # Cached rows and question vectors would hide the SQL and embedding time from the second repeat on
+        sql_pipeline = build_sql_pipeline(engine, document_store, bm25_index, llm=llm, llm_explainer=llm_explainer,
+                                          model_name=model, result_cache_enabled=False,
+                                          embedding_cache_enabled=False)
+        # Loads the model (and the embedder) before anything is timed
+        run_question(sql_pipeline, recorder, catalog, engine, questions[0], None, has_reference=False)
+
+        model_runs = []
+        for repeat in range(args.repeat):
+            for question in questions:
+                run = run_question(sql_pipeline, recorder, catalog, engine, question,
+                                   references.get(question), has_reference=question in references)
+                model_runs.append({"model": model, "repeat": repeat, **run})
+        runs.extend(model_runs)
+        summaries[model] = summarize(model_runs)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+    for model, summary in summaries.items():
+        print_summary(model, summary, (baseline or {}).get(model))
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    created_at = datetime.datetime.now()
+    output_path = OUTPUT_DIR / f"pipeline_{created_at:%Y%m%d_%H%M%S}.json"
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "models": args.models,
+            "questions": len(questions),
+            "repeat": args.repeat,
+            "summary": summaries,
+            "runs": runs,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nWrote {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Compares the two SQL prompt layouts of template/prompt.py on a running Ollama server:
+
+- classic: history and question first, then schema, knowledge context and rules
+- prefix_stable: rules, schema and knowledge first, history and question last
+
+Both layouts replay the same conversation (the questions of output/test_queries.md,
+with knowledge context from an in-memory BM25 search over data/knowledge_v2.json and
+a growing, compacted history). The schema is rendered per question by SchemaCatalog
+from the DATABASE_URL database, as in the app, so when consecutive questions need
+different tables only the rules in front of it stay a cached prefix. For every request Ollama reports how many prompt
+tokens it had to evaluate and how long that took; tokens served from its prompt cache
+are not counted. Time to first token is measured on the streamed reply.
+
+Usage: python scripts/benchmark_prompt_layout.py [--model <ollama model>] [--questions 15] [--with-explainer]
+--with-explainer sends an explainer-sized prompt to the same model between questions,
+like the app does. With OLLAMA_NUM_PARALLEL=1 that evicts the cached SQL prompt, so run
+the server with OLLAMA_NUM_PARALLEL>=2 to keep one slot per prompt family.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from haystack import Document
+from haystack.components.builders.prompt_builder import PromptBuilder
+from haystack.components.retrievers import InMemoryBM25Retriever
+from haystack.dataclasses import ChatMessage
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+from haystack_integrations.components.generators.ollama import OllamaGenerator
+from sqlalchemy import create_engine
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+from template.prompt import EXPLAIN_PROMPT_TEMPLATE, SQL_PROMPT_TEMPLATES  # noqa: E402
+from utils.config import (  # noqa: E402
+    SCHEMA_DEFAULT_TABLES, SCHEMA_EXCLUDE_TABLES, SCHEMA_MAX_COLUMNS, SCHEMA_MAX_TABLES, SCHEMA_SAMPLE_VALUES,
+)
+from utils.history import compact_history  # noqa: E402
+from utils.schema_catalog import SchemaCatalog  # noqa: E402
+
+QUESTION_RE = re.compile(r"^\d+\.\s+(.+)$")
+
+def load_questions(path: Path, limit: int) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        return [m.group(1).strip() for m in map(QUESTION_RE.match, f) if m][:limit]
+
+
+def build_retriever(path: Path) -> InMemoryBM25Retriever:
+    with open(path, encoding="utf-8") as f:
+        documents = [Document(id=item["id"], content=item["content"]) for item in json.load(f)]
+    store = InMemoryDocumentStore()
+    store.write_documents(documents)
+    return InMemoryBM25Retriever(document_store=store, top_k=3)
+
+
+def run_layout(layout: str, questions: list[str], retriever, catalog: SchemaCatalog, llm: OllamaGenerator,
+               with_explainer: bool) -> list[dict]:
+    prompt_builder = PromptBuilder(template=SQL_PROMPT_TEMPLATES[layout])
+    explain_builder = PromptBuilder(template=EXPLAIN_PROMPT_TEMPLATE)
+    history = []
+    rows = []
+    for question in questions:
+        history.append(ChatMessage.from_user(question))
+        history_payload, _ = compact_history(history, question=question)
+        schema, _ = catalog.render(question)
+        prompt = prompt_builder.run(
+            question=question,
+            schema=schema,
+            history=history_payload,
+            documents=retriever.run(query=question)["documents"]
+        )["prompt"]
+
+        start = time.perf_counter()
+        first_token = []
+
+        def on_chunk(chunk):
+            if chunk.content and not first_token:
+                first_token.append(time.perf_counter() - start)
+
+        result = llm.run(prompt=prompt, streaming_callback=on_chunk)
+        meta = result["meta"][0]
+        sql = result["replies"][0].strip()
+        rows.append({
+            "prompt_tokens": meta.get("usage", {}).get("prompt_tokens", 0),
+            "prefill_ms": meta.get("prompt_eval_duration", 0) / 1e6,
+            "ttft_ms": 1000 * (first_token[0] if first_token else time.perf_counter() - start),
+        })
+        history.append(ChatMessage.from_assistant("Answer.", meta={"sql": sql}))
+
+        if with_explainer:
+            llm.run(prompt=explain_builder.run(question=question, result=["count\n0  42"])["prompt"])
+    return rows
+
+
+def summarize(layout: str, rows: list[dict]):
+    # The first request of a layout has nothing cached, the rest show the steady state
+    steady = rows[1:] or rows
+    prefill = [r["prefill_ms"] for r in steady]
+    ttft = [r["ttft_ms"] for r in steady]
+    tokens = [r["prompt_tokens"] for r in steady]
+    print(f"{layout:>14} | {rows[0]['prefill_ms']:>13.0f} | {np.percentile(prefill, 50):>11.0f} | "
+          f"{np.percentile(prefill, 95):>11.0f} | {np.percentile(ttft, 50):>9.0f} | {np.percentile(ttft, 95):>9.0f} | "
+          f"{np.mean(tokens):>15.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="hf.co/mradermacher/natural-sql-7b-i1-GGUF:Q4_K_M")
+    parser.add_argument("--url", default="http://localhost:11434")
+    parser.add_argument("--questions", type=int, default=15)
+    parser.add_argument("--with-explainer", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("Missing DATABASE_URL in .env")
+    # Same settings as the app's catalog, only reads the schema and a few sample values
+    catalog = SchemaCatalog(create_engine(database_url), exclude_tables=SCHEMA_EXCLUDE_TABLES,
+                            default_tables=SCHEMA_DEFAULT_TABLES, max_tables=SCHEMA_MAX_TABLES,
+                            max_columns=SCHEMA_MAX_COLUMNS, sample_values=SCHEMA_SAMPLE_VALUES)
+    questions = load_questions(ROOT / "output" / "test_queries.md", args.questions)
+    retriever = build_retriever(ROOT / "data" / "knowledge_v2.json")
+    # Short, deterministic replies: only prefill and the first token matter here
+    llm = OllamaGenerator(model=args.model, url=args.url, keep_alive=-1,
+                          generation_kwargs={"temperature": 0, "num_predict": 48})
+    llm.run(prompt="SELECT 1;")  # load the model before timing
+
+    results = {
+        layout: run_layout(layout, questions, retriever, catalog, llm, args.with_explainer)
+        for layout in SQL_PROMPT_TEMPLATES
+    }
+
+    schemas = len({catalog.render(question)[0] for question in questions})
+    print(f"{len(questions)} questions ({schemas} distinct schema renderings), model {args.model}, "
+          f"explainer in between: {args.with_explainer}\n")
+    print(f"{'layout':>14} | {'first prefill':>13} | {'prefill p50':>11} | {'prefill p95':>11} | "
+          f"{'ttft p50':>9} | {'ttft p95':>9} | {'evaluated tokens':>15}")
+    for layout, rows in results.items():
+        summarize(layout, rows)
+    print("\nAll times in ms. 'evaluated tokens' are prompt tokens Ollama did not take from its cache.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Measures pgvector retrieval as the knowledge base grows: exact scan vs HNSW.
+
+For each document count a throwaway table is filled with synthetic, clustered
+384-dim vectors. The exact scan gives the ground truth top-k; the HNSW index
+is then built with the given m/ef_construction and queried at each ef_search.
+Reports index build time, recall@k against the exact scan and p50/p95 query
+latency. Queries go through the app's IndexedEmbeddingRetriever, and the plan
+of one query per size is printed, so it shows whether Postgres actually uses
+the index.
+
+Usage: python scripts/benchmark_retrieval.py [--sizes 1000 10000 50000] [--ef-search 20 40 100]
+                                             [--m 16] [--ef-construction 64] [--queries 200] [--top-k 3]
+Uses BENCHMARK_DATABASE_URL if set, otherwise DATABASE_URL. Tables are dropped afterwards.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+from haystack import Document
+from haystack.utils import Secret
+from sqlalchemy import create_engine
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.db import libpq_connection_string  # noqa: E402
+from utils.knowledge_store import EMBEDDING_DIMENSION, IndexedEmbeddingRetriever, build_document_store  # noqa: E402
+
+load_dotenv()
+DATABASE_URL = os.getenv("BENCHMARK_DATABASE_URL") or os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise RuntimeError("Missing BENCHMARK_DATABASE_URL or DATABASE_URL in .env")
+
+
+def synthetic_vectors(rng, count: int, clusters: int = 50, spread: float = 0.35) -> np.ndarray:
+    """Unit vectors around a few centers, closer to real embeddings than uniform noise."""
+    centers = rng.normal(size=(clusters, EMBEDDING_DIMENSION))
+    vectors = centers[rng.integers(0, clusters, count)] + spread * rng.normal(size=(count, EMBEDDING_DIMENSION))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def query_all(retriever, queries: np.ndarray):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        documents = retriever.run(query_embedding=query.tolist())["documents"]
+        latencies.append(time.perf_counter() - start)
+        results.append({doc.id for doc in documents})
+    return results, latencies
+
+
+def percentiles_ms(latencies) -> tuple[float, float]:
+    return 1000 * float(np.percentile(latencies, 50)), 1000 * float(np.percentile(latencies, 95))
+
+
+def run_size(size: int, args, rng, engine) -> list[dict]:
+    connection_string = Secret.from_token(libpq_connection_string(DATABASE_URL, statement_timeout_ms=0))
+    table = f"bench_retrieval_{size}"
+    rows = []
+
+    exact = build_document_store(connection_string, table_name=table, recreate_table=True,
+                                 search_strategy="exact_nearest_neighbor")
+    try:
+        vectors = synthetic_vectors(rng, size)
+        for start in range(0, size, 1000):
+            exact.write_documents([
+                Document(id=f"doc-{i}", content=f"synthetic document {i}", embedding=vectors[i].tolist())
+                for i in range(start, min(start + 1000, size))
+            ])
+        # Queries near existing documents, like real questions near their knowledge items
+        picks = rng.integers(0, size, args.queries)
+        queries = vectors[picks] + 0.1 * rng.normal(size=(args.queries, EMBEDDING_DIMENSION))
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        # No index yet, so this is the exact scan
+        truth, latencies = query_all(IndexedEmbeddingRetriever(engine, table, top_k=args.top_k, ef_search=None), queries)
+        p50, p95 = percentiles_ms(latencies)
+        rows.append({"docs": size, "strategy": "exact", "ef_search": "-", "build_s": 0.0,
+                     "recall": 1.0, "p50_ms": p50, "p95_ms": p95})
+
+        start = time.perf_counter()
+        # The store builds the index when it connects; ef_search is set by the retriever
+        build_document_store(connection_string, table_name=table, search_strategy="hnsw", m=args.m,
+                             ef_construction=args.ef_construction, recreate_index=True).count_documents()
+        build_time = time.perf_counter() - start
+
+        for i, ef_search in enumerate(args.ef_search):
+            retriever = IndexedEmbeddingRetriever(engine, table, top_k=args.top_k, ef_search=ef_search)
+            if i == 0:
+                print(f"Plan with {size} documents:\n  " + "\n  ".join(retriever.explain(queries[0].tolist())))
+            build_s = build_time if i == 0 else 0.0
+            found, latencies = query_all(retriever, queries)
+            recall = float(np.mean([len(t & f) / len(t) for t, f in zip(truth, found) if t]))
+            p50, p95 = percentiles_ms(latencies)
+            rows.append({"docs": size, "strategy": "hnsw", "ef_search": ef_search, "build_s": build_s,
+                         "recall": recall, "p50_ms": p50, "p95_ms": p95})
+    finally:
+        exact.delete_table()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[20, 40, 100])
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    engine = create_engine(DATABASE_URL)
+    print(f"m={args.m} ef_construction={args.ef_construction} top_k={args.top_k} queries={args.queries}")
+    print(f"{'docs':>8} | {'strategy':>8} | {'ef_search':>9} | {'build s':>8} | {'recall@k':>8} | {'p50 ms':>7} | {'p95 ms':>7}")
+    for size in args.sizes:
+        for row in run_size(size, args, rng, engine):
+            print(f"{row['docs']:>8} | {row['strategy']:>8} | {row['ef_search']:>9} | {row['build_s']:>8.2f} | "
+                  f"{row['recall']:>8.3f} | {row['p50_ms']:>7.2f} | {row['p95_ms']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
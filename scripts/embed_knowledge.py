@@ -1,30 +1,70 @@
+"""
+Embeds data/knowledge_v2.json into the pgvector knowledge table.
+
+By default indexing is incremental: every document carries a hash of its
+content and meta in `meta.content_hash`, and only new or changed documents are
+embedded and upserted, ids that are no longer in the file are deleted. The
+live table is never emptied, so the app keeps retrieving while it runs.
+
+--full re-embeds everything into a staging table and swaps it in with renames
+inside one transaction, e.g. after changing the embedding model or the HNSW
+build parameters.
+
+Usage: python scripts/embed_knowledge.py [--full] [--path data/knowledge_v2.json]
+"""
+import argparse
+import hashlib
 import os
+import sys
 import json
+from pathlib import Path
 from haystack import Document
 from haystack.utils import Secret
 from haystack import Pipeline
 from haystack.components.writers import DocumentWriter
-from haystack.components.embedders import SentenceTransformersDocumentEmbedder
-from haystack_integrations.document_stores.pgvector import PgvectorDocumentStore
+from haystack.document_stores.types import DuplicatePolicy
 from dotenv import load_dotenv
+from sqlalchemy import create_engine, inspect, text
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.config import KNOWLEDGE_TABLE  # noqa: E402
+from utils.embedders import build_document_embedder  # noqa: E402
+from utils.knowledge_store import KEYWORD_INDEX_NAME, build_document_store  # noqa: E402
 
 # Load environment variables
 load_dotenv()
 
-# Initialize the document store, ensuring it can store metadata
-document_store = PgvectorDocumentStore(
-    connection_string=Secret.from_env_var("DATABASE_URL"),
-    embedding_dimension=384,
-    recreate_table=True, # Deletes and recreates the table on each run
-    table_name="haystack_documents_v2" # Use a new table name
-)
+def content_hash(content: str, meta: dict) -> str:
+    """Stable hash of what gets embedded and stored; any edit to the item changes it."""
+    payload = json.dumps({"content": content, "meta": meta}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-def get_indexing_pipeline(doc_store: PgvectorDocumentStore):
+def load_documents(knowledge_base_path: str) -> list[Document]:
+    """
+    Reads the structured JSON and creates Haystack Documents with metadata.
+    """
+    with open(knowledge_base_path, "r", encoding="utf-8") as f:
+        knowledge_data = json.load(f)
+
+    # Convert each JSON object into a Haystack Document
+    haystack_docs = []
+    for item in knowledge_data:
+        meta = {
+            "type": item["type"],
+            "category": item["category"],
+            "keywords": item.get("keywords", [])
+        }
+        meta["content_hash"] = content_hash(item["content"], meta)
+        haystack_docs.append(Document(id=item["id"], content=item["content"], meta=meta))
+    return haystack_docs
+
+def get_indexing_pipeline(doc_store, policy: DuplicatePolicy = DuplicatePolicy.NONE):
     """
     Creates a Haystack pipeline that embeds and writes documents with metadata.
     """
-    embedder = SentenceTransformersDocumentEmbedder(model="sentence-transformers/all-MiniLM-L6-v2")
-    writer = DocumentWriter(document_store=doc_store)
+    # Same backend as the app's query embedder (EMBEDDING_BACKEND)
+    embedder = build_document_embedder()
+    writer = DocumentWriter(document_store=doc_store, policy=policy)
 
     indexing_pipeline = Pipeline()
     indexing_pipeline.add_component("embedder", embedder)
@@ -33,48 +73,119 @@ def get_indexing_pipeline(doc_store: PgvectorDocumentStore):
     indexing_pipeline.connect("embedder.documents", "writer.documents")
     return indexing_pipeline
 
-def run_indexing(pipeline: Pipeline, knowledge_base_path="data/knowledge_v2.json"):
+def _stored_hashes(engine, table_name: str) -> dict[str, str | None]:
+    # Only ids and hashes are read, not contents or embeddings
+    if not inspect(engine).has_table(table_name):
+        return {}
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.connect() as connection:
+        rows = connection.execute(text(f"SELECT id, meta->>'content_hash' FROM {quote(table_name)}"))
+        return {doc_id: digest for doc_id, digest in rows}
+
+def run_incremental(engine, connection_string: Secret, documents: list[Document], table_name: str = KNOWLEDGE_TABLE):
     """
-    Reads the structured JSON, creates Haystack Documents with metadata,
-    and runs the indexing pipeline.
+    Embeds and upserts only new or changed documents, then deletes removed
+    ids. Upserts go first, so the table never passes through an empty state.
     """
-    if not os.path.exists(knowledge_base_path):
-        print(f"Error: Knowledge base file not found at '{knowledge_base_path}'")
-        return
+    document_store = build_document_store(connection_string, table_name=table_name)
+    stored = _stored_hashes(engine, table_name)
+    changed = [doc for doc in documents if stored.get(doc.id) != doc.meta["content_hash"]]
+    removed = sorted(set(stored) - {doc.id for doc in documents})
+    print(f"{len(documents)} documents: {len(changed)} new or changed, "
+          f"{len(documents) - len(changed)} unchanged, {len(removed)} removed.")
 
-    with open(knowledge_base_path, "r", encoding="utf-8") as f:
-        knowledge_data = json.load(f)
+    if changed:
+        pipeline = get_indexing_pipeline(document_store, policy=DuplicatePolicy.OVERWRITE)
+        pipeline.run({"embedder": {"documents": changed}})
+    if removed:
+        document_store.delete_documents(removed)
+    return document_store
 
-    # Convert each JSON object into a Haystack Document
-    haystack_docs = []
-    for item in knowledge_data:
-        doc = Document(
-            id=item["id"],
-            content=item["content"],
-            meta={
-                "type": item["type"],
-                "category": item["category"],
-                "keywords": item.get("keywords", [])
-            }
-        )
-        haystack_docs.append(doc)
-
-    print(f"Prepared {len(haystack_docs)} documents for indexing...")
-
-    # Run the pipeline
-    pipeline.run({"embedder": {"documents": haystack_docs}})
-    
-    print(f"Indexing complete. Document store now contains {len(document_store.filter_documents())} documents.")
+def _swap_tables(engine, table_name: str, staging_name: str, staging_keyword_index: str):
+    """
+    Renames the staging table (and its indexes) to the live names and drops
+    the previous table, all in one transaction: readers see either the old
+    or the new table, never a missing or empty one.
+    """
+    quote = engine.dialect.identifier_preparer.quote
+    old_name = f"{table_name}_old"
+    live_exists = inspect(engine).has_table(table_name)
+    with engine.begin() as connection:
+        def rename_index(old, new):
+            connection.execute(text(f"ALTER INDEX IF EXISTS {quote(old)} RENAME TO {quote(new)}"))
 
-if __name__ == "__main__":
-    indexing_pipeline = get_indexing_pipeline(doc_store=document_store)
-    run_indexing(indexing_pipeline)
+        connection.execute(text(f"DROP TABLE IF EXISTS {quote(old_name)}"))
+        if live_exists:
+            connection.execute(text(f"ALTER TABLE {quote(table_name)} RENAME TO {quote(old_name)}"))
+            rename_index(f"{table_name}_pkey", f"{old_name}_pkey")
+            rename_index(f"{table_name}_hnsw_index", f"{old_name}_hnsw_index")
+            # The keyword index name is per schema; only move it if it belongs to the live table
+            keyword_index_owned = connection.execute(
+                text("SELECT 1 FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table AND indexname = :index"),
+                {"table": old_name, "index": KEYWORD_INDEX_NAME},
+            ).first()
+            if keyword_index_owned:
+                rename_index(KEYWORD_INDEX_NAME, f"{old_name}_keyword_index")
+        connection.execute(text(f"ALTER TABLE {quote(staging_name)} RENAME TO {quote(table_name)}"))
+        rename_index(f"{staging_name}_pkey", f"{table_name}_pkey")
+        rename_index(f"{staging_name}_hnsw_index", f"{table_name}_hnsw_index")
+        rename_index(staging_keyword_index, KEYWORD_INDEX_NAME)
+        connection.execute(text(f"DROP TABLE IF EXISTS {quote(old_name)}"))
+
+def run_full(engine, connection_string: Secret, documents: list[Document], table_name: str = KNOWLEDGE_TABLE):
+    """
+    Embeds every document into `<table>_staging` and swaps it in once it is
+    complete. The HNSW index (HNSW_M, HNSW_EF_CONSTRUCTION) is built on the
+    staging table, before it serves any query.
+    """
+    staging_name = f"{table_name}_staging"
+    staging_keyword_index = f"{staging_name}_keyword_index"
+    staging_store = build_document_store(
+        connection_string,
+        table_name=staging_name,
+        recreate_table=True, # Only the staging table is dropped and recreated
+        keyword_index_name=staging_keyword_index,
+    )
+    pipeline = get_indexing_pipeline(staging_store)
+    pipeline.run({"embedder": {"documents": documents}})
+
+    written = staging_store.count_documents()
+    if written != len(documents):
+        raise RuntimeError(f"Staging table has {written} of {len(documents)} documents, keeping the live table")
+    _swap_tables(engine, table_name, staging_name, staging_keyword_index)
+    return build_document_store(connection_string, table_name=table_name)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="re-embed everything into a staging table and swap it in")
+    parser.add_argument("--path", default="data/knowledge_v2.json", help="knowledge base file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"Error: Knowledge base file not found at '{args.path}'")
+        return
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("Missing DATABASE_URL in .env")
+    engine = create_engine(database_url, future=True)
+    connection_string = Secret.from_env_var("DATABASE_URL")
+
+    documents = load_documents(args.path)
+    print(f"Prepared {len(documents)} documents for indexing...")
+    if args.full:
+        document_store = run_full(engine, connection_string, documents)
+    else:
+        document_store = run_incremental(engine, connection_string, documents)
+    print(f"Indexing complete. Document store now contains {document_store.count_documents()} documents.")
 
     # (Optional) Inspect a document to see the result
-    docs = document_store.filter_documents(filters={"field": "meta.id", "operator": "==", "value": "temporal_mapping_002"})
+    docs = document_store.filter_documents(filters={"field": "id", "operator": "==", "value": "temporal_mapping_002"})
     if docs:
         print("\n--- Sample of an embedded document from the database ---")
         print(f"Content: {docs[0].content}")
         print(f"Metadata: {docs[0].meta}")
         print(f"Embedding vector length: {len(docs[0].embedding)}")
-        print("------------------------------------------------------")
\ No newline at end of file
+        print("------------------------------------------------------")
+
+if __name__ == "__main__":
+    main()
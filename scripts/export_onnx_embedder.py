@@ -0,0 +1,36 @@
+"""
+Exports the sentence embedder to ONNX and adds a dynamically int8-quantized copy.
+
+Usage: python scripts/export_onnx_embedder.py [--output models/all-MiniLM-L6-v2-onnx] [--config avx2]
+Then set EMBEDDING_BACKEND=onnx-int8, EMBEDDING_ONNX_MODEL=<output> and
+EMBEDDING_ONNX_FILE=onnx/model_qint8_<config>.onnx. The --config must match
+the CPU (avx2, avx512, avx512_vnni or arm64).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.config import EMBEDDING_MODEL  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--output", default="models/all-MiniLM-L6-v2-onnx")
+    parser.add_argument("--config", default="avx2", choices=["avx2", "avx512", "avx512_vnni", "arm64"])
+    args = parser.parse_args()
+
+    # Loading with the onnx backend exports the float32 graph to onnx/model.onnx
+    model = SentenceTransformer(args.model, backend="onnx", device="cpu")
+    model.save(args.output)
+    export_dynamic_quantized_onnx_model(model, args.config, args.output)
+
+    print(f"Exported {args.model} to {args.output}")
+    print(f"EMBEDDING_BACKEND=onnx-int8 EMBEDDING_ONNX_MODEL={args.output} EMBEDDING_ONNX_FILE=onnx/model_qint8_{args.config}.onnx")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Exports the per-component spans that app_ollama.py logs under "trace" in results.jsonl to
+a Chrome trace file (Trace Event Format). Open it in https://ui.perfetto.dev or
+chrome://tracing: every question is one process, with a row per thread (the BM25 branch
+of the concurrent retrieval runs on its own thread).
+
+Usage: python scripts/export_trace.py [--log output/logs/results.jsonl ...] [--last 50]
+                                      [--out output/traces/trace.json]
+Rotated segments (results-<timestamp>.jsonl.gz) can be passed to --log as well.
+"""
+import argparse
+import gzip
+import json
+import sys
+from collections import deque
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+from utils.tracing import chrome_trace_events  # noqa: E402
+
+
+def read_traced_records(paths: list[Path], last: int) -> list[dict]:
+    records = deque(maxlen=last)
+    for path in paths:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                # Cheap check first, most of a record is not needed here
+                if '"trace"' not in line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record.get("trace"), dict):
+                    records.append(record)
+    return list(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", type=Path, nargs="+", default=[ROOT / "output" / "logs" / "results.jsonl"])
+    parser.add_argument("--last", type=int, default=50, help="number of most recent questions to export")
+    parser.add_argument("--out", type=Path, default=ROOT / "output" / "traces" / "trace.json")
+    args = parser.parse_args()
+
+    records = read_traced_records(args.log, args.last)
+    events = []
+    for pid, record in enumerate(records, start=1):
+        question = str(record.get("question", ""))
+        label = question if len(question) <= 60 else question[:57] + "..."
+        if isinstance(record.get("execution_time"), (int, float)):
+            label += f" ({record['execution_time']:.2f}s)"
+        events.extend(chrome_trace_events(record["trace"], pid, label))
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    print(f"Exported {len(records)} questions ({len(events)} events) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
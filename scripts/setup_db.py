@@ -5,16 +5,17 @@ from dotenv import load_dotenv
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("Missing DATABASE_URL in .env")
 
-engine = create_engine(DATABASE_URL, future=True)
-
-def setup_database():
+def setup_database(engine=None):
     """
     Drops existing tables and recreates them with the correct schema,
     including a master 'departments' table and the foreign key relationship.
+    Uses DATABASE_URL unless an engine is given (e.g. a benchmark database).
     """
+    if engine is None:
+        if not DATABASE_URL:
+            raise RuntimeError("Missing DATABASE_URL in .env")
+        engine = create_engine(DATABASE_URL, future=True)
     print("Resetting database...")
     with engine.begin() as conn:
         # --- PART 1: DROP ALL TABLES ---
@@ -24,6 +25,7 @@ def setup_database():
         conn.execute(text("DROP TABLE IF EXISTS public.chat_messages CASCADE;"))
         conn.execute(text("DROP TABLE IF EXISTS public.chat_sessions CASCADE;"))
         conn.execute(text("DROP TABLE IF EXISTS public.departments CASCADE;")) # -- NEW --
+        conn.execute(text("DROP TABLE IF EXISTS public.table_versions CASCADE;"))
 
         # --- PART 2: RECREATE TABLES ---
         # -- NEW --: Create the master 'departments' table first.
@@ -48,6 +50,10 @@ def setup_database():
             );
         """))
 
+        # Indexes behind the filtered, id-paginated violations table in the UI
+        conn.execute(text("CREATE INDEX violations_department_id_idx ON public.violations (department, id);"))
+        conn.execute(text("CREATE INDEX violations_status_id_idx ON public.violations (status, id);"))
+
         # Create chat tables (unchanged)
         print("Creating 'chat_sessions' table...")
         conn.execute(text("""
@@ -65,11 +71,40 @@ def setup_database():
                 session_id UUID NOT NULL,
                 role VARCHAR(20) NOT NULL,
                 content TEXT NOT NULL,
+                sql TEXT, -- SQL behind an assistant answer, used by the compacted history
                 timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE
             );
         """))
 
+        # Change markers used by the app caches: every write statement on a
+        # tracked table bumps its version, so readers only compare one integer.
+        print("Creating 'table_versions' table and triggers...")
+        conn.execute(text("""
+            CREATE TABLE public.table_versions (
+                table_name TEXT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+            );
+        """))
+        conn.execute(text("""
+            CREATE OR REPLACE FUNCTION public.bump_table_version() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO public.table_versions (table_name, version, updated_at)
+                VALUES (TG_TABLE_NAME, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT (table_name) DO UPDATE
+                SET version = public.table_versions.version + 1, updated_at = CURRENT_TIMESTAMP;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """))
+        for table_name in ("violations", "departments"):
+            conn.execute(text(f"""
+                CREATE TRIGGER {table_name}_bump_version
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.{table_name}
+                FOR EACH STATEMENT EXECUTE FUNCTION public.bump_table_version();
+            """))
+
         # --- PART 3: INSERT SAMPLE DATA ---
         # -- NEW --: Populate the 'departments' table.
         # This includes all departments from your original data, plus two extra for testing.
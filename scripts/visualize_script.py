@@ -1,27 +1,130 @@
+"""
+Builds output/report.html from the app's results log.
+
+Log entries are ingested incrementally: the active output/logs/results.jsonl
+and its rotated segments (results-<timestamp>.jsonl.gz) are read line by line,
+and the byte offset reached in each segment is kept in a checkpoint, so a rerun
+only parses entries written since the last one. Parsed rows are appended as
+Parquet parts to output/report_store/, and the report is rendered from the
+most recent rows of that store.
+
+With --mode analytics it writes output/analytics/index.html instead: p50/p95/p99
+execution time per route and per model, token distributions, prefill and
+generation tokens per second (from Ollama's timings), and the slowest entries
+and questions, linking into paginated pages of the raw entries.
+
+Usage: python scripts/visualize_script.py [--mode report|analytics] [--limit 1000]
+                                          [--page-size 100] [--rebuild]
+"""
+import argparse
+import gzip
+import hashlib
+import html
 import json
+import os
 import re
+import shutil
+import time
 from pathlib import Path
 import pandas as pd
+import pyarrow.parquet as pq
+
+ROOT = Path(__file__).resolve().parent.parent
+LOG_DIR = ROOT / "output" / "logs"
+STORE_DIR = ROOT / "output" / "report_store"
+ANALYTICS_DIR = ROOT / "output" / "analytics"
+# Rows per Parquet part, also bounds how many parsed rows are held in memory during ingestion
+PART_ROWS = 5000
+
+TOKEN_COLUMNS = [
+    "SQL_Prompt_Tokens", "SQL_Completion_Tokens",
+    "Expl_Prompt_Tokens", "Expl_Completion_Tokens",
+    "Total_Tokens",
+]
+REPORT_COLUMNS = [
+    "Entry", "Question", "Route", "Execution_Time",
+    "SQL_Prompt",
+    "LLM_SQL",
+    "Query_Result",
+    "Explainer_Prompt",
+    "Explanation",
+    "Result_Shape", "Fast_Path",
+    "Model",
+    *TOKEN_COLUMNS,
+]
+# Columns that may contain long content, shown collapsed
+LONG_TEXT_COLUMNS = ["SQL_Prompt", "LLM_SQL", "Query_Result", "Explainer_Prompt", "Explanation"]
+# Small columns the analytics mode loads for every entry
+ANALYTICS_COLUMNS = [
+    "Question", "Route", "Model", "Execution_Time", *TOKEN_COLUMNS,
+    "SQL_Prefill_Ms", "SQL_Generate_Ms", "Expl_Prefill_Ms", "Expl_Generate_Ms",
+]
+
+
+def _log_segments(log_dir: Path) -> list[Path]:
+    """Rotated segments oldest first, then the active file."""
+    segments = sorted(log_dir.glob("results-*.jsonl.gz"))
+    active = log_dir / "results.jsonl"
+    if active.exists():
+        segments.append(active)
+    return segments
+
+
+def _open_segment(path: Path):
+    return gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+
+
+def _segment_key(path: Path) -> str | None:
+    """
+    Hash of the segment's first line. The active file is renamed and gzipped
+    on rotation, so its name changes but its first line doesn't; that way the
+    offset read from results.jsonl carries over to the rotated segment.
+    """
+    try:
+        with _open_segment(path) as f:
+            first = f.readline()
+    except (OSError, EOFError):
+        return None
+    if not first.endswith(b"\n"):
+        return None
+    return hashlib.sha1(first).hexdigest()
 
 
-def _iter_json_objects(filepath: str | Path):
-    with open(filepath, "r", encoding="utf-8") as f:
-        text = f.read()
-    dec = json.JSONDecoder()
-    i, n = 0, len(text)
-    while i < n:
-        while i < n and text[i].isspace():
-            i += 1
-        if i >= n:
-            break
+def _iter_lines(path: Path, offset: int = 0):
+    """
+    Yields (line, offset after the line) for every complete line from `offset`
+    on, then (b"", offset) once the end of the segment is reached. Offsets are
+    in uncompressed bytes. A trailing line without newline is still being
+    written and is left for the next run; a gzip segment that is still being
+    compressed stops early the same way, in both cases without the end marker.
+    """
+    with _open_segment(path) as f:
         try:
-            obj, end = dec.raw_decode(text, i)
-            yield obj
-            i = end
-        except json.JSONDecodeError:
-            # Skip lines that are not valid JSON or empty lines
-            i += 1
-            continue
+            if offset:
+                f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return
+                offset += len(line)
+                yield line, offset
+        except (OSError, EOFError):
+            return
+    yield b"", offset
+
+
+def _load_checkpoint(path: Path) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"segments": {}}
+
+
+def _save_checkpoint(path: Path, checkpoint: dict):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, path)
 
 
 _question_re = re.compile(r"Question:\s*(.+)", re.IGNORECASE)
@@ -50,7 +153,8 @@ def _parse_entry(obj: dict) -> dict:
     # --- SQL Prompt & Question ---
     sql_prompt_block = obj.get("prompt") or {}
     sql_prompt_content = sql_prompt_block.get("prompt", "")
-    question = _extract_question(sql_prompt_content)
+    # Newer entries log the question directly, the prompt may be trimmed by the logger
+    question = obj.get("question") or _extract_question(sql_prompt_content)
 
     # --- Explainer Prompt ---
     # Fix: Access 'prompt' inside 'explain_prompt'
@@ -74,6 +178,8 @@ def _parse_entry(obj: dict) -> dict:
     expl_meta_list = expl_block.get("meta") or []
     expl_meta = _first(expl_meta_list, default={})
     expl_usage = expl_meta.get("usage") or {}
+    # Answers from a verified template never call the SQL LLM
+    model = model or expl_meta.get("model", "")
 
     # Router & Error Router
     router = obj.get("router") or {}
@@ -103,6 +209,13 @@ def _parse_entry(obj: dict) -> dict:
     expl_replies = expl_block.get("replies") or []
     explanation = str(_first(expl_replies)).strip()
 
+    # Fast path: templated answer instead of the explainer LLM
+    answer_router = obj.get("answer_router") or {}
+    shape = (answer_router.get("shape") or {}).get("shape", "")
+    fast_path = bool(answer_router.get("answer"))
+    if fast_path:
+        explanation = answer_router["answer"]
+
     # Get tokens for each LLM
     sql_prompt_tokens = sql_usage.get("prompt_tokens", 0)
     sql_completion_tokens = sql_usage.get("completion_tokens", 0)
@@ -118,73 +231,147 @@ def _parse_entry(obj: dict) -> dict:
     return {
         "Question": question,
         "Route": route,
-        "Execution_Time": f"{execution_time:.2f}s" if execution_time > 0 else "",
+        "Execution_Time": float(execution_time or 0.0),
         "SQL_Prompt": sql_prompt_content,
         "LLM_SQL": llm_sql,
         "Query_Result": query_result,
         "Explainer_Prompt": expl_prompt_content,
         "Explanation": explanation,
+        "Result_Shape": shape,
+        "Fast_Path": fast_path,
         "Model": model,
-        "SQL_Prompt_Tokens": sql_prompt_tokens if sql_prompt_tokens > 0 else "",
-        "SQL_Completion_Tokens": sql_completion_tokens if sql_completion_tokens > 0 else "",
-        "Expl_Prompt_Tokens": expl_prompt_tokens if expl_prompt_tokens > 0 else "",
-        "Expl_Completion_Tokens": expl_completion_tokens if expl_completion_tokens > 0 else "",
-        "Total_Tokens": total_tokens if total_tokens > 0 else "",
+        "SQL_Prompt_Tokens": int(sql_prompt_tokens or 0),
+        "SQL_Completion_Tokens": int(sql_completion_tokens or 0),
+        "Expl_Prompt_Tokens": int(expl_prompt_tokens or 0),
+        "Expl_Completion_Tokens": int(expl_completion_tokens or 0),
+        "Total_Tokens": int(total_tokens or 0),
+        # Ollama's own timings (ns in the meta), for prefill and generation tokens per second
+        "SQL_Prefill_Ms": (sql_llm_meta.get("prompt_eval_duration") or 0) / 1e6,
+        "SQL_Generate_Ms": (sql_llm_meta.get("eval_duration") or 0) / 1e6,
+        "Expl_Prefill_Ms": (expl_meta.get("prompt_eval_duration") or 0) / 1e6,
+        "Expl_Generate_Ms": (expl_meta.get("eval_duration") or 0) / 1e6,
     }
 
 
-def build_dataframe(log_path: Path) -> pd.DataFrame:
-    rows = []
-    for obj in _iter_json_objects(log_path):
-        try:
-            rows.append(_parse_entry(obj))
-        except Exception:
-            # Skip if there's an error parsing an entry
-            continue
-    return pd.DataFrame(rows)
+def _coerce_row(row: dict) -> dict:
+    # Parquet needs one type per column, the log itself has free-form values
+    for col in ("Question", "Route", "SQL_Prompt", "LLM_SQL", "Query_Result",
+                "Explainer_Prompt", "Explanation", "Result_Shape", "Model"):
+        value = row[col]
+        row[col] = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    row["Fast_Path"] = bool(row["Fast_Path"])
+    return row
 
 
-def main():
-    base = Path(__file__).parent
-    log_file = base.parent / "output" / "logs" / "results.jsonl"
-    if not log_file.exists():
-        print(f"File not found: {log_file}")
-        return
+def _write_part(store_dir: Path, rows: list[dict]) -> Path:
+    parts = store_dir / "parts"
+    parts.mkdir(parents=True, exist_ok=True)
+    # Names sort in ingestion order, which is log order
+    path = parts / f"part-{time.time_ns():020d}.parquet"
+    tmp = path.with_suffix(".tmp")
+    pd.DataFrame(rows).to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
 
-    df = build_dataframe(log_file)
-    if df.empty:
-        print("No data available.")
-        return
 
-    # Console view
-    pd.set_option("display.width", 200)
-    pd.set_option("display.max_colwidth", 200)
-    cols = [
-        "Question", "Route", "Execution_Time",
-        "SQL_Prompt",
-        "LLM_SQL",
-        "Query_Result",
-        "Explainer_Prompt",
-        "Explanation",
-        "Model", 
-        "SQL_Prompt_Tokens", "SQL_Completion_Tokens",
-        "Expl_Prompt_Tokens", "Expl_Completion_Tokens",
-        "Total_Tokens",
-    ]
-    cols = [c for c in cols if c in df.columns]
-    #print(df[cols].to_string(index=False))
+def ingest_logs(log_dir: Path = LOG_DIR, store_dir: Path = STORE_DIR) -> dict:
+    """
+    Parses log entries written since the last run into new Parquet parts.
+    Returns counts of new rows, skipped lines and segments read.
+    """
+    store_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = store_dir / "checkpoint.json"
+    checkpoint = _load_checkpoint(checkpoint_path)
+    seen = checkpoint.setdefault("segments", {})
+    stats = {"rows": 0, "skipped": 0, "segments": 0}
+    rows = []
 
-    out_html = base.parent / "output" / "report.html"
+    def flush():
+        # Part first, checkpoint second: a crash in between re-reads rows rather than losing them
+        if rows:
+            _write_part(store_dir, rows)
+            stats["rows"] += len(rows)
+            rows.clear()
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+    for path in _log_segments(log_dir):
+        key = _segment_key(path)
+        if key is None:
+            continue
+        entry = seen.setdefault(key, {"offset": 0})
+        if entry.get("complete"):
+            continue
+        stats["segments"] += 1
+        entry["segment"] = path.name
+        for line, offset in _iter_lines(path, entry["offset"]):
+            if not line:
+                # Rotated segments never change again
+                entry["complete"] = path.suffix == ".gz"
+                break
+            entry["offset"] = offset
+            try:
+                obj = json.loads(line)
+                rows.append(_coerce_row(_parse_entry(obj)))
+            except Exception:
+                # Corrupted or unexpected lines are skipped, one line at a time
+                stats["skipped"] += 1
+                continue
+            if len(rows) >= PART_ROWS:
+                flush()
+    flush()
+    return stats
+
+
+def _parts(store_dir: Path) -> list[Path]:
+    return sorted((store_dir / "parts").glob("part-*.parquet"))
+
+
+def load_rows(store_dir: Path = STORE_DIR, limit: int | None = None) -> pd.DataFrame:
+    """The last `limit` ingested rows (all of them for None), in log order, numbered in `Entry`."""
+    parts = _parts(store_dir)
+    frames, count = [], 0
+    # Newest parts first, so only the parts needed for `limit` rows are read
+    for part in reversed(parts):
+        frame = pd.read_parquet(part)
+        frames.append(frame)
+        count += len(frame)
+        if limit is not None and count >= limit:
+            break
+    if not frames:
+        return pd.DataFrame()
+    first_entry = sum(pq.ParquetFile(part).metadata.num_rows for part in parts[:len(parts) - len(frames)])
+    df = pd.concat(reversed(frames), ignore_index=True)
+    df.insert(0, "Entry", range(first_entry, first_entry + len(df)))
+    return df.tail(limit).reset_index(drop=True) if limit is not None else df
+
+
+def load_columns(store_dir: Path, columns: list[str]) -> pd.DataFrame:
+    """`columns` of every ingested row; columns that older parts don't have yet are NaN."""
+    frames = []
+    for part in _parts(store_dir):
+        present = [c for c in columns if c in pq.read_schema(part).names]
+        frames.append(pd.read_parquet(part, columns=present))
+    if not frames:
+        return pd.DataFrame(columns=["Entry", *columns])
+    df = pd.concat(frames, ignore_index=True).reindex(columns=columns)
+    df.insert(0, "Entry", range(len(df)))
+    return df
+
+
+def _entries_table(df: pd.DataFrame) -> str:
     df_html = df.copy()
-
-    # Columns that may contain long content will be placed in <details> tags
-    long_text_cols = ["SQL_Prompt", "LLM_SQL", "Query_Result", "Explainer_Prompt", "Explanation"]
-
-    for col in long_text_cols:
+    df_html["Execution_Time"] = df_html["Execution_Time"].map(lambda x: f"{x:.2f}s" if x > 0 else "")
+    for col in TOKEN_COLUMNS:
+        df_html[col] = df_html[col].map(lambda x: x if x > 0 else "")
+    # Anchors, so the analytics page can link to a single entry
+    df_html["Entry"] = df_html["Entry"].map(lambda n: f'<a id="entry-{n}">{n}</a>')
+    df_html["Question"] = df_html["Question"].astype(str).map(html.escape)
+
+    for col in LONG_TEXT_COLUMNS:
         if col in df_html.columns:
             # Skip if cell is empty to avoid creating unnecessary <details> tags
             is_not_empty = df_html[col].astype(str).str.strip() != ""
-            
+
             # Wrap content in <details> tag with copy button
             # Use <pre><code> to preserve code/text formatting and help JS easily get content
             df_html.loc[is_not_empty, col] = (
@@ -192,21 +379,23 @@ def main():
                 "<summary>Click to expand</summary>"
                 '<button class="copy-btn" onclick="copyToClipboard(this)">Copy</button>'
                 '<pre class="copy-content"><code>' +
-                df_html.loc[is_not_empty, col].astype(str) +
+                df_html.loc[is_not_empty, col].astype(str).map(html.escape) +
                 '</code></pre>'
                 "</details>"
             )
 
-    # Convert DataFrame to HTML string
-    html_table = df_html[cols].to_html(index=False, escape=False, border=0, classes="dataframe")
+    cols = [c for c in REPORT_COLUMNS if c in df_html.columns]
+    return df_html[cols].to_html(index=False, escape=False, border=0, classes="dataframe entries")
+
 
+def _html_page(title: str, body: str) -> str:
     # Create a complete HTML file with CSS and JavaScript
-    full_html = f"""
+    return f"""
     <!DOCTYPE html>
     <html>
     <head>
     <meta charset="UTF-8">
-    <title>Report</title>
+    <title>{title}</title>
     <style>
         body {{ font-family: sans-serif; }}
         table.dataframe {{
@@ -224,13 +413,13 @@ def main():
             background-color: #f2f2f2;
         }}
         /* Set minimum width for long content columns */
-        table.dataframe th:nth-child({cols.index('LLM_SQL') + 1}),
-        table.dataframe th:nth-child({cols.index('Query_Result') + 1}),
-        table.dataframe th:nth-child({cols.index('Explanation') + 1}) {{
+        table.entries th:nth-child({REPORT_COLUMNS.index('LLM_SQL') + 1}),
+        table.entries th:nth-child({REPORT_COLUMNS.index('Query_Result') + 1}),
+        table.entries th:nth-child({REPORT_COLUMNS.index('Explanation') + 1}) {{
             min-width: 200px;
         }}
-        table.dataframe th:nth-child({cols.index('SQL_Prompt') + 1}),
-        table.dataframe th:nth-child({cols.index('Explainer_Prompt') + 1}) {{
+        table.entries th:nth-child({REPORT_COLUMNS.index('SQL_Prompt') + 1}),
+        table.entries th:nth-child({REPORT_COLUMNS.index('Explainer_Prompt') + 1}) {{
             min-width: 150px;
         }}
         details > summary {{
@@ -284,17 +473,204 @@ def main():
     </script>
     </head>
     <body>
-    <h1>SQL Pipeline Report</h1>
-    {html_table}
+    <h1>{title}</h1>
+    {body}
     </body>
     </html>
     """
 
+
+def write_report(df: pd.DataFrame, out_html: Path):
+    with open(out_html, "w", encoding="utf-8") as f:
+        f.write(_html_page("SQL Pipeline Report", _entries_table(df)))
+
+
+def _percentiles(values: pd.Series) -> dict:
+    values = values[values > 0]
+    if values.empty:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": values.mean(),
+        "p50": values.quantile(0.50),
+        "p95": values.quantile(0.95),
+        "p99": values.quantile(0.99),
+        "max": values.max(),
+    }
+
+
+def _grouped_percentiles(df: pd.DataFrame, by: str, column: str) -> pd.DataFrame:
+    rows = {"(all)": _percentiles(df[column])}
+    for key, group in df.groupby(df[by].fillna("").replace("", "(none)")):
+        rows[key] = _percentiles(group[column])
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis(by).reset_index()
+
+
+def _throughput(df: pd.DataFrame) -> pd.DataFrame:
+    """Prefill and generation tokens per second of each LLM, per model."""
+    rows = []
+    for llm, prefix in (("SQL", "SQL"), ("Explainer", "Expl")):
+        for stage, tokens_col, ms_col in (
+            ("prefill", f"{prefix}_Prompt_Tokens", f"{prefix}_Prefill_Ms"),
+            ("generation", f"{prefix}_Completion_Tokens", f"{prefix}_Generate_Ms"),
+        ):
+            timed = df[(df[ms_col] > 0) & (df[tokens_col] > 0)]
+            tps = timed[tokens_col] / (timed[ms_col] / 1000)
+            for model, values in tps.groupby(timed["Model"].fillna("")):
+                rows.append({"LLM": llm, "Stage": stage, "Model": model or "(none)", **_percentiles(values)})
+    return pd.DataFrame(rows)
+
+
+def _entry_link(entry: int, page_size: int) -> str:
+    return f'<a href="entries/page-{entry // page_size + 1:05d}.html#entry-{entry}">{entry}</a>'
+
+
+def _summary_table(df: pd.DataFrame, digits: int = 2) -> str:
+    if df.empty:
+        return "<p>No data.</p>"
+    return df.to_html(index=False, escape=False, border=0, classes="dataframe", na_rep="",
+                      float_format=lambda x: f"{x:.{digits}f}")
+
+
+def write_entry_pages(store_dir: Path, out_dir: Path, page_size: int) -> int:
+    """
+    Writes every ingested entry to out_dir/entries/page-NNNNN.html, `page_size`
+    per page, and returns the number of pages. The store is append-only, so
+    pages that were full in an earlier run (recorded in entries/pages.json)
+    are kept and only the parts from the first page that wasn't are read.
+    """
+    pages_dir = out_dir / "entries"
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    parts = _parts(store_dir)
+    counts = [pq.ParquetFile(part).metadata.num_rows for part in parts]
+    total = sum(counts)
+    page_count = max(1, -(-total // page_size))
+
+    state_path = pages_dir / "pages.json"
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        state = {}
+    # A partly filled last page is always rendered again; a different page size starts over
+    page = min(state.get("full_pages", 0), total // page_size) if state.get("page_size") == page_size else 0
+    start = page * page_size
+
+    def write_page(number: int, rows: pd.DataFrame):
+        # A full page always links to the next one, which exists or appears once more is logged
+        nav = " | ".join(filter(None, [
+            f'<a href="page-{number - 1:05d}.html">Previous</a>' if number > 1 else "",
+            '<a href="../index.html">Analytics</a>',
+            f'<a href="page-{number + 1:05d}.html">Next</a>' if len(rows) == page_size else "",
+        ]))
+        first = rows["Entry"].iloc[0] if len(rows) else 0
+        body = f"<p>Entries {first}-{first + len(rows) - 1}</p><p>{nav}</p>{_entries_table(rows)}<p>{nav}</p>"
+        with open(pages_dir / f"page-{number:05d}.html", "w", encoding="utf-8") as f:
+            f.write(_html_page(f"Entries, page {number}", body))
+
+    pending, offset = pd.DataFrame(), 0
+    for part, count in zip(parts, counts):
+        if offset + count <= start:
+            offset += count
+            continue
+        frame = pd.read_parquet(part)
+        frame.insert(0, "Entry", range(offset, offset + count))
+        offset += count
+        pending = pd.concat([pending, frame[frame["Entry"] >= start]], ignore_index=True)
+        while len(pending) >= page_size:
+            page += 1
+            write_page(page, pending.iloc[:page_size])
+            pending = pending.iloc[page_size:]
+    if not pending.empty or total == 0:
+        write_page(page + 1, pending)
+    _save_checkpoint(state_path, {"page_size": page_size, "full_pages": total // page_size})
+    return page_count
+
+
+def write_analytics(store_dir: Path, out_dir: Path, page_size: int = 100, slowest: int = 25) -> Path:
+    """Aggregated latency and token statistics in out_dir/index.html, linking into paginated raw entries."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df = load_columns(store_dir, ANALYTICS_COLUMNS)
+    pages = write_entry_pages(store_dir, out_dir, page_size)
+
+    sections = [
+        f"<p>{len(df)} entries in {pages} pages: "
+        f'<a href="entries/page-00001.html">first</a> | <a href="entries/page-{pages:05d}.html">latest</a></p>'
+    ]
+
+    sections.append("<h2>Execution time per route (s)</h2>")
+    sections.append(_summary_table(_grouped_percentiles(df, "Route", "Execution_Time")))
+    sections.append("<h2>Execution time per model (s)</h2>")
+    sections.append(_summary_table(_grouped_percentiles(df, "Model", "Execution_Time")))
+
+    sections.append("<h2>Tokens per entry</h2>")
+    tokens = pd.DataFrame.from_dict({col: _percentiles(df[col]) for col in TOKEN_COLUMNS}, orient="index")
+    sections.append(_summary_table(tokens.rename_axis("Tokens").reset_index(), digits=0))
+
+    sections.append("<h2>Tokens per second</h2>")
+    sections.append(_summary_table(_throughput(df), digits=1))
+
+    timed = df[df["Execution_Time"] > 0]
+    slow = timed.nlargest(slowest, "Execution_Time")[["Entry", "Question", "Route", "Model", "Execution_Time", "Total_Tokens"]].copy()
+    slow["Entry"] = slow["Entry"].map(lambda n: _entry_link(n, page_size))
+    slow["Question"] = slow["Question"].astype(str).map(html.escape)
+    sections.append(f"<h2>Slowest {slowest} entries</h2>")
+    sections.append(_summary_table(slow))
+
+    # Questions that are slow every time they're asked, not after one unlucky run
+    by_question = timed.groupby("Question").agg(
+        Runs=("Execution_Time", "size"),
+        p50=("Execution_Time", "median"),
+        max=("Execution_Time", "max"),
+        Latest_Entry=("Entry", "max"),
+    ).nlargest(slowest, "p50").reset_index()
+    by_question["Question"] = by_question["Question"].astype(str).map(html.escape)
+    by_question["Latest_Entry"] = by_question["Latest_Entry"].map(lambda n: _entry_link(n, page_size))
+    sections.append(f"<h2>Slowest {slowest} questions (median over runs)</h2>")
+    sections.append(_summary_table(by_question))
+
+    out_html = out_dir / "index.html"
     with open(out_html, "w", encoding="utf-8") as f:
-        f.write(full_html)
+        f.write(_html_page("SQL Pipeline Analytics", "\n".join(sections)))
+    return out_html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["report", "analytics"], default="report",
+                        help="report: one table of the most recent entries; analytics: aggregated statistics "
+                             "with paginated raw entries")
+    parser.add_argument("--limit", type=int, default=1000, help="number of most recent entries in the report (0 for all)")
+    parser.add_argument("--page-size", type=int, default=100, help="entries per page in analytics mode")
+    parser.add_argument("--rebuild", action="store_true", help="drop the store and checkpoint and re-ingest every segment")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        # Entry numbers can change on a rebuild, so the entry pages go too
+        for path in (STORE_DIR, ANALYTICS_DIR):
+            if path.exists():
+                shutil.rmtree(path)
+    if not LOG_DIR.exists():
+        print(f"Directory not found: {LOG_DIR}")
+        return
+
+    stats = ingest_logs(LOG_DIR, STORE_DIR)
+    print(f"Ingested {stats['rows']} new entries from {stats['segments']} segments ({stats['skipped']} lines skipped)")
+
+    if args.mode == "analytics":
+        out_html = write_analytics(STORE_DIR, ANALYTICS_DIR, page_size=args.page_size)
+        print(f"Saved: {out_html}")
+        return
+
+    df = load_rows(STORE_DIR, limit=args.limit or None)
+    if df.empty:
+        print("No data available.")
+        return
 
+    out_html = ROOT / "output" / "report.html"
+    write_report(df, out_html)
     print(f"Saved: {out_html}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -22,13 +22,53 @@ SQL_PROMPT_TEMPLATE = """You are an expert SQL assistant.
                 ---
 
                 Rules:
-                - If the answer cannot be obtained from the given table/columns, output exactly: no_answer
+                - If the answer cannot be obtained from the given tables/columns, output exactly: no_answer
                 - Return ONLY a valid SQL query (or no_answer). No narration.
                 - Start query with SELECT or WITH.
                 - Prefer explicit column names, avoid SELECT * unless necessary.
-                - Use table name violations.
+                - Use only the tables and columns listed in the schema; join them through the listed references.
                 """
 
+# Same content as SQL_PROMPT_TEMPLATE, ordered from most to least stable: instructions and
+# rules never change, the schema and knowledge context repeat across similar questions,
+# history and question change every turn. Ollama reuses the KV cache of a prompt up to the
+# first differing token, so a constant head is only evaluated once per loaded model.
+SQL_PROMPT_TEMPLATE_PREFIX_STABLE = """You are an expert SQL assistant.
+                Your task: generate a PostgreSQL query that answers the latest USER question,
+                considering the multi-turn conversation at the end.
+
+                Rules:
+                - If the answer cannot be obtained from the given tables/columns, output exactly: no_answer
+                - Return ONLY a valid SQL query (or no_answer). No narration.
+                - Start query with SELECT or WITH.
+                - Prefer explicit column names, avoid SELECT * unless necessary.
+                - Use only the tables and columns listed in the schema; join them through the listed references.
+
+                Database schema for tables:
+                ---
+                {{schema}}
+                ---
+
+                Retrieved knowledge base context:
+                ---
+                {% for doc in documents %}
+                {{ doc.content }}
+                {% endfor %}
+                ---
+
+                Conversation so far (oldest first):
+                {% for m in history %}
+                Role: {{m.role}} | Content: {{m.content}}
+                {% endfor %}
+
+                Latest user question: {{question}}
+                """
+
+SQL_PROMPT_TEMPLATES = {
+    "classic": SQL_PROMPT_TEMPLATE,
+    "prefix_stable": SQL_PROMPT_TEMPLATE_PREFIX_STABLE,
+}
+
 EXPLAIN_PROMPT_TEMPLATE = """
     You are an assistant specialized in explaining SQL results in a natural way.
     Task:
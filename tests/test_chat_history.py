@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+from haystack.dataclasses import ChatMessage
+from sqlalchemy import create_engine, text
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.chat_history import append_chat_messages, load_chat_history  # noqa: E402
+
+
+def _engine(with_sql_column: bool):
+    engine = create_engine("sqlite://")
+    sql_column = "sql TEXT," if with_sql_column else ""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, session_id TEXT, role TEXT, content TEXT, "
+            f"{sql_column} timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+    return engine
+
+
+def _turns():
+    return [
+        ChatMessage.from_user("How many violations?"),
+        ChatMessage.from_assistant("There are 3.", meta={"sql": "SELECT COUNT(*) FROM violations"}),
+    ]
+
+
+def test_append_writes_only_new_messages_and_keeps_sql():
+    engine = _engine(with_sql_column=True)
+    history = _turns()
+    assert append_chat_messages(engine, "s1", history, 0) == 2
+    history.append(ChatMessage.from_user("And in Logistics?"))
+    assert append_chat_messages(engine, "s1", history, 2) == 3
+    assert append_chat_messages(engine, "s1", history, 3) == 3
+
+    loaded = load_chat_history(engine, "s1")
+    assert [m.text for m in loaded] == [m.text for m in history]
+    assert loaded[1].meta == {"sql": "SELECT COUNT(*) FROM violations"}
+
+
+def test_database_without_sql_column_still_saves_and_loads():
+    engine = _engine(with_sql_column=False)
+    assert append_chat_messages(engine, "s1", _turns(), 0) == 2
+    loaded = load_chat_history(engine, "s1")
+    assert [m.text for m in loaded] == ["How many violations?", "There are 3."]
+    assert not loaded[1].meta
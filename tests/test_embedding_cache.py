@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.embedding_cache import CachedTextEmbedder  # noqa: E402
+
+
+class _CountingEmbedder:
+    def __init__(self, model: str = "all-MiniLM-L6-v2"):
+        self.model = model
+        self.calls = 0
+
+    def run(self, text: str):
+        self.calls += 1
+        return {"embedding": [float(len(text)), float(self.calls)]}
+
+
+def test_normalized_repeats_skip_the_encoder_and_size_is_bounded():
+    inner = _CountingEmbedder()
+    cache = CachedTextEmbedder(inner, max_size=2)
+    first = cache.run(text="How many violations?")["embedding"]
+    assert cache.run(text="  how many   VIOLATIONS? ")["embedding"] == first
+    assert inner.calls == 1
+
+    cache.run(text="b")
+    cache.run(text="c")
+    cache.run(text="How many violations?")
+    assert inner.calls == 4
+    assert cache.stats() == {"hits": 1, "misses": 4, "hit_ratio": 0.2, "size": 2}
+
+
+def test_saved_vectors_are_reused_only_by_the_same_model(tmp_path):
+    path = tmp_path / "query_embeddings.json"
+    cache = CachedTextEmbedder(_CountingEmbedder(), path=path)
+    stored = cache.run(text="q")["embedding"]
+    cache.save()
+
+    reloaded = _CountingEmbedder()
+    assert CachedTextEmbedder(reloaded, path=path).run(text="q")["embedding"] == stored
+    assert reloaded.calls == 0
+
+    other_model = _CountingEmbedder(model="other")
+    CachedTextEmbedder(other_model, path=path).run(text="q")
+    assert other_model.calls == 1
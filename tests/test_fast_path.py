@@ -0,0 +1,37 @@
+import datetime
+import decimal
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.fast_path import AnswerShapeRouter  # noqa: E402
+
+
+def _run(router, columns, rows, truncated=False):
+    table = {"columns": columns, "rows": rows, "row_count": len(rows), "truncated": truncated}
+    return router.run(results=["rendered result"], tables=[table])
+
+
+def test_simple_shapes_get_a_templated_answer():
+    router = AnswerShapeRouter()
+    assert _run(router, ["violation_count"], [(42,)])["answer"] == "The violation count is 42."
+    assert _run(router, ["x"], [])["answer"] == "No matching records were found."
+    assert _run(router, ["avg"], [(decimal.Decimal("2.504"),)])["answer"] == "The avg is 2.5."
+
+    output = _run(router, ["department", "violation_count"], [("Logistics", 3), ("Production", 1)])
+    assert output["answer"] == "Violation count by department - Logistics: 3, Production: 1."
+    assert output["shape"] == {"shape": "group_by", "fast_path": True, "rows": 2, "columns": 2,
+                               "skipped_result_chars": len("rendered result")}
+
+    output = _run(router, ["name", "violation_time"], [("Ann", datetime.datetime(2024, 5, 1, 8, 30))])
+    assert output["answer"] == "Found one matching record - name: Ann; violation time: 2024-05-01 08:30."
+
+
+def test_complex_truncated_or_disabled_results_go_to_the_explainer():
+    router = AnswerShapeRouter(max_list_rows=2)
+    output = _run(router, ["name"], [("a",), ("b",), ("c",)])
+    assert output == {"results": ["rendered result"], "shape": output["shape"]}
+    assert output["shape"]["shape"] == "complex"
+    assert "answer" not in _run(router, ["n"], [(1,)], truncated=True)
+    assert "answer" not in _run(AnswerShapeRouter(enabled=False), ["n"], [(1,)])
+    assert "answer" not in router.run(results=["Query executed successfully"], tables=[None])
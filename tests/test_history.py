@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+from haystack.dataclasses import ChatMessage
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.history import compact_history, is_follow_up  # noqa: E402
+
+
+def _conversation(turns: int) -> list[ChatMessage]:
+    history = []
+    for i in range(turns):
+        history.append(ChatMessage.from_user(f"question {i}"))
+        history.append(ChatMessage.from_assistant(f"answer {i} " + "x" * 500, meta={"sql": f"SELECT {i}"}))
+    return history
+
+
+def test_keeps_recent_turns_with_their_sql_and_a_short_answer():
+    payload, stats = compact_history(_conversation(6), recent_turns=2, max_assistant_chars=20, budget_tokens=10_000)
+    assert [m["content"] for m in payload if m["role"] == "user"] == ["question 4", "question 5"]
+    assert payload[-1]["content"].startswith("SQL: SELECT 5 | Answer: answer 5")
+    assert len(payload[-1]["content"]) < 60
+    assert stats["turns_before"] == 6 and stats["turns_after"] == 2
+    assert stats["tokens_after"] < stats["tokens_before"]
+
+
+def test_drops_oldest_turns_to_fit_the_budget_but_keeps_the_newest():
+    payload, stats = compact_history(_conversation(4), recent_turns=4, max_assistant_chars=200, budget_tokens=80)
+    assert stats["turns_after"] < 4 and stats["tokens_after"] <= 80
+    assert payload[-1]["content"].startswith("SQL: SELECT 3")
+
+    payload, stats = compact_history(_conversation(2), recent_turns=2, max_assistant_chars=200, budget_tokens=1)
+    assert stats["turns_after"] == 1
+
+
+def test_errors_shrink_to_the_failed_sql_and_the_current_question_is_left_out():
+    history = [
+        ChatMessage.from_user("count them"),
+        ChatMessage.from_assistant("Error: relation does not exist\n" + "trace " * 100, meta={"sql": "SELECT * FROM nope"}),
+        ChatMessage.from_user("count violations"),
+    ]
+    payload, _ = compact_history(history, question="count violations")
+    assert [m["content"] for m in payload] == ["count them", "SQL: SELECT * FROM nope (failed)"]
+
+
+def test_follow_up_needs_earlier_turns_and_a_reference_back():
+    earlier = _conversation(1)
+    assert is_follow_up("And those from last month?", earlier)
+    assert is_follow_up("What about Logistics?", earlier)
+    assert not is_follow_up("And those from last month?", [])
+    assert not is_follow_up("How many violations occurred previous month?", earlier)
+    assert not is_follow_up("How many violations are there?", earlier)
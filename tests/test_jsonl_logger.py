@@ -0,0 +1,53 @@
+import gzip
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.jsonl_logger import AsyncJsonlLogger  # noqa: E402
+
+
+def _read(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_records_are_trimmed_before_writing(tmp_path):
+    logger = AsyncJsonlLogger(tmp_path / "results.jsonl", max_field_chars=10, max_list_items=2,
+                              drop_fields={"chat_history", "prompt.prompt"}, flush_interval=0.05)
+    logger.log({
+        "question": "q" * 25,
+        "chat_history": ["dropped"],
+        "prompt": {"prompt": "dropped", "kept": 1},
+        "rows": [1, 2, 3, 4],
+        "other": {1, 2},
+    })
+    logger.close()
+
+    [record] = _read(tmp_path / "results.jsonl")
+    assert record["question"] == "q" * 10 + "...[+15 chars]"
+    assert "chat_history" not in record and record["prompt"] == {"kept": 1}
+    assert record["rows"] == [3, 4]
+    assert isinstance(record["other"], str)
+
+
+def test_unserializable_record_does_not_lose_the_batch(tmp_path):
+    logger = AsyncJsonlLogger(tmp_path / "results.jsonl", serializer=lambda value: 1 / 0, flush_interval=0.05)
+    logger.log({"n": 1})
+    logger.log({"bad": object()})
+    logger.log({"n": 2})
+    logger.close()
+    assert [r.get("n") for r in _read(tmp_path / "results.jsonl")] == [1, 2]
+
+
+def test_full_file_is_rotated_into_a_gzipped_segment(tmp_path):
+    path = tmp_path / "results.jsonl"
+    logger = AsyncJsonlLogger(path, max_bytes=200, batch_size=1, flush_interval=0.05)
+    for i in range(10):
+        logger.log({"n": i, "text": "x" * 50})
+    logger.close()
+
+    segments = sorted(tmp_path.glob("results-*.jsonl.gz"))
+    assert segments and not list(tmp_path.glob("results-*.jsonl"))
+    rotated = [json.loads(line) for segment in segments for line in gzip.open(segment, "rt", encoding="utf-8")]
+    current = _read(path) if path.exists() else []
+    assert sorted(r["n"] for r in rotated + current) == list(range(10))
@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils import result_cache  # noqa: E402
+from utils.result_cache import ResultCache, canonicalize_sql  # noqa: E402
+
+
+def _key(sql: str) -> str:
+    return canonicalize_sql(sql)["key"]
+
+
+def test_aliases_named_after_functions_keep_distinct_keys():
+    pairs = [
+        ("SELECT MAX(violation_time) AS max FROM violations", "SELECT MIN(violation_time) AS min FROM violations"),
+        ("SELECT COUNT(*) AS count FROM violations", "SELECT SUM(fine) AS sum FROM violations"),
+        ("SELECT lower(status) AS lower FROM violations", "SELECT upper(status) AS upper FROM violations"),
+    ]
+    for a, b in pairs:
+        assert _key(a) != _key(b), (a, b)
+
+
+def test_formatting_and_alias_names_share_a_key():
+    assert _key("SELECT COUNT(*) AS total FROM violations;") == _key("select count(*)   as n\nfrom violations -- all")
+    assert _key("SELECT MAX(violation_time) AS max FROM violations") == \
+        _key("SELECT MAX(violation_time) AS latest FROM violations")
+    assert _key("SELECT v.status FROM violations v WHERE v.fine > 10") == \
+        _key("select X.status from violations X where X.fine > 10")
+
+
+def test_alias_shadowing_a_column_is_not_renamed():
+    known = frozenset({"violations", "status", "department"})
+    a = canonicalize_sql("SELECT department AS status FROM violations ORDER BY status", known)
+    b = canonicalize_sql("SELECT department AS d FROM violations ORDER BY status", known)
+    assert a["key"] != b["key"]
+
+
+def test_tables_and_volatile_functions():
+    canonical = canonicalize_sql(
+        "WITH recent AS (SELECT * FROM violations WHERE violation_time > NOW() - INTERVAL '1 day') "
+        "SELECT d.name FROM recent r JOIN public.departments d ON d.id = r.department_id"
+    )
+    assert canonical["tables"] == {"violations", "departments"}
+    assert canonical["volatile"]
+    assert not canonicalize_sql("SELECT * FROM violations")["volatile"]
+
+
+def _cache(monkeypatch, versions: dict, **kwargs) -> ResultCache:
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE violations (id INTEGER, status TEXT)"))
+    monkeypatch.setattr(result_cache, "get_table_versions", lambda _engine, tables: tuple(
+        (name, versions.get(name, 0)) for name in tables))
+    return ResultCache(engine, tables=("violations",), version_check_interval=0, **kwargs)
+
+
+def test_result_cache_hit_maps_columns_back_to_aliases(monkeypatch):
+    cache = _cache(monkeypatch, {"violations": 1})
+    first = cache.prepare("SELECT COUNT(*) AS total FROM violations")
+    cache.put(first, {"columns": ["total"], "rows": [[3]], "row_count": 1, "truncated": False},
+              cache.versions_for_write())
+
+    hit = cache.get(cache.prepare("select count(*) as n from violations"))
+    assert hit["columns"] == ["n"] and hit["rows"] == [[3]]
+    assert cache.get(cache.prepare("SELECT MAX(id) AS max FROM violations")) is None
+
+
+def test_result_cache_drops_entries_after_a_write(monkeypatch):
+    versions = {"violations": 1}
+    cache = _cache(monkeypatch, versions)
+    canonical = cache.prepare("SELECT status FROM violations")
+    cache.put(canonical, {"columns": ["status"], "rows": [["open"]], "row_count": 1, "truncated": False},
+              cache.versions_for_write())
+    assert cache.get(canonical) is not None
+
+    versions["violations"] = 2
+    assert cache.get(canonical) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_result_cache_skips_untracked_tables_and_writes(monkeypatch):
+    cache = _cache(monkeypatch, {})
+    assert cache.prepare("SELECT * FROM chat_messages") is None
+    assert cache.prepare("DELETE FROM violations") is None
@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.config import SCHEMA_EXCLUDE_TABLES  # noqa: E402
+from utils.schema_catalog import SchemaCatalog  # noqa: E402
+
+
+@pytest.fixture
+def engine():
+    # One shared connection with an attached "public" schema, as in Postgres
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as connection:
+        connection.execute(text("ATTACH DATABASE ':memory:' AS public"))
+        connection.execute(text("CREATE TABLE public.departments (id INTEGER PRIMARY KEY, department_name TEXT)"))
+        connection.execute(text(
+            "CREATE TABLE public.violations (id INTEGER PRIMARY KEY, status TEXT, violation_time TIMESTAMP, "
+            "department_id INTEGER REFERENCES departments(id))"
+        ))
+        connection.execute(text("CREATE TABLE public.chat_sessions (id TEXT PRIMARY KEY, start_time TIMESTAMP)"))
+        connection.execute(text("CREATE TABLE public.chat_messages (id INTEGER PRIMARY KEY, content TEXT)"))
+        connection.execute(text("INSERT INTO public.departments VALUES (1, 'Logistics'), (2, 'Production')"))
+        connection.execute(text("INSERT INTO public.violations VALUES (1, 'Resolved', NULL, 1), (2, 'In Progress', NULL, 2)"))
+        connection.execute(text("INSERT INTO public.chat_messages VALUES (1, 'my private question')"))
+    return engine
+
+
+def _catalog(engine, **kwargs) -> SchemaCatalog:
+    catalog = SchemaCatalog(engine, exclude_tables=SCHEMA_EXCLUDE_TABLES, default_tables=("violations",), **kwargs)
+    # information_schema fingerprint is Postgres-only; a fixed one keeps the catalog built once
+    catalog._current_fingerprint = lambda: "fixed"
+    return catalog
+
+
+def test_question_selects_matching_tables_with_their_join_partners(engine):
+    schema_text, tables = _catalog(engine).render("How many Resolved violations are there?")
+    assert tables == ["violations", "departments"]
+    assert "- department_id (INTEGER) references departments.id" in schema_text
+    assert "values: 'In Progress', 'Resolved'" in schema_text
+
+
+def test_unmatched_question_falls_back_to_the_default_tables(engine):
+    _, tables = _catalog(engine).render("Give me a summary")
+    assert tables == ["violations", "departments"]
+
+
+def test_chat_tables_are_never_described(engine):
+    catalog = _catalog(engine)
+    assert not {"chat_sessions", "chat_messages"} & set(catalog.tables())
+    schema_text, tables = catalog.render("Show the start time of my private question messages")
+    assert "chat" not in " ".join(tables) and "private question" not in schema_text
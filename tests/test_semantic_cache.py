@@ -0,0 +1,75 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils import semantic_cache as semantic_cache_module  # noqa: E402
+from utils.semantic_cache import SemanticCache  # noqa: E402
+from utils.template_store import TemplateStore  # noqa: E402
+
+VERSION = (("violations", 1),)
+
+
+class _ConstantEmbedder:
+    """Embeds every text to the same vector, like MiniLM for questions that differ in one value."""
+
+    def run(self, text: str):
+        return {"embedding": [1.0, 0.0, 0.0]}
+
+
+def _template_store(tmp_path) -> TemplateStore:
+    spec = {
+        "slots": {
+            "department": {"values": {"Logistics": "Logistics", "Production": "Production"}},
+            "status": {"values": {"Resolved": "Resolved"}, "synonyms": {"closed": "Resolved"}},
+        },
+        "templates": [],
+    }
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps(spec), encoding="utf-8")
+    return TemplateStore(path, embedder=_ConstantEmbedder())
+
+
+def test_questions_differing_in_a_slot_value_do_not_share_an_answer(tmp_path):
+    store = _template_store(tmp_path)
+    cache = SemanticCache(threshold=0.92)
+    embedding = _ConstantEmbedder().run("")["embedding"]
+
+    first = "How many violations are in Logistics?"
+    cache.store(first, embedding, VERSION, {"answer": "12"}, store.literals(first))
+
+    assert cache.lookup(embedding, VERSION, store.literals("How many violations are in Production?")) is None
+    hit = cache.lookup(embedding, VERSION, store.literals("how many violations does logistics have"))
+    assert hit is not None and hit["payload"] == {"answer": "12"}
+
+
+def test_literals_cover_synonyms_dates_and_names(tmp_path):
+    store = _template_store(tmp_path)
+    assert store.literals("How many closed violations?") == store.literals("How many Resolved violations?")
+    assert store.literals("Violations on 2024-05-01") != store.literals("Violations on 2024-06-01")
+    assert store.literals("How many violations did John Smith get?") == frozenset({"john smith"})
+
+
+def test_lookup_needs_threshold_and_data_version():
+    cache = SemanticCache(threshold=0.9)
+    cache.store("q", [1.0, 0.0], VERSION, {"answer": "a"})
+    assert cache.lookup([0.0, 1.0], VERSION) is None
+    assert cache.lookup([1.0, 0.05], VERSION) is not None
+    assert cache.lookup([1.0, 0.0], (("violations", 2),)) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_and_expired_entries_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module.time, "time", lambda: now[0])
+    cache = SemanticCache(threshold=0.99, max_size=2, ttl_seconds=60)
+    cache.store("a", [1.0, 0.0, 0.0], VERSION, {"answer": "a"})
+    cache.store("b", [0.0, 1.0, 0.0], VERSION, {"answer": "b"})
+    assert cache.lookup([1.0, 0.0, 0.0], VERSION) is not None  # "a" is now the most recent
+    cache.store("c", [0.0, 0.0, 1.0], VERSION, {"answer": "c"})
+    assert cache.lookup([0.0, 1.0, 0.0], VERSION) is None
+    assert cache.lookup([1.0, 0.0, 0.0], VERSION)["question"] == "a"
+
+    now[0] += 61
+    assert cache.lookup([1.0, 0.0, 0.0], VERSION) is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from utils.sql_guard import CostGuard, QueryRejected  # noqa: E402
+
+
+class _Result:
+    def __init__(self, plan):
+        self._plan = plan
+
+    def scalar_one(self):
+        return self._plan
+
+
+class _ExplainConnection:
+    """Answers EXPLAIN with fixed estimates; the wrapped, limited query gets `limited_cost`."""
+
+    def __init__(self, cost: float, rows: float, limited_cost: float = 10.0):
+        self.cost, self.rows, self.limited_cost = cost, rows, limited_cost
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        cost = self.limited_cost if "AS guarded LIMIT" in sql else self.cost
+        return _Result([{"Plan": {"Total Cost": cost, "Plan Rows": self.rows}}])
+
+
+def test_small_query_is_allowed_unchanged():
+    guard = CostGuard(max_cost=1000, max_rows=100)
+    decision = guard.check(_ExplainConnection(cost=50, rows=10), "SELECT * FROM violations;")
+    assert decision["action"] == "allowed" and decision["sql"] == "SELECT * FROM violations"
+
+
+def test_large_result_without_limit_is_wrapped_in_one():
+    guard = CostGuard(max_cost=1000, max_rows=100, limit_rows=500)
+    connection = _ExplainConnection(cost=5000, rows=1_000_000, limited_cost=20)
+    decision = guard.check(connection, "SELECT * FROM violations ORDER BY violation_time")
+    assert decision["action"] == "limited" and decision["cost"] == 20
+    assert decision["sql"].endswith(") AS guarded LIMIT 500")
+    assert decision["sql"].startswith("SELECT * FROM (\nSELECT * FROM violations ORDER BY violation_time\n)")
+
+
+def test_own_limit_is_kept_and_expensive_queries_are_rejected():
+    guard = CostGuard(max_cost=1000, max_rows=100)
+    decision = guard.check(_ExplainConnection(cost=50, rows=1_000_000), "SELECT * FROM violations LIMIT 10")
+    assert decision["action"] == "allowed"
+    with pytest.raises(QueryRejected):
+        guard.check(_ExplainConnection(cost=5000, rows=1_000_000), "SELECT * FROM violations LIMIT 10")
+    assert guard.stats() == {"checked": 2, "allowed": 1, "limited": 0, "rejected": 1}
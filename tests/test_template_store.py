@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+from utils.template_store import TemplateStore  # noqa: E402
+
+
+class _ConstantEmbedder:
+    """Every text gets the same vector, so only the keyword, slot and modifier checks decide."""
+
+    def run(self, text: str):
+        return {"embedding": [1.0, 0.0]}
+
+
+@pytest.fixture
+def store():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE departments (department_name TEXT)"))
+        connection.execute(text("INSERT INTO departments VALUES ('Logistics'), ('Production')"))
+        connection.execute(text("CREATE TABLE violations (status TEXT, area TEXT, violation_type TEXT)"))
+        connection.execute(text(
+            "INSERT INTO violations VALUES ('Resolved', 'Logistics Hub', 'Smoking violation'), "
+            "('In Progress', 'Workshop Floor', 'Arriving late')"
+        ))
+    return TemplateStore(ROOT / "data" / "sql_templates.json", embedder=_ConstantEmbedder(), engine=engine)
+
+
+def test_slot_values_are_quoted_into_the_template(store):
+    match = store.match("How many violations are in Logistics?")
+    assert match["hit"] and match["template"] == "count_in_department"
+    assert match["sql"].endswith("WHERE department = 'Logistics'")
+
+    match = store.match("How many closed violations are there?")
+    assert match["template"] == "count_with_status" and match["slots"] == {"status": "Resolved"}
+
+    match = store.match("How many violations occurred previous month?")
+    assert match["template"] == "count_in_period"
+
+
+def test_unfiltered_template_needs_a_question_without_extra_values(store):
+    assert store.match("How many violations are there?")["template"] == "count_all"
+    for question in ("How many violations did John Smith get?", "How many violations are there in 2023?",
+                     'How many violations mention "forklift"?'):
+        match = store.match(question)
+        assert not match["hit"] and match["reason"] == "unknown_value", question
+
+
+def test_modifiers_follow_ups_and_extra_slots_go_to_the_llm(store):
+    assert store.match("How many violations are there on average?")["reason"] == "modifier"
+    assert store.match("How many of those are there?")["reason"] == "follow_up"
+    assert store.match("And how many violations in Production?")["reason"] == "follow_up"
+    assert not store.match("How many violations are there in Logistics and Production?")["hit"]
+
+
+def test_literals_name_the_slot_values(store):
+    assert store.literals("how many violations in the logistics hub") == frozenset({"area=Logistics Hub"})
@@ -0,0 +1,50 @@
+import json
+import re
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "scripts"))
+import visualize_script  # noqa: E402
+
+
+def _append_entries(log_path: Path, start: int, stop: int):
+    with open(log_path, "a", encoding="utf-8") as f:
+        for i in range(start, stop):
+            f.write(json.dumps({"question": f"q{i}", "execution_time": 1.0, "router": {"sql": "x"}}) + "\n")
+
+
+def _rendered_entries(pages_dir: Path) -> list[int]:
+    entries = []
+    for page in sorted(pages_dir.glob("page-*.html")):
+        entries.extend(int(n) for n in re.findall(r'<a id="entry-(\d+)">', page.read_text(encoding="utf-8")))
+    return entries
+
+
+def test_entry_pages_rerender_partial_last_page(tmp_path):
+    log_dir, store_dir, out_dir = tmp_path / "logs", tmp_path / "store", tmp_path / "analytics"
+    log_dir.mkdir()
+    log_path = log_dir / "results.jsonl"
+
+    _append_entries(log_path, 0, 150)
+    visualize_script.ingest_logs(log_dir, store_dir)
+    assert visualize_script.write_entry_pages(store_dir, out_dir, page_size=100) == 2
+
+    _append_entries(log_path, 150, 250)
+    visualize_script.ingest_logs(log_dir, store_dir)
+    assert visualize_script.write_entry_pages(store_dir, out_dir, page_size=100) == 3
+
+    pages_dir = out_dir / "entries"
+    assert _rendered_entries(pages_dir) == list(range(250))
+    assert 'href="page-00003.html">Next' in (pages_dir / "page-00002.html").read_text(encoding="utf-8")
+
+
+def test_entry_pages_start_over_when_page_size_changes(tmp_path):
+    log_dir, store_dir, out_dir = tmp_path / "logs", tmp_path / "store", tmp_path / "analytics"
+    log_dir.mkdir()
+    _append_entries(log_dir / "results.jsonl", 0, 120)
+    visualize_script.ingest_logs(log_dir, store_dir)
+
+    visualize_script.write_entry_pages(store_dir, out_dir, page_size=100)
+    assert visualize_script.write_entry_pages(store_dir, out_dir, page_size=50) == 3
+    page_1 = (out_dir / "entries" / "page-00001.html").read_text(encoding="utf-8")
+    assert re.findall(r'<a id="entry-(\d+)">', page_1) == [str(n) for n in range(50)]
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from haystack.document_stores.in_memory import InMemoryDocumentStore
+from haystack.document_stores.types import DuplicatePolicy
+from sqlalchemy import text
+
+
+class SyncedBM25Index:
+    """
+    BM25 index over the pgvector knowledge table, persisted on local disk.
+
+    Startup loads the last snapshot instead of reading every document (and
+    its embedding) from pgvector. `sync()` then compares an md5 of content and
+    meta per document id with the hashes saved alongside the snapshot and only
+    fetches new or changed documents; ids that disappeared are dropped. The
+    updated index is built in a second store and swapped into the attached
+    retrievers, so running BM25 queries never see a half-written index.
+    """
+
+    def __init__(self, engine, document_store, path: str | Path, table_name: str, sync_interval: float = 60.0,
+                 fetch_batch_size: int = 500):
+        self._engine = engine
+        self._document_store = document_store
+        self.path = Path(path)
+        self.hashes_path = self.path.with_name(f"{self.path.stem}.hashes.json")
+        self.table_name = table_name
+        self.sync_interval = sync_interval
+        self.fetch_batch_size = fetch_batch_size
+
+        self.store = InMemoryDocumentStore()
+        self._hashes: dict[str, str] = {}
+        self._retrievers = []
+        self._retired = None
+        self._sync_lock = threading.Lock()
+        self._last_sync = 0.0
+        self.last_stats: dict = {}
+
+    def load(self) -> bool:
+        """Loads the snapshot from disk; returns False when there is none (or it is unreadable)."""
+        try:
+            store = InMemoryDocumentStore.load_from_disk(str(self.path))
+            with open(self.hashes_path, encoding="utf-8") as f:
+                hashes = json.load(f)
+        except Exception:
+            return False
+        self._swap(store, hashes)
+        return True
+
+    def attach(self, retriever):
+        """Points the retriever at the current index and keeps it updated on every sync."""
+        retriever.document_store = self.store
+        self._retrievers.append(retriever)
+        return retriever
+
+    def _remote_hashes(self) -> dict[str, str]:
+        # Only ids and hashes cross the wire, not contents or embeddings
+        query = text(
+            f'SELECT id, md5(coalesce(content, \'\') || coalesce(meta::text, \'\')) AS hash FROM "{self.table_name}"'
+        )
+        with self._engine.connect() as connection:
+            return {doc_id: digest for doc_id, digest in connection.execute(query)}
+
+    def _fetch(self, ids: list[str]):
+        documents = []
+        for start in range(0, len(ids), self.fetch_batch_size):
+            batch = ids[start:start + self.fetch_batch_size]
+            found = self._document_store.filter_documents(filters={"field": "id", "operator": "in", "value": batch})
+            # BM25 only needs the text, the embeddings would just bloat memory and the snapshot
+            documents.extend(replace(doc, embedding=None) for doc in found)
+        return documents
+
+    def sync(self) -> dict:
+        """Applies new, changed and deleted documents of the pgvector table to the index."""
+        with self._sync_lock:
+            start = time.perf_counter()
+            remote = self._remote_hashes()
+            changed = [doc_id for doc_id, digest in remote.items() if self._hashes.get(doc_id) != digest]
+            deleted = [doc_id for doc_id in self._hashes if doc_id not in remote]
+            stats = {
+                "documents": len(remote),
+                "added": sum(1 for doc_id in changed if doc_id not in self._hashes),
+                "changed": sum(1 for doc_id in changed if doc_id in self._hashes),
+                "deleted": len(deleted),
+            }
+            if changed or deleted:
+                fetched = self._fetch(changed)
+                keep = set(remote) - set(changed)
+                store = self._spare_store()
+                store.write_documents(
+                    [doc for doc in self.store.storage.values() if doc.id in keep] + fetched,
+                    policy=DuplicatePolicy.OVERWRITE
+                )
+                # Documents deleted between the hash scan and the fetch are simply not in `fetched`
+                hashes = {doc.id: remote[doc.id] for doc in fetched if doc.id in remote}
+                hashes.update({doc_id: self._hashes[doc_id] for doc_id in keep if doc_id in self._hashes})
+                self._swap(store, hashes)
+                self._save()
+            self._last_sync = time.monotonic()
+            stats["seconds"] = time.perf_counter() - start
+            self.last_stats = stats
+            return stats
+
+    def maybe_sync(self):
+        """Starts a background sync when the last one is older than `sync_interval`."""
+        if time.monotonic() - self._last_sync < self.sync_interval or self._sync_lock.locked():
+            return
+        # Claim the interval right away so concurrent sessions don't start several syncs
+        self._last_sync = time.monotonic()
+        threading.Thread(target=self._sync_quietly, name="bm25-sync", daemon=True).start()
+
+    def _sync_quietly(self):
+        try:
+            self.sync()
+        except Exception as e:
+            # The previous index keeps serving, the next interval retries
+            self.last_stats = {"error": str(e)}
+
+    def _swap(self, store, hashes: dict[str, str]):
+        previous = self.store
+        self.store = store
+        self._hashes = hashes
+        for retriever in self._retrievers:
+            retriever.document_store = store
+        # Queries that started before the swap may still read it, it is reused by the next sync
+        self._retired = previous
+
+    def _spare_store(self) -> InMemoryDocumentStore:
+        """
+        The store to build the next index in. InMemoryDocumentStore keeps its
+        data in module-level storages that are never freed, so rather than
+        creating a store per sync, the one retired by the previous swap (no
+        longer in use one sync later) is emptied and refilled: at most two
+        stores ever exist.
+        """
+        spare, self._retired = self._retired, None
+        if spare is None:
+            return InMemoryDocumentStore(
+                bm25_tokenization_regex=self.store.bm25_tokenization_regex,
+                bm25_algorithm=self.store.bm25_algorithm,
+                bm25_parameters=self.store.bm25_parameters,
+            )
+        spare.delete_documents(list(spare.storage))
+        return spare
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.store.save_to_disk(str(tmp_path))
+        os.replace(tmp_path, self.path)
+        tmp_hashes = self.hashes_path.with_name(self.hashes_path.name + ".tmp")
+        with open(tmp_hashes, "w", encoding="utf-8") as f:
+            json.dump(self._hashes, f)
+        os.replace(tmp_hashes, self.hashes_path)
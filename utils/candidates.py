@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from haystack import component
+from haystack.dataclasses import StreamingChunk
+from sqlalchemy import text
+
+
+class _Cancelled(Exception):
+    """Raised from the streaming callback to stop a candidate that lost the race."""
+
+
+@component
+class MultiCandidateGenerator:
+    """
+    Drop-in replacement for the `llm` component that asks the generator for
+    several SQL candidates at once and returns the first one that is valid.
+
+    Candidate i uses temperatures[i % len(temperatures)] and seed + i. Each
+    reply is validated as soon as it is complete: the extracted SQL must start
+    with SELECT/WITH and pass EXPLAIN (planner cost under `max_cost`) in a
+    read-only transaction. The first valid candidate wins and the others are
+    cancelled by closing their token stream, which makes Ollama stop
+    generating. A no_answer reply only wins when no candidate produced valid
+    SQL; when nothing is valid the first candidate is returned so the usual
+    error path reports it.
+
+    Ollama only runs the candidates in parallel with OLLAMA_NUM_PARALLEL >= n.
+    """
+
+    def __init__(self, generator, engine, sql_extractor: Callable[[str], str], n: int = 3,
+                 temperatures=(0.0, 0.3, 0.7), seed: int = 42, max_cost: Optional[float] = None):
+        self.generator = generator
+        self._engine = engine
+        self.sql_extractor = sql_extractor
+        self.n = n
+        self.temperatures = tuple(temperatures)
+        self.seed = seed
+        self.max_cost = max_cost
+        self._executor = ThreadPoolExecutor(max_workers=max(1, n) * 2, thread_name_prefix="sql-candidate")
+        self._lock = threading.Lock()
+        self.counts = {"runs": 0, "no_valid": 0, "wins_by_candidate": {}, "failures": {}}
+
+    def warm_up(self):
+        if hasattr(self.generator, "warm_up"):
+            self.generator.warm_up()
+
+    def _validate(self, reply: str) -> Optional[str]:
+        """None for valid SQL, otherwise the reason it failed."""
+        sql = self.sql_extractor(reply).strip().rstrip(";").strip()
+        if "no_answer" in sql.lower():
+            return "no_answer"
+        if not sql.lower().startswith(("select", "with")):
+            return "not_select"
+        try:
+            with self._engine.connect() as connection, connection.begin():
+                connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+                plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+        except Exception:
+            return "explain_error"
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        if self.max_cost is not None and isinstance(plan, list) and plan[0]["Plan"]["Total Cost"] > self.max_cost:
+            return "too_expensive"
+        return None
+
+    def _candidate(self, index: int, prompt: str, generation_kwargs: dict, cancel: threading.Event) -> dict:
+        start = time.perf_counter()
+        kwargs = {
+            **generation_kwargs,
+            "temperature": self.temperatures[index % len(self.temperatures)],
+            "seed": self.seed + index,
+        }
+
+        def stop_when_cancelled(chunk: StreamingChunk):
+            if cancel.is_set():
+                raise _Cancelled()
+
+        try:
+            result = self.generator.run(prompt=prompt, generation_kwargs=kwargs, streaming_callback=stop_when_cancelled)
+        except _Cancelled:
+            return {"index": index, "status": "cancelled", "seconds": time.perf_counter() - start}
+        generated = time.perf_counter() - start
+        reply = result["replies"][0]
+        failure = self._validate(reply)
+        return {
+            "index": index,
+            "status": "valid" if failure is None else failure,
+            "reply": reply,
+            "meta": result["meta"][0] if result.get("meta") else {},
+            "temperature": kwargs["temperature"],
+            "generate_seconds": generated,
+            "seconds": time.perf_counter() - start,
+        }
+
+    @component.output_types(replies=list[str], meta=list[dict[str, Any]], candidates=dict)
+    def run(self, prompt: str, generation_kwargs: Optional[dict[str, Any]] = None, *,
+            streaming_callback: Optional[Callable[[StreamingChunk], None]] = None):
+        start = time.perf_counter()
+        cancel = threading.Event()
+        pending = {
+            self._executor.submit(self._candidate, index, prompt, generation_kwargs or {}, cancel)
+            for index in range(self.n)
+        }
+        finished, winner, errors = [], None, 0
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    outcome = future.result()
+                except Exception:
+                    # Ollama unreachable or similar, the other candidates may still succeed
+                    errors += 1
+                    continue
+                finished.append(outcome)
+                if winner is None and outcome["status"] == "valid":
+                    winner = outcome
+        cancel.set()
+        winner_seconds = time.perf_counter() - start
+
+        if winner is None:
+            if not finished:
+                raise RuntimeError(f"All {self.n} SQL candidates failed")
+            no_answer = [c for c in finished if c["status"] == "no_answer"]
+            winner = no_answer[0] if no_answer else min(finished, key=lambda c: c["index"])
+
+        with self._lock:
+            self.counts["runs"] += 1
+            if winner["status"] == "valid":
+                wins = self.counts["wins_by_candidate"]
+                wins[winner["index"]] = wins.get(winner["index"], 0) + 1
+            else:
+                self.counts["no_valid"] += 1
+            for candidate in finished:
+                if candidate["status"] not in ("valid", "no_answer"):
+                    failures = self.counts["failures"]
+                    failures[candidate["status"]] = failures.get(candidate["status"], 0) + 1
+
+        if streaming_callback is not None:
+            # The chat shows the chosen SQL once, as a completed stream
+            streaming_callback(StreamingChunk(winner["reply"], {"done": True}))
+
+        candidates = {
+            "n": self.n,
+            "winner": winner["index"],
+            "winner_status": winner["status"],
+            "winner_temperature": winner.get("temperature"),
+            "seconds_to_winner": winner_seconds,
+            # Outcomes seen before the winner; the rest were cancelled while generating
+            "finished": [{k: c.get(k) for k in ("index", "status", "temperature", "seconds")} for c in finished],
+            "cancelled": self.n - len(finished) - errors,
+            "errors": errors,
+        }
+        return {"replies": [winner["reply"]], "meta": [winner["meta"]], "candidates": candidates}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.counts["runs"],
+                "no_valid": self.counts["no_valid"],
+                "wins_by_candidate": dict(self.counts["wins_by_candidate"]),
+                "failures": dict(self.counts["failures"]),
+            }
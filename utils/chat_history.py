@@ -0,0 +1,66 @@
+from functools import lru_cache
+
+from haystack.dataclasses import ChatMessage
+from sqlalchemy import column, insert, inspect, table, text
+
+chat_messages = table("chat_messages", column("session_id"), column("role"), column("content"), column("sql"))
+
+
+@lru_cache(maxsize=None)
+def _has_sql_column(engine) -> bool:
+    # Databases created before chat_messages.sql existed keep working, only without the SQL
+    return any(c["name"] == "sql" for c in inspect(engine).get_columns("chat_messages"))
+
+
+def append_chat_messages(engine, session_id, chat_history, persisted_count: int) -> int:
+    """
+    Writes the messages of `chat_history` that are not in the database yet.
+
+    `persisted_count` is how many messages of this session were already
+    written (kept in the Streamlit session state). The new messages go out as
+    one multi-row INSERT, so the cost of a turn depends only on that turn's
+    messages, not on the length of the conversation. The SQL an assistant
+    answer was based on (`meta["sql"]`) is kept too, compacted history needs
+    it after a reload, on databases that have the `sql` column. Returns the
+    new count.
+    """
+    new_messages = chat_history[persisted_count:]
+    if not new_messages:
+        return persisted_count
+
+    rows = [
+        {"session_id": session_id, "role": msg.role.name.lower(), "content": msg.text, "sql": (msg.meta or {}).get("sql")}
+        for msg in new_messages
+    ]
+    if not _has_sql_column(engine):
+        rows = [{k: v for k, v in row.items() if k != "sql"} for row in rows]
+    with engine.begin() as connection:
+        connection.execute(insert(chat_messages).values(rows))
+    return persisted_count + len(new_messages)
+
+
+def get_chat_sessions(engine):
+    with engine.connect() as connection:
+        result = connection.execute(text("SELECT id, start_time FROM chat_sessions ORDER BY start_time DESC"))
+        return result.fetchall()
+
+
+def load_chat_history(engine, session_id):
+    """Load chat message history for a specific chat session."""
+    sql_column = "sql" if _has_sql_column(engine) else "NULL AS sql"
+    with engine.connect() as connection:
+        # Messages written in one statement share a timestamp, id keeps their order
+        result = connection.execute(
+            text(f"SELECT role, content, {sql_column} FROM chat_messages WHERE session_id = :session_id "
+                 "ORDER BY timestamp ASC, id ASC"),
+            {"session_id": session_id}
+        )
+        # Convert database results into a list of ChatMessage objects
+        history = []
+        for row in result.fetchall():
+            role, content, sql = row
+            if role == 'user':
+                history.append(ChatMessage.from_user(content))
+            else:
+                history.append(ChatMessage.from_assistant(content, meta={"sql": sql} if sql else None))
+        return history
@@ -0,0 +1,158 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """Reads a boolean switch such as SEMANTIC_CACHE_ENABLED=true from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# Ollama model for SQL generation and the explainer
+MODEL_NAME = os.getenv("OLLAMA_MODEL", "hf.co/mradermacher/natural-sql-7b-i1-GGUF:Q4_K_M")
+
+# Tables with change markers in public.table_versions (see scripts/setup_db.py)
+TRACKED_TABLES = ("violations", "departments")
+
+# Semantic answer cache (see utils/semantic_cache.py)
+SEMANTIC_CACHE_ENABLED = env_flag("SEMANTIC_CACHE_ENABLED", True)
+SEMANTIC_CACHE_THRESHOLD = env_float("SEMANTIC_CACHE_THRESHOLD", 0.92)
+SEMANTIC_CACHE_MAX_SIZE = env_int("SEMANTIC_CACHE_MAX_SIZE", 256)
+SEMANTIC_CACHE_TTL_SECONDS = env_float("SEMANTIC_CACHE_TTL_SECONDS", 3600.0)
+# Tables whose changes invalidate cached answers
+SEMANTIC_CACHE_TABLES = TRACKED_TABLES
+
+# Result cache of SQLQuery (see utils/result_cache.py)
+RESULT_CACHE_ENABLED = env_flag("RESULT_CACHE_ENABLED", True)
+RESULT_CACHE_MAX_ENTRIES = env_int("RESULT_CACHE_MAX_ENTRIES", 512)
+RESULT_CACHE_MAX_ROWS = env_int("RESULT_CACHE_MAX_ROWS", 10000)
+RESULT_CACHE_VOLATILE_TTL_SECONDS = env_float("RESULT_CACHE_VOLATILE_TTL_SECONDS", 60.0)
+RESULT_CACHE_VERSION_CHECK_INTERVAL = env_float("RESULT_CACHE_VERSION_CHECK_INTERVAL", 1.0)
+
+# Stream SQL and explainer tokens into the chat while the pipeline runs
+STREAMING_ENABLED = env_flag("STREAMING_ENABLED", True)
+
+# Templated answers for simple result shapes instead of the explainer LLM (see utils/fast_path.py)
+FAST_PATH_ENABLED = env_flag("FAST_PATH_ENABLED", True)
+
+# "concurrent" runs the semantic and BM25 retrieval branches in parallel (see utils/retrieval.py),
+# "sequential" keeps them as separate components of the synchronous pipeline
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "concurrent")
+
+# Bounded result fetch in SQLQuery: rows/bytes kept for the UI and explainer, server-side cursor batch size
+SQL_PREVIEW_MAX_ROWS = env_int("SQL_PREVIEW_MAX_ROWS", 200)
+SQL_PREVIEW_MAX_BYTES = env_int("SQL_PREVIEW_MAX_BYTES", 64_000)
+SQL_FETCH_BATCH_SIZE = env_int("SQL_FETCH_BATCH_SIZE", 500)
+
+# Violations table in the UI: rows per page and how long a fetched page is reused
+VIOLATIONS_PAGE_SIZE = env_int("VIOLATIONS_PAGE_SIZE", 50)
+VIOLATIONS_PAGE_TTL_SECONDS = env_int("VIOLATIONS_PAGE_TTL_SECONDS", 30)
+# How long the department/status filter options are reused
+VIOLATIONS_FILTERS_TTL_SECONDS = env_int("VIOLATIONS_FILTERS_TTL_SECONDS", 300)
+
+# Background results.jsonl writer (see utils/jsonl_logger.py)
+RESULT_LOG_MAX_BYTES = env_int("RESULT_LOG_MAX_BYTES", 50_000_000)
+RESULT_LOG_MAX_AGE_SECONDS = env_float("RESULT_LOG_MAX_AGE_SECONDS", 86_400.0)
+RESULT_LOG_BATCH_SIZE = env_int("RESULT_LOG_BATCH_SIZE", 50)
+RESULT_LOG_FLUSH_INTERVAL = env_float("RESULT_LOG_FLUSH_INTERVAL", 1.0)
+RESULT_LOG_MAX_FIELD_CHARS = env_int("RESULT_LOG_MAX_FIELD_CHARS", 8_000)
+RESULT_LOG_MAX_LIST_ITEMS = env_int("RESULT_LOG_MAX_LIST_ITEMS", 20)
+# Comma-separated dotted paths removed from every record, e.g. "chat_history,explain_prompt.prompt"
+RESULT_LOG_DROP_FIELDS = tuple(f.strip() for f in os.getenv("RESULT_LOG_DROP_FIELDS", "").split(",") if f.strip())
+
+# Connection pool shared by all SQLAlchemy users of the app (see utils/db.py)
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = env_float("DB_POOL_TIMEOUT", 30.0)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", True)
+# Server-side limit for every statement, 0 disables it
+DB_STATEMENT_TIMEOUT_MS = env_int("DB_STATEMENT_TIMEOUT_MS", 30_000)
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "llm-sql")
+
+# BM25 index snapshot on local disk, synced from the pgvector knowledge table (see utils/bm25_index.py)
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "output/bm25/bm25_index.json")
+BM25_SYNC_INTERVAL = env_float("BM25_SYNC_INTERVAL", 60.0)
+
+# Sentence embedder used for questions and knowledge documents (see utils/embedders.py):
+# "torch" runs the full-precision model, "onnx-int8" a dynamically quantized ONNX export on CPU
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Local export from scripts/export_onnx_embedder.py, or a hub repo that ships quantized ONNX files
+EMBEDDING_ONNX_MODEL = os.getenv("EMBEDDING_ONNX_MODEL", EMBEDDING_MODEL)
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx2.onnx")
+
+# Question embedding cache in front of the text embedder (see utils/embedding_cache.py), empty path = memory only
+EMBEDDING_CACHE_ENABLED = env_flag("EMBEDDING_CACHE_ENABLED", True)
+EMBEDDING_CACHE_MAX_SIZE = env_int("EMBEDDING_CACHE_MAX_SIZE", 1024)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "output/cache/query_embeddings.json")
+
+# pgvector knowledge table and its ANN index (see utils/knowledge_store.py)
+KNOWLEDGE_TABLE = os.getenv("KNOWLEDGE_TABLE", "haystack_documents_v2")
+# "hnsw" for the approximate index, "exact_nearest_neighbor" for a full scan
+PGVECTOR_SEARCH_STRATEGY = os.getenv("PGVECTOR_SEARCH_STRATEGY", "hnsw")
+HNSW_M = env_int("HNSW_M", 16)
+HNSW_EF_CONSTRUCTION = env_int("HNSW_EF_CONSTRUCTION", 64)
+HNSW_EF_SEARCH = env_int("HNSW_EF_SEARCH", 40)
+
+# Schema catalog for the SQL prompt (see utils/schema_catalog.py): only tables related to the question are described
+SCHEMA_MAX_TABLES = env_int("SCHEMA_MAX_TABLES", 4)
+SCHEMA_MAX_COLUMNS = env_int("SCHEMA_MAX_COLUMNS", 12)
+SCHEMA_SAMPLE_VALUES = env_int("SCHEMA_SAMPLE_VALUES", 8)
+SCHEMA_CHECK_INTERVAL = env_float("SCHEMA_CHECK_INTERVAL", 30.0)
+# Described when no table matches the question
+SCHEMA_DEFAULT_TABLES = ("violations",)
+# App bookkeeping tables that are never offered to the SQL model; the chat tables hold other users' conversations
+SCHEMA_EXCLUDE_TABLES = (
+    "table_versions", "chat_sessions", "chat_messages", KNOWLEDGE_TABLE, f"{KNOWLEDGE_TABLE}_staging",
+) + tuple(
+    t.strip() for t in os.getenv("SCHEMA_EXCLUDE_TABLES", "").split(",") if t.strip()
+)
+
+# Conversation history in the SQL prompt (see utils/history.py), tokens estimated as characters / 4
+HISTORY_TOKEN_BUDGET = env_int("HISTORY_TOKEN_BUDGET", 600)
+HISTORY_RECENT_TURNS = env_int("HISTORY_RECENT_TURNS", 4)
+HISTORY_ASSISTANT_MAX_CHARS = env_int("HISTORY_ASSISTANT_MAX_CHARS", 200)
+
+# Order of the SQL prompt (see template/prompt.py): "classic" keeps history and question first, "prefix_stable"
+# puts rules, schema and knowledge first so Ollama can reuse the cached prefix (compare with benchmark_prompt_layout.py)
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "classic")
+
+# EXPLAIN-based cost guard in SQLQuery (see utils/sql_guard.py): queries above the cost are rejected,
+# results estimated above SQL_GUARD_MAX_ROWS get a LIMIT; execution is read-only with a statement timeout
+SQL_GUARD_ENABLED = env_flag("SQL_GUARD_ENABLED", True)
+SQL_GUARD_MAX_COST = env_float("SQL_GUARD_MAX_COST", 1_000_000.0)
+SQL_GUARD_MAX_ROWS = env_int("SQL_GUARD_MAX_ROWS", 100_000)
+SQL_GUARD_LIMIT_ROWS = env_int("SQL_GUARD_LIMIT_ROWS", 1_000)
+SQL_STATEMENT_TIMEOUT_MS = env_int("SQL_STATEMENT_TIMEOUT_MS", 10_000)
+
+# Parallel SQL candidates (see utils/candidates.py): with more than 1, `llm` generates that many replies
+# concurrently and the first one that passes EXPLAIN is executed. Needs OLLAMA_NUM_PARALLEL >= SQL_CANDIDATES.
+SQL_CANDIDATES = env_int("SQL_CANDIDATES", 1)
+SQL_CANDIDATE_TEMPERATURES = tuple(
+    float(t) for t in os.getenv("SQL_CANDIDATE_TEMPERATURES", "0,0.3,0.7").split(",") if t.strip()
+)
+
+# Verified question -> SQL templates (see utils/template_store.py): a confident match runs the stored SQL
+# directly, without retrieval, prompt and llm
+SQL_TEMPLATES_ENABLED = env_flag("SQL_TEMPLATES_ENABLED", True)
+SQL_TEMPLATES_PATH = os.getenv("SQL_TEMPLATES_PATH", "data/sql_templates.json")
+SQL_TEMPLATE_THRESHOLD = env_float("SQL_TEMPLATE_THRESHOLD", 0.82)
+
+# Per-component spans of every question in results.jsonl under "trace" (see utils/tracing.py);
+# scripts/export_trace.py turns them into a Chrome trace file
+TRACING_ENABLED = env_flag("TRACING_ENABLED", True)
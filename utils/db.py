@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, event
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class PoolMetrics:
+    """Checkout wait times and connect latencies of one pool, safe to update from any thread."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.connect_seconds = 0.0
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self._waits.append(seconds)
+
+    def record_connect(self, seconds: float):
+        with self._lock:
+            self.connects += 1
+            self.connect_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = list(self._waits)
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": 1000 * self.total_wait / self.checkouts if self.checkouts else 0.0,
+                "wait_p95_ms": 1000 * _percentile(waits, 0.95),
+                "wait_max_ms": 1000 * self.max_wait,
+                # Physical connections opened; stays flat once the pool is warm
+                "connects": self.connects,
+                "connect_avg_ms": 1000 * self.connect_seconds / self.connects if self.connects else 0.0,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a free
+    connection and how long new physical connections took to open.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            # Only an exhausted pool is a timeout; connect errors propagate uncounted
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return record
+
+    def recreate(self):
+        # Engine.dispose() swaps in a fresh pool, the counters carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _connect_options(statement_timeout_ms: int) -> str:
+    return f"-c statement_timeout={int(statement_timeout_ms)}"
+
+
+def create_pooled_engine(database_url: str, pool_size: int = 5, max_overflow: int = 10, pool_timeout: float = 30.0,
+                         pool_recycle: int = 1800, pool_pre_ping: bool = True, statement_timeout_ms: int = 30_000,
+                         application_name: str = "llm-sql"):
+    """
+    Creates the engine shared by SQLQuery, the result cache, chat history and
+    the UI queries. Every connection gets a server-side statement_timeout
+    (0 disables it) and an application_name so the app's sessions can be
+    told apart in pg_stat_activity.
+    """
+    engine = create_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        connect_args={
+            "options": _connect_options(statement_timeout_ms),
+            "application_name": application_name,
+        },
+    )
+
+    @event.listens_for(engine, "do_connect")
+    def _start_connect_timer(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def _record_connect(dbapi_connection, conn_rec):
+        started = conn_rec.info.pop("connect_started", None)
+        if started is not None:
+            engine.pool.metrics.record_connect(time.perf_counter() - started)
+
+    return engine
+
+
+def pool_status(engine) -> dict:
+    """Current occupancy of the engine's pool plus its wait/connect metrics."""
+    pool = engine.pool
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update(metrics.snapshot())
+    return status
+
+
+def libpq_connection_string(database_url: str, statement_timeout_ms: int = 30_000,
+                            application_name: str = "llm-sql") -> str:
+    """
+    The DATABASE_URL as a plain libpq URI carrying the same session settings
+    as the pooled engine, for clients that open their own psycopg connection
+    (PgvectorDocumentStore).
+    """
+    url = make_url(database_url).set(drivername="postgresql")
+    params = {key: value for key, value in url.query.items() if isinstance(value, str)}
+    options = _connect_options(statement_timeout_ms)
+    params["options"] = f"{params['options']} {options}" if params.get("options") else options
+    params.setdefault("application_name", application_name)
+    base = url.set(query={}).render_as_string(hide_password=False)
+    # libpq only percent-decodes, so spaces must not be encoded as '+'
+    return base + "?" + "&".join(f"{key}={quote(value, safe='')}" for key, value in params.items())
@@ -0,0 +1,32 @@
+from haystack.components.embedders import SentenceTransformersDocumentEmbedder, SentenceTransformersTextEmbedder
+
+from utils.config import EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_ONNX_FILE, EMBEDDING_ONNX_MODEL
+
+EMBEDDING_BACKENDS = ("torch", "onnx-int8")
+
+
+def embedder_kwargs(backend: str = EMBEDDING_BACKEND) -> dict:
+    """
+    Constructor arguments shared by the text and document embedders.
+
+    Both backends produce the same 384-dim vectors up to quantization error,
+    so documents indexed with one backend can be searched with the other;
+    scripts/benchmark_embedders.py measures how close they are.
+    """
+    if backend == "torch":
+        return {"model": EMBEDDING_MODEL}
+    if backend == "onnx-int8":
+        return {
+            "model": EMBEDDING_ONNX_MODEL,
+            "backend": "onnx",
+            "model_kwargs": {"file_name": EMBEDDING_ONNX_FILE, "provider": "CPUExecutionProvider"},
+        }
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+
+def build_text_embedder(backend: str = EMBEDDING_BACKEND, **kwargs) -> SentenceTransformersTextEmbedder:
+    return SentenceTransformersTextEmbedder(**embedder_kwargs(backend), **kwargs)
+
+
+def build_document_embedder(backend: str = EMBEDDING_BACKEND, **kwargs) -> SentenceTransformersDocumentEmbedder:
+    return SentenceTransformersDocumentEmbedder(**embedder_kwargs(backend), **kwargs)
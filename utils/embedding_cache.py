@@ -0,0 +1,116 @@
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from haystack import component
+
+
+@component
+class CachedTextEmbedder:
+    """
+    Bounded LRU cache in front of a text embedder.
+
+    Keys are the model identity (name, backend, model file) plus the question
+    with case and whitespace normalized, so repeated questions and reruns
+    skip the encoder. Lowercasing is safe for uncased models such as
+    all-MiniLM-L6-v2; pass `lowercase=False` for cased ones. With a `path`
+    the cache is loaded at start and written back every `save_every` new
+    entries and at exit, keeping only vectors of the current model.
+    """
+
+    def __init__(self, embedder, max_size: int = 1024, path: str | Path | None = None, save_every: int = 32,
+                 lowercase: bool = True):
+        self.embedder = embedder
+        self.max_size = max_size
+        self.path = Path(path) if path else None
+        self.save_every = save_every
+        self.lowercase = lowercase
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, list[float]] = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self._load()
+            atexit.register(self.save)
+
+    @property
+    def model_key(self) -> str:
+        model_kwargs = getattr(self.embedder, "model_kwargs", None) or {}
+        parts = (
+            getattr(self.embedder, "model", type(self.embedder).__name__),
+            getattr(self.embedder, "backend", "torch"),
+            model_kwargs.get("file_name", ""),
+            getattr(self.embedder, "prefix", ""),
+            getattr(self.embedder, "suffix", ""),
+        )
+        return "|".join(str(part) for part in parts)
+
+    def _key(self, text: str) -> str:
+        normalized = " ".join(text.split())
+        return normalized.lower() if self.lowercase else normalized
+
+    def warm_up(self):
+        if hasattr(self.embedder, "warm_up"):
+            self.embedder.warm_up()
+
+    @component.output_types(embedding=list[float])
+    def run(self, text: str):
+        key = self._key(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return {"embedding": embedding}
+            self.misses += 1
+
+        # Encode outside the lock, a concurrent miss on the same text just computes it twice
+        embedding = self.embedder.run(text=text)["embedding"]
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            save_now = self.path is not None and self._unsaved >= self.save_every
+        if save_now:
+            self.save()
+        return {"embedding": embedding}
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        # Vectors of another model or backend are not comparable, start empty
+        if data.get("model") != self.model_key:
+            return
+        for key, embedding in data.get("entries", [])[-self.max_size:]:
+            self._entries[key] = embedding
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            data = {"model": self.model_key, "entries": list(self._entries.items())}
+            self._unsaved = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,101 @@
+import datetime
+import decimal
+import numbers
+
+from haystack import component
+
+
+def _label(column: str) -> str:
+    label = str(column).replace("_", " ").strip()
+    # Unnamed expressions such as COUNT(*) come back as "count" or "?column?"
+    return "" if label in ("?column?", "") else label
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "none"
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, (float, decimal.Decimal)):
+        value = round(float(value), 2)
+        return str(int(value)) if value.is_integer() else str(value)
+    return str(value)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (numbers.Number, decimal.Decimal)) and not isinstance(value, bool)
+
+
+@component
+class AnswerShapeRouter:
+    """
+    Sits between error_router.results_ok and explain_prompt.
+
+    Classifies the shape of the first query result and, for simple shapes
+    (empty, scalar, single row, short list, small group-by), renders a
+    templated answer so the explainer LLM call is skipped. Anything else is
+    forwarded unchanged to the explainer. The detected shape is always
+    emitted so the fast path can be measured from the logs.
+    """
+
+    def __init__(self, enabled: bool = True, max_columns: int = 6, max_list_rows: int = 10, max_group_rows: int = 12):
+        self.enabled = enabled
+        self.max_columns = max_columns
+        self.max_list_rows = max_list_rows
+        self.max_group_rows = max_group_rows
+
+    def classify(self, columns: list, rows: list) -> str:
+        if not rows:
+            return "empty"
+        if len(columns) == 1 and len(rows) == 1:
+            return "scalar"
+        if len(rows) == 1 and len(columns) <= self.max_columns:
+            return "single_row"
+        if len(columns) == 1 and len(rows) <= self.max_list_rows:
+            return "list"
+        if len(columns) == 2 and len(rows) <= self.max_group_rows and all(_is_number(row[1]) for row in rows):
+            return "group_by"
+        return "complex"
+
+    def render(self, shape: str, columns: list, rows: list) -> str:
+        if shape == "empty":
+            return "No matching records were found."
+        if shape == "scalar":
+            label = _label(columns[0])
+            value = _format_value(rows[0][0])
+            return f"The {label} is {value}." if label else f"The result is {value}."
+        if shape == "single_row":
+            fields = "; ".join(f"{_label(c) or 'value'}: {_format_value(v)}" for c, v in zip(columns, rows[0]))
+            return f"Found one matching record - {fields}."
+        if shape == "list":
+            values = ", ".join(_format_value(row[0]) for row in rows)
+            label = _label(columns[0]) or "result"
+            return f"There are {len(rows)} {label} values: {values}."
+        if shape == "group_by":
+            pairs = ", ".join(f"{_format_value(key)}: {_format_value(value)}" for key, value in rows)
+            return f"{(_label(columns[1]) or 'Value').capitalize()} by {_label(columns[0]) or 'group'} - {pairs}."
+        raise ValueError(f"No template for result shape '{shape}'")
+
+    @component.output_types(answer=str, results=list[str], shape=dict)
+    def run(self, results: list[str], tables: list):
+        table = tables[0] if tables else None
+        if table is None or table.get("truncated"):
+            # Statements without a row set and truncated previews are left to the explainer
+            columns, rows, shape = [], [], "complex"
+        else:
+            columns, rows = table["columns"], table["rows"]
+            shape = self.classify(columns, rows)
+        fast_path = self.enabled and shape != "complex"
+        info = {
+            "shape": shape,
+            "fast_path": fast_path,
+            "rows": len(rows),
+            "columns": len(columns),
+            # Size of the result text the explainer prompt would have carried
+            "skipped_result_chars": len(results[0]) if fast_path and results else 0,
+        }
+        if fast_path:
+            return {"answer": self.render(shape, columns, rows), "shape": info}
+        return {"results": results, "shape": info}
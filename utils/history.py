@@ -0,0 +1,106 @@
+import re
+
+from haystack.dataclasses import ChatMessage
+
+ERROR_PREFIXES = ("Error:", "An error occurred")
+# Words and openings that refer back to an earlier turn ("and those from last month?");
+# "previous month" and the like are time windows, not references
+_FOLLOW_UP_RE = re.compile(
+    r"\b(those|them|these|they|their|above|previous(?! (?:day|week|month|quarter|year)s?\b)|earlier|same|instead|else"
+    r"|again|that one)\b"
+    r"|^(and|or|but|also|only|now|then|what about|how about)\b"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English and SQL)."""
+    return (len(text) + 3) // 4
+
+
+def refers_back(question: str) -> bool:
+    """True when the wording of the question points at an earlier turn ("those", "what about ...")."""
+    return _FOLLOW_UP_RE.search(" ".join(question.lower().split())) is not None
+
+
+def is_follow_up(question: str, earlier_turns) -> bool:
+    """
+    True when the question probably depends on the conversation before it,
+    so an answer keyed on the question alone (semantic cache) could be wrong.
+    The first question of a conversation never is.
+    """
+    return bool(earlier_turns) and refers_back(question)
+
+
+def _as_dict(message) -> dict:
+    if isinstance(message, ChatMessage):
+        return {"role": message.role.name.lower(), "content": message.text or "", "meta": message.meta}
+    return {"role": message.get("role", "user"), "content": message.get("content", ""), "meta": message.get("meta", {})}
+
+
+def _payload_tokens(payload: list[dict]) -> int:
+    # Mirrors the "Role: ... | Content: ..." lines of SQL_PROMPT_TEMPLATE
+    return sum(estimate_tokens(f"Role: {m['role']} | Content: {m['content']}") for m in payload)
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "..."
+
+
+def _compact_assistant(message: dict, max_chars: int) -> str:
+    """The SQL of the turn (what follow-up questions build on) plus a short version of the prose."""
+    sql = (message["meta"] or {}).get("sql")
+    content = message["content"]
+    if content.startswith(ERROR_PREFIXES):
+        # Tracebacks and driver messages only cost tokens, the failed SQL is enough
+        return f"SQL: {_shorten(sql, 4 * max_chars)} (failed)" if sql else "(error)"
+    answer = _shorten(content, max_chars)
+    return f"SQL: {_shorten(sql, 4 * max_chars)} | Answer: {answer}" if sql else answer
+
+
+def compact_history(chat_history, question: str | None = None, budget_tokens: int = 600, recent_turns: int = 4,
+                    max_assistant_chars: int = 200) -> tuple[list[dict], dict]:
+    """
+    Builds the `history` of the SQL prompt within `budget_tokens`.
+
+    Only the last `recent_turns` turns are kept, assistant replies are reduced
+    to their SQL (kept in ChatMessage.meta["sql"]) and a shortened answer, and
+    older turns are dropped until the estimate fits the budget. A trailing
+    user message equal to `question` is left out, the template shows it as the
+    latest question anyway. Returns the payload and before/after token counts.
+    """
+    messages = [_as_dict(m) for m in chat_history]
+    if question is not None and messages and messages[-1]["role"] == "user" and messages[-1]["content"] == question:
+        messages = messages[:-1]
+    tokens_before = _payload_tokens(messages)
+
+    # A turn starts at each user message
+    turns = []
+    for message in messages:
+        if message["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    turns_before = len(turns)
+    turns = turns[-recent_turns:] if recent_turns > 0 else []
+
+    compacted = []
+    for turn in turns:
+        compacted.append([
+            {"role": m["role"], "content": _compact_assistant(m, max_assistant_chars) if m["role"] != "user"
+             else _shorten(m["content"], 2 * max_assistant_chars)}
+            for m in turn
+        ])
+
+    # Oldest turns go first; the newest turn is kept even if it alone exceeds the budget
+    while len(compacted) > 1 and sum(_payload_tokens(turn) for turn in compacted) > budget_tokens:
+        compacted.pop(0)
+
+    payload = [message for turn in compacted for message in turn]
+    stats = {
+        "tokens_before": tokens_before,
+        "tokens_after": _payload_tokens(payload),
+        "turns_before": turns_before,
+        "turns_after": len(compacted),
+        "budget_tokens": budget_tokens,
+    }
+    return payload, stats
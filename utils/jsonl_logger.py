@@ -0,0 +1,151 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+_STOP = object()
+
+
+class AsyncJsonlLogger:
+    """
+    Appends records to a JSONL file from a background thread.
+
+    `log()` only snapshots the record and puts it on a queue; a writer thread
+    serializes records in batches and appends them to `path`. The active file
+    is rotated once it exceeds `max_bytes` or is older than `max_age_seconds`:
+    it is renamed to `<stem>-<timestamp>.jsonl` and gzipped next to it.
+
+    Bulky fields are kept within a budget before writing: dotted paths in
+    `drop_fields` (e.g. "chat_history" or "prompt.prompt") are removed, strings
+    longer than `max_field_chars` are trimmed and lists keep their last
+    `max_list_items` items.
+    """
+
+    def __init__(self, path: str | Path, serializer=None, max_bytes: int = 50_000_000,
+                 max_age_seconds: float = 86_400, batch_size: int = 50, flush_interval: float = 1.0,
+                 max_field_chars: int = 8_000, max_list_items: int = 20, drop_fields=(), max_queue: int = 10_000):
+        self.path = Path(path)
+        self.serializer = serializer
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_field_chars = max_field_chars
+        self.max_list_items = max_list_items
+        self.drop_fields = set(drop_fields)
+        # Records dropped because the queue was full (the writer can't keep up)
+        self.dropped = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._segment_started = time.time()
+        self._thread = threading.Thread(target=self._run, name="jsonl-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, record: dict):
+        """Queues a record; never blocks the caller."""
+        try:
+            self._queue.put_nowait(dict(record))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        """Flushes queued records and stops the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _trim(self, value, path: str = ""):
+        if isinstance(value, dict):
+            trimmed = {}
+            for key, item in value.items():
+                item_path = f"{path}.{key}" if path else str(key)
+                if item_path not in self.drop_fields:
+                    trimmed[key] = self._trim(item, item_path)
+            return trimmed
+        if isinstance(value, (list, tuple)):
+            items = list(value)
+            if len(items) > self.max_list_items:
+                items = items[-self.max_list_items:]
+            return [self._trim(item, path) for item in items]
+        if isinstance(value, str):
+            if len(value) > self.max_field_chars:
+                return value[:self.max_field_chars] + f"...[+{len(value) - self.max_field_chars} chars]"
+            return value
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if self.serializer is not None:
+            try:
+                return self._trim(self.serializer(value), path)
+            except TypeError:
+                pass
+        return str(value)
+
+    def _encode(self, record: dict) -> str:
+        return json.dumps(self._trim(record), ensure_ascii=False) + "\n"
+
+    def _should_rotate(self) -> bool:
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return False
+        if size == 0:
+            return False
+        return size >= self.max_bytes or time.time() - self._segment_started >= self.max_age_seconds
+
+    def _rotate(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        segment = self.path.with_name(f"{self.path.stem}-{stamp}{self.path.suffix}")
+        suffix = 1
+        while segment.exists() or Path(f"{segment}.gz").exists():
+            segment = self.path.with_name(f"{self.path.stem}-{stamp}-{suffix}{self.path.suffix}")
+            suffix += 1
+        os.replace(self.path, segment)
+        self._segment_started = time.time()
+        with open(segment, "rb") as src, gzip.open(f"{segment}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        segment.unlink()
+
+    def _write(self, batch: list[dict]):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self._encode(record))
+            except Exception:
+                # One unserializable record must not lose the rest of the batch
+                continue
+        if lines:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        if self._should_rotate():
+            self._rotate()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                if batch:
+                    self._write(batch)
+                elif self._should_rotate():
+                    self._rotate()
+            except Exception:
+                # Logging must never take the writer thread down
+                pass
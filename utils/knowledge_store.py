@@ -0,0 +1,100 @@
+from haystack import Document, component
+from haystack.utils import Secret
+from haystack_integrations.document_stores.pgvector import PgvectorDocumentStore
+from sqlalchemy import text
+
+from utils.config import HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, HNSW_M, KNOWLEDGE_TABLE, PGVECTOR_SEARCH_STRATEGY
+
+EMBEDDING_DIMENSION = 384
+# PgvectorDocumentStore's default name for the GIN index on `content`
+KEYWORD_INDEX_NAME = "haystack_keyword_index"
+
+
+def build_document_store(connection_string: Secret, table_name: str = KNOWLEDGE_TABLE, recreate_table: bool = False,
+                         search_strategy: str = PGVECTOR_SEARCH_STRATEGY, m: int = HNSW_M,
+                         ef_construction: int = HNSW_EF_CONSTRUCTION, ef_search: int = HNSW_EF_SEARCH,
+                         recreate_index: bool = False, keyword_index_name: str = KEYWORD_INDEX_NAME,
+                         manage_index: bool = True) -> PgvectorDocumentStore:
+    """
+    The pgvector store of the knowledge base, shared by the app and the indexing script.
+
+    With the "hnsw" strategy the store creates an HNSW index (cosine ops) on
+    the embedding column when it is missing, and every session it opens runs
+    with hnsw.ef_search set. `m` and `ef_construction` only apply when the
+    index is built, so changing them needs `recreate_index=True` (or a
+    recreated table). The index is named after the table, so several
+    knowledge tables can live in one schema. The keyword index keeps the
+    store's default name unless `keyword_index_name` is given; index names are
+    unique per schema, so a second table next to the live one needs its own.
+
+    The app passes `manage_index=False`: building an HNSW index on a real
+    table can take longer than the serving statement_timeout, so only
+    scripts/embed_knowledge.py creates it. The store then never touches the
+    index; the app retrieves through IndexedEmbeddingRetriever, which uses
+    it and sets hnsw.ef_search itself.
+    """
+    return PgvectorDocumentStore(
+        connection_string=connection_string,
+        table_name=table_name,
+        embedding_dimension=EMBEDDING_DIMENSION,
+        vector_function="cosine_similarity",
+        recreate_table=recreate_table,
+        # Only the "hnsw" strategy creates (or drops) the index when the store connects
+        search_strategy=search_strategy if manage_index else "exact_nearest_neighbor",
+        hnsw_recreate_index_if_exists=recreate_index,
+        hnsw_index_creation_kwargs={"m": m, "ef_construction": ef_construction},
+        hnsw_index_name=f"{table_name}_hnsw_index",
+        hnsw_ef_search=ef_search if search_strategy == "hnsw" and manage_index else None,
+        keyword_index_name=keyword_index_name,
+    )
+
+
+@component
+class IndexedEmbeddingRetriever:
+    """
+    Top-k cosine retrieval from the knowledge table that Postgres can answer
+    from the HNSW index.
+
+    PgvectorEmbeddingRetriever sorts on the store's computed score,
+    `1 - (embedding <=> q) DESC`, and pgvector only uses the index for an
+    ascending ORDER BY on the distance operator itself, so every query
+    scanned the whole table. Here the rows are ordered by `embedding <=> q`
+    and the score is the same cosine similarity. `ef_search` is set for each
+    query's transaction (None keeps the server default).
+    """
+
+    def __init__(self, engine, table_name: str = KNOWLEDGE_TABLE, top_k: int = 2, ef_search: int | None = HNSW_EF_SEARCH):
+        self._engine = engine
+        self.table_name = table_name
+        self.top_k = top_k
+        self.ef_search = ef_search
+
+    def _query(self, prefix: str = ""):
+        table_name = self._engine.dialect.identifier_preparer.quote(self.table_name)
+        return text(
+            f"{prefix}SELECT id, content, meta, embedding <=> CAST(:vector AS vector) AS distance FROM {table_name} "
+            "ORDER BY embedding <=> CAST(:vector AS vector) LIMIT :top_k"
+        )
+
+    def _execute(self, connection, query, query_embedding: list[float], top_k: int):
+        if self.ef_search:
+            # Local to the transaction, so the pooled connection goes back unchanged
+            connection.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(int(self.ef_search))})
+        vector = "[" + ",".join(str(float(x)) for x in query_embedding) + "]"
+        return connection.execute(query, {"vector": vector, "top_k": top_k})
+
+    def explain(self, query_embedding: list[float], top_k: int | None = None) -> list[str]:
+        """The plan of one retrieval, e.g. to check that it is an Index Scan on <table>_hnsw_index."""
+        with self._engine.connect() as connection:
+            result = self._execute(connection, self._query("EXPLAIN "), query_embedding, top_k or self.top_k)
+            return result.scalars().all()
+
+    @component.output_types(documents=list[Document])
+    def run(self, query_embedding: list[float], top_k: int | None = None):
+        with self._engine.connect() as connection:
+            rows = self._execute(connection, self._query(), query_embedding, top_k or self.top_k).fetchall()
+        documents = [
+            Document(id=doc_id, content=content, meta=meta or {}, score=1 - distance)
+            for doc_id, content, meta, distance in rows
+        ]
+        return {"documents": documents}
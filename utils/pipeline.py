@@ -0,0 +1,443 @@
+import re
+
+import pandas as pd
+from haystack import Pipeline, component, tracing
+from haystack.components.builders.prompt_builder import PromptBuilder
+from haystack.components.joiners import DocumentJoiner
+from haystack.components.retrievers import InMemoryBM25Retriever
+from haystack.components.routers import ConditionalRouter
+from haystack.dataclasses import StreamingChunk
+from haystack_integrations.components.generators.ollama import OllamaGenerator
+from sqlalchemy import text
+
+from template.prompt import EXPLAIN_PROMPT_TEMPLATE, SQL_PROMPT_TEMPLATES
+from utils.candidates import MultiCandidateGenerator
+from utils.config import (
+    TRACKED_TABLES, FAST_PATH_ENABLED, RETRIEVAL_MODE, MODEL_NAME,
+    SQL_PREVIEW_MAX_ROWS, SQL_PREVIEW_MAX_BYTES, SQL_FETCH_BATCH_SIZE,
+    RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_ROWS,
+    RESULT_CACHE_VOLATILE_TTL_SECONDS, RESULT_CACHE_VERSION_CHECK_INTERVAL,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_MAX_SIZE, EMBEDDING_CACHE_PATH, PROMPT_LAYOUT,
+    SQL_GUARD_ENABLED, SQL_GUARD_MAX_COST, SQL_GUARD_MAX_ROWS, SQL_GUARD_LIMIT_ROWS, SQL_STATEMENT_TIMEOUT_MS,
+    SQL_CANDIDATES, SQL_CANDIDATE_TEMPERATURES, PGVECTOR_SEARCH_STRATEGY, HNSW_EF_SEARCH,
+)
+from utils.embedders import build_text_embedder
+from utils.embedding_cache import CachedTextEmbedder
+from utils.fast_path import AnswerShapeRouter
+from utils.knowledge_store import IndexedEmbeddingRetriever
+from utils.result_cache import ResultCache
+from utils.retrieval import HybridRetriever
+from utils.sql_guard import CostGuard, QueryRejected
+
+SQL_FENCE_RE = re.compile(r"```(?:sql)?\s*(.*?)```", flags=re.S)
+
+
+def extract_sql(text: str) -> str:
+    m = SQL_FENCE_RE.search(text)
+    return m.group(1).strip() if m else text.strip()
+
+
+# Custom components
+@component
+class MDconverter:
+    def __init__(self):
+        pass
+    @component.output_types(str_queries = list[str])
+    def run(self, replies: list[str]):
+        str_queries = []
+        for text_reply in replies:
+            extracted = extract_sql(text_reply)
+            str_queries.append(extracted)
+        return {'str_queries': str_queries}
+
+
+def _clip_value(value, max_chars: int):
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "..."
+    return value
+
+
+@component
+class SQLQuery:
+    """
+    Executes the generated SQL and returns a bounded preview of each result.
+
+    Rows are read through a server-side cursor in batches. At most `max_rows`
+    rows and roughly `max_bytes` of cell text are kept for the UI and the
+    explainer; the remaining rows are only counted, so the exact row count is
+    still reported together with a `truncated` flag. The transaction is
+    always rolled back, so generated SQL never changes data.
+
+    With a `guard`, each query first goes through EXPLAIN in a read-only
+    transaction with a statement timeout; too expensive queries come back as
+    "SQL Error: Query rejected by cost guard: ..." and very large results
+    are capped with a LIMIT.
+    """
+    def __init__(self, engine, result_cache: ResultCache | None = None, max_rows: int = 200,
+                 max_bytes: int = 64_000, fetch_batch_size: int = 500, max_cell_chars: int = 500,
+                 guard: CostGuard | None = None):
+        self._engine = engine
+        # Optional cache of fetched rows, shared by all sessions through the cached pipeline
+        self.result_cache = result_cache
+        self.guard = guard
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.fetch_batch_size = fetch_batch_size
+        self.max_cell_chars = max_cell_chars
+        # No need to keep connection here, will manage in run function
+        # self.connection = self._engine.connect()
+
+    def _prepare_cache(self, query: str):
+        if self.result_cache is None:
+            return None
+        try:
+            return self.result_cache.prepare(query)
+        except Exception:
+            # A cache problem must never turn a valid query into an error
+            return None
+
+    def _fetch_bounded(self, cursor_result) -> dict:
+        columns = list(cursor_result.keys())
+        preview = []
+        used_bytes = 0
+        row_count = 0
+        truncated = False
+        while True:
+            batch = cursor_result.fetchmany(self.fetch_batch_size)
+            if not batch:
+                break
+            row_count += len(batch)
+            if truncated:
+                # Past the budget we only count, the rows are dropped right away
+                continue
+            for row in batch:
+                values = tuple(_clip_value(v, self.max_cell_chars) for v in row)
+                row_bytes = sum(len(str(v)) for v in values) + len(values)
+                if len(preview) >= self.max_rows or used_bytes + row_bytes > self.max_bytes:
+                    truncated = True
+                    break
+                preview.append(values)
+                used_bytes += row_bytes
+        return {"columns": columns, "rows": preview, "row_count": row_count, "truncated": truncated}
+
+    @staticmethod
+    def _render(table: dict) -> str:
+        text_result = pd.DataFrame(table["rows"], columns=table["columns"]).to_string()
+        if table.get("limited_to"):
+            text_result += f"\n... limited to the first {table['limited_to']} rows by the cost guard"
+        elif table["truncated"]:
+            text_result += f"\n... truncated: showing {len(table['rows'])} of {table['row_count']} rows"
+        return text_result
+
+    @component.output_types(results=list[str], queries = list[str], cached = list[bool], tables = list,
+                            row_counts = list, truncated = list[bool], guard = list)
+    def run(self, sql_queries: list[str]):
+        results = []
+        cached = []
+        # Preview of each result: columns, rows, exact row_count and truncated flag
+        # (None for errors and statements without rows)
+        tables = []
+        # Cost guard decision per query (None when it didn't run)
+        decisions = []
+        
+        for query in sql_queries:
+            decision = None
+            try:
+                canonical = self._prepare_cache(query)
+                hit = self.result_cache.get(canonical) if canonical else None
+                cached.append(hit is not None)
+                if hit is not None:
+                    results.append(self._render(hit))
+                    tables.append(hit)
+                    continue
+
+                # Read the markers before executing so a concurrent write can only make the entry stale
+                versions = self.result_cache.versions_for_write() if canonical else None
+
+                # Use 'with' to ensure connection is properly closed
+                with self._engine.connect() as connection:
+                    run_query = query
+                    if self.guard is not None:
+                        # Read-only + statement_timeout for this transaction, then the EXPLAIN check
+                        self.guard.begin(connection)
+                        decision = self.guard.check(connection, query)
+                        run_query = decision["sql"]
+                    # stream_results uses a server-side cursor, so rows arrive in batches instead of all at once
+                    connection = connection.execution_options(stream_results=True, max_row_buffer=self.fetch_batch_size)
+                    # Execute query and get results
+                    cursor_result = connection.execute(text(run_query))
+                    
+                    # Check if query returns rows (e.g., SELECT)
+                    if cursor_result.returns_rows:
+                        table = self._fetch_bounded(cursor_result)
+                        if decision and decision["action"] == "limited":
+                            table["limited_to"] = self.guard.limit_rows
+                            table["truncated"] = table["truncated"] or table["row_count"] >= self.guard.limit_rows
+                        results.append(self._render(table))
+                        tables.append(table)
+                        if canonical:
+                            self.result_cache.put(canonical, table, versions)
+                    else:
+                        # For queries that don't return rows (e.g., UPDATE, INSERT)
+                        results.append(f"Query executed successfully, {cursor_result.rowcount} rows affected.")
+                        tables.append(None)
+                    # Generated SQL never changes data, with or without the guard
+                    connection.rollback()
+
+            except QueryRejected as e:
+                results.append(f"SQL Error: Query rejected by cost guard: {e}")
+                tables.append(None)
+                decision = {"action": "rejected", "reason": str(e)}
+            except Exception as e:
+                results.append(f"SQL Error: {str(e)}")
+                tables.append(None)
+            finally:
+                decisions.append(decision)
+        return {
+            'results': results,
+            'queries': sql_queries,
+            'cached': cached,
+            'tables': tables,
+            'row_counts': [t["row_count"] if t else None for t in tables],
+            'truncated': [bool(t and t["truncated"]) for t in tables],
+            'guard': decisions,
+        }
+
+
+def build_sql_pipeline(engine, document_store, bm25_index, llm=None, llm_explainer=None,
+                       model_name: str = MODEL_NAME, result_cache_enabled: bool = RESULT_CACHE_ENABLED,
+                       embedding_cache_enabled: bool = EMBEDDING_CACHE_ENABLED, warm_up: bool = True) -> Pipeline:
+    """
+    Builds the text-to-SQL pipeline: hybrid retrieval, prompt, llm, converter,
+    router, sql_querier, error_router, answer_router and the explainer.
+
+    `llm` and `llm_explainer` default to OllamaGenerator with `model_name`;
+    any component with the same run() signature can be passed instead (the
+    benchmark uses a deterministic stand-in). `bm25_index` is a
+    SyncedBM25Index whose store backs the BM25 retriever. The result and
+    embedding caches can be turned off, e.g. so a benchmark measures every run.
+    """
+    # Full-precision PyTorch or quantized ONNX, selected by EMBEDDING_BACKEND
+    text_embedder = build_text_embedder()
+    if embedding_cache_enabled:
+        # Repeated questions and reruns reuse the stored vector instead of running the encoder
+        text_embedder = CachedTextEmbedder(
+            text_embedder,
+            max_size=EMBEDDING_CACHE_MAX_SIZE,
+            path=EMBEDDING_CACHE_PATH or None
+        )
+    
+    # Semantic retriever (reduced from 3 to 2 since we'll add BM25)
+    # Ordered by the distance operator so Postgres can answer it from the HNSW index
+    semantic_retriever = IndexedEmbeddingRetriever(
+        engine,
+        table_name=document_store.table_name,
+        top_k=2,
+        ef_search=HNSW_EF_SEARCH if PGVECTOR_SEARCH_STRATEGY == "hnsw" else None
+    )
+
+    # NEW: BM25 setup
+    # The index follows the pgvector table, each sync swaps the retriever's document store
+    bm25_retriever = bm25_index.attach(InMemoryBM25Retriever(
+        document_store=bm25_index.store,
+        top_k=2
+    ))
+    
+    # NEW: Joiner with deduplication
+    joiner = DocumentJoiner(
+        join_mode="reciprocal_rank_fusion",  # This already deduplicates by default
+        top_k=3,  # Limit final output to 3 documents
+        sort_by_score=True  # Ensure best documents come first
+    )
+
+    # Existing components
+    result_cache = None
+    if result_cache_enabled:
+        result_cache = ResultCache(
+            engine,
+            tables=TRACKED_TABLES,
+            max_entries=RESULT_CACHE_MAX_ENTRIES,
+            max_rows=RESULT_CACHE_MAX_ROWS,
+            volatile_ttl_seconds=RESULT_CACHE_VOLATILE_TTL_SECONDS,
+            version_check_interval=RESULT_CACHE_VERSION_CHECK_INTERVAL
+        )
+    guard = None
+    if SQL_GUARD_ENABLED:
+        guard = CostGuard(
+            max_cost=SQL_GUARD_MAX_COST,
+            max_rows=SQL_GUARD_MAX_ROWS,
+            limit_rows=SQL_GUARD_LIMIT_ROWS,
+            statement_timeout_ms=SQL_STATEMENT_TIMEOUT_MS
+        )
+    sql_query = SQLQuery(
+        engine,
+        result_cache=result_cache,
+        max_rows=SQL_PREVIEW_MAX_ROWS,
+        max_bytes=SQL_PREVIEW_MAX_BYTES,
+        fetch_batch_size=SQL_FETCH_BATCH_SIZE,
+        guard=guard
+    )
+    # PROMPT_LAYOUT=prefix_stable keeps the constant part of the prompt in front for Ollama's prompt cache
+    prompt = PromptBuilder(template=SQL_PROMPT_TEMPLATES[PROMPT_LAYOUT])
+    if llm is None:
+        llm = OllamaGenerator(model = model_name, keep_alive= -1)
+    if SQL_CANDIDATES > 1:
+        # Several concurrent replies, the first one that passes EXPLAIN is executed
+        llm = MultiCandidateGenerator(
+            llm,
+            engine,
+            sql_extractor=extract_sql,
+            n=SQL_CANDIDATES,
+            temperatures=SQL_CANDIDATE_TEMPERATURES,
+            max_cost=SQL_GUARD_MAX_COST if SQL_GUARD_ENABLED else None
+        )
+    converter = MDconverter()
+
+    answer_router = AnswerShapeRouter(enabled=FAST_PATH_ENABLED)
+    # 'result' is required so the explainer only runs when answer_router forwards a result
+    explain_prompt = PromptBuilder(template=EXPLAIN_PROMPT_TEMPLATE, required_variables=["result"])
+    if llm_explainer is None:
+        llm_explainer = OllamaGenerator(model= model_name)
+
+    routes = [
+        {
+            "condition": "{{'no_answer' not in str_queries[0].lower()}}",
+            "output": "{{[str_queries[0]]}}",
+            "output_name": "sql",
+            "output_type": list[str],
+        },
+        {
+            "condition": "{{'no_answer' in str_queries[0].lower()}}",
+            "output": "I cannot answer this question based on the available data. The database contains information about violations with columns for id, employee_name, department, violation_type, area, violation_time, and status. Please try asking a question related to these fields.",
+            "output_name": "no_answer",
+            "output_type": str,
+        },
+    ]
+    router = ConditionalRouter(routes)
+
+    error_routes = [
+        {
+            "condition": "{{'SQL Error:' in results[0]}}",
+            "output": "{{results[0]}}",
+            "output_name": "sql_error",
+            "output_type": str,
+        },
+        {
+            "condition": "{{'SQL Error:' not in results[0]}}",
+            "output": "{{results}}",
+            "output_name": "results_ok",
+            "output_type": list[str],
+        },
+    ]
+    error_router = ConditionalRouter(error_routes)
+
+    # Build pipeline
+    sql_pipeline = Pipeline()
+    
+    # Add RAG components
+    if RETRIEVAL_MODE == "concurrent":
+        # Both retrieval branches run at the same time inside one component
+        retrieval = HybridRetriever(text_embedder, semantic_retriever, bm25_retriever, joiner)
+        sql_pipeline.add_component('retrieval', retrieval)
+    else:
+        sql_pipeline.add_component('text_embedder', text_embedder)
+        sql_pipeline.add_component('semantic_retriever', semantic_retriever)
+        sql_pipeline.add_component('bm25_retriever', bm25_retriever)  # NEW
+        sql_pipeline.add_component('joiner', joiner)  # NEW
+    
+    # Add existing components
+    sql_pipeline.add_component('prompt', prompt)
+    sql_pipeline.add_component('llm', llm)
+    sql_pipeline.add_component('converter', converter)
+    sql_pipeline.add_component('router', router)
+    sql_pipeline.add_component('sql_querier', sql_query)
+    sql_pipeline.add_component('error_router', error_router)
+    sql_pipeline.add_component('answer_router', answer_router)
+    sql_pipeline.add_component('explain_prompt', explain_prompt)
+    sql_pipeline.add_component('llm_explainer', llm_explainer)
+
+    # Connect hybrid retrieval (MODIFIED)
+    if RETRIEVAL_MODE == "concurrent":
+        sql_pipeline.connect("retrieval.documents", "prompt.documents")
+    else:
+        sql_pipeline.connect("text_embedder.embedding", "semantic_retriever.query_embedding")
+        sql_pipeline.connect("semantic_retriever.documents", "joiner.documents")  # NEW
+        sql_pipeline.connect("bm25_retriever.documents", "joiner.documents")      # NEW
+        sql_pipeline.connect("joiner.documents", "prompt.documents")  # Changed from semantic_retriever
+
+    # Connect existing components
+    sql_pipeline.connect("prompt.prompt", "llm.prompt")
+    sql_pipeline.connect("llm.replies", "converter.replies")
+    sql_pipeline.connect("converter.str_queries", "router.str_queries")
+    sql_pipeline.connect("router.sql", "sql_querier.sql_queries")
+    sql_pipeline.connect("sql_querier.results", "error_router.results")
+    # Simple result shapes get a templated answer, the rest goes to the explainer
+    sql_pipeline.connect("error_router.results_ok", "answer_router.results")
+    sql_pipeline.connect("sql_querier.tables", "answer_router.tables")
+    sql_pipeline.connect("answer_router.results", "explain_prompt.result")
+    sql_pipeline.connect("explain_prompt.prompt", "llm_explainer.prompt")
+
+    # Load models up front so the semantic cache can embed questions before the first run
+    if warm_up:
+        sql_pipeline.warm_up()
+    return sql_pipeline
+
+
+def get_text_embedder(sql_pipeline):
+    """The question embedder, wherever the retrieval mode placed it."""
+    if RETRIEVAL_MODE == "concurrent":
+        return sql_pipeline.get_component("retrieval").text_embedder
+    return sql_pipeline.get_component("text_embedder")
+
+
+def retrieval_inputs(question, question_embedding=None):
+    if RETRIEVAL_MODE == "concurrent":
+        # Reuse the embedding computed for the semantic cache lookup
+        return {"retrieval": {"query": question, "query_embedding": question_embedding}}
+    return {
+        "text_embedder": {"text": question},
+        "bm25_retriever": {"query": question},  # NEW: Add BM25 query input
+    }
+
+
+RETRIEVAL_OUTPUTS = ["retrieval"] if RETRIEVAL_MODE == "concurrent" else ["joiner"]
+
+
+def _run_component(sql_pipeline, name: str, **inputs) -> dict:
+    """Runs one component of the pipeline on its own, traced like it is inside sql_pipeline.run."""
+    instance = sql_pipeline.get_component(name)
+    with tracing.tracer.trace(
+        "haystack.component.run",
+        tags={"haystack.component.name": name, "haystack.component.type": type(instance).__name__}
+    ) as span:
+        span.set_content_tag("haystack.component.input", inputs)
+        outputs = instance.run(**inputs)
+        span.set_content_tag("haystack.component.output", outputs)
+    return outputs
+
+
+def run_verified_sql(sql_pipeline, question, sql, stream_view=None):
+    """
+    Runs a template's SQL through the components that follow `router`, skipping
+    retrieval, prompt, llm and converter. The outputs have the same shape as
+    those of sql_pipeline.run, so the rest of the handler doesn't change.
+    """
+    result = {"router": {"sql": [sql]}}
+    if stream_view:
+        stream_view.on_sql_chunk(StreamingChunk(f"```sql\n{sql}\n```", {"done": True}))
+    queried = _run_component(sql_pipeline, "sql_querier", sql_queries=[sql])
+    result["sql_querier"] = queried
+    result["error_router"] = _run_component(sql_pipeline, "error_router", results=queried["results"])
+    if "results_ok" not in result["error_router"]:
+        return result
+    routed = _run_component(
+        sql_pipeline, "answer_router", results=result["error_router"]["results_ok"], tables=queried["tables"]
+    )
+    result["answer_router"] = routed
+    if "results" in routed:
+        result["explain_prompt"] = _run_component(sql_pipeline, "explain_prompt", question=question, result=routed["results"])
+        explainer_kwargs = {"streaming_callback": stream_view.on_answer_chunk} if stream_view else {}
+        result["llm_explainer"] = _run_component(
+            sql_pipeline, "llm_explainer", prompt=result["explain_prompt"]["prompt"], **explainer_kwargs
+        )
+    return result
@@ -0,0 +1,247 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+
+from utils.table_versions import get_table_versions
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^']|'')*')
+    |(?P<quoted>"(?:[^"]|"")*")
+    |(?P<number>\d+(?:\.\d+)?)
+    |(?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    |(?P<op>::|<=|>=|<>|!=|\|\||\S)
+    """,
+    re.S | re.X,
+)
+
+# Words that can follow a table reference without being an implicit alias
+_CLAUSE_WORDS = {
+    "where", "group", "order", "having", "limit", "offset", "join", "inner", "left",
+    "right", "full", "cross", "natural", "on", "using", "union", "intersect", "except",
+    "window", "fetch", "for", "lateral", "as", "tablesample",
+}
+
+# Functions whose value changes over time, so their results can't be reused indefinitely
+_VOLATILE_WORDS = {
+    "now", "current_date", "current_time", "current_timestamp", "localtime",
+    "localtimestamp", "clock_timestamp", "statement_timestamp", "transaction_timestamp",
+    "timeofday", "random",
+}
+
+
+def _tokenize(sql: str) -> list[tuple[str, str]]:
+    tokens = []
+    for m in _TOKEN_RE.finditer(sql):
+        kind = m.lastgroup
+        if kind == "comment":
+            continue
+        value = m.group()
+        if kind == "word":
+            value = value.lower()
+        tokens.append((kind, value))
+    # A trailing semicolon doesn't change the statement
+    while tokens and tokens[-1] == ("op", ";"):
+        tokens.pop()
+    return tokens
+
+
+def canonicalize_sql(sql: str, known_identifiers=frozenset()) -> dict:
+    """
+    Normalizes a SELECT so that whitespace, comments, keyword/identifier casing
+    and alias names don't change its cache key.
+
+    Aliases are renamed to positional placeholders (_a1, _a2, ...). An alias is
+    left untouched when its name is also a real table or column name
+    (`known_identifiers`), because renaming it would then also rename the
+    column it shadows and two different queries could share a key.
+
+    Returns {"key", "aliases" (placeholder -> original name), "tables", "volatile"}.
+    """
+    tokens = _tokenize(sql)
+
+    alias_names = []
+    tables = set()
+    # For each open parenthesis: was it a CAST(... AS type) call?
+    paren_is_cast = []
+    for i, (kind, value) in enumerate(tokens):
+        prev = tokens[i - 1][1] if i > 0 else None
+        if value == "(":
+            paren_is_cast.append(prev == "cast")
+        elif value == ")" and paren_is_cast:
+            paren_is_cast.pop()
+        elif kind in ("word", "quoted") and prev == "as":
+            in_cast = bool(paren_is_cast) and paren_is_cast[-1]
+            if not in_cast and value not in ("materialized", "not"):
+                alias_names.append(value)
+        elif kind == "word" and prev in ("from", "join"):
+            # Table reference, optionally schema-qualified
+            j = i
+            name = value
+            if j + 2 < len(tokens) and tokens[j + 1][1] == "." and tokens[j + 2][0] == "word":
+                j += 2
+                name = tokens[j][1]
+            tables.add(name)
+            nxt = tokens[j + 1] if j + 1 < len(tokens) else None
+            if nxt and nxt[0] in ("word", "quoted") and nxt[1] not in _CLAUSE_WORDS:
+                alias_names.append(nxt[1])
+
+    # CTE names are referenced like tables but are defined by the query itself
+    for i, (kind, value) in enumerate(tokens[:-2]):
+        if kind == "word" and tokens[i + 1][1] == "as" and tokens[i + 2][1] == "(":
+            tables.discard(value)
+
+    renames = {}
+    for name in alias_names:
+        bare = name.strip('"')
+        if name in renames or bare in known_identifiers:
+            continue
+        renames[name] = f"_a{len(renames) + 1}"
+
+    # A name followed by "(" is a function call (MAX(...) in `MAX(x) AS max`), never the alias
+    key = " ".join(
+        value if i + 1 < len(tokens) and tokens[i + 1][1] == "(" else renames.get(value, value)
+        for i, (_, value) in enumerate(tokens)
+    )
+    return {
+        "key": key,
+        "aliases": {placeholder: name.strip('"') for name, placeholder in renames.items()},
+        "tables": tables,
+        "volatile": any(kind == "word" and value in _VOLATILE_WORDS for kind, value in tokens),
+    }
+
+
+class ResultCache:
+    """
+    Caches fetched rows of read-only queries by their canonical SQL.
+
+    Entries are tagged with the version markers of the tables they read
+    (see utils/table_versions.py) and are discarded as soon as one of those
+    tables is written to. Queries that touch untracked tables are never cached;
+    queries using time functions such as NOW() only live for `volatile_ttl_seconds`.
+
+    The markers are memoized for `version_check_interval` seconds
+    (RESULT_CACHE_VERSION_CHECK_INTERVAL, 1 s by default), so a result can
+    still be served up to that long after a write; 0 re-reads them on every
+    lookup. The table/column names used by canonicalize_sql are re-read
+    whenever the markers change.
+    """
+
+    def __init__(self, engine, tables=("violations", "departments"), max_entries: int = 512,
+                 max_rows: int = 10000, volatile_ttl_seconds: float = 60.0,
+                 version_check_interval: float = 1.0):
+        self._engine = engine
+        self.tables = tuple(tables)
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.volatile_ttl_seconds = volatile_ttl_seconds
+        # Markers are re-read at most this often, so a burst of concurrent
+        # questions costs one round trip instead of one per query
+        self.version_check_interval = version_check_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = None
+        self._versions_read_at = 0.0
+        self._known_identifiers = None
+
+    def _current_versions(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            if self._versions is not None and now - self._versions_read_at < self.version_check_interval:
+                return self._versions
+        versions = dict(get_table_versions(self._engine, self.tables))
+        self._remember_versions(versions, now)
+        return versions
+
+    def _remember_versions(self, versions: dict, read_at: float):
+        with self._lock:
+            if self._versions is not None and versions != self._versions:
+                # Writes often come with migrations, re-read the identifiers on the next prepare()
+                self._known_identifiers = None
+            self._versions, self._versions_read_at = versions, read_at
+
+    def _identifiers(self) -> tuple[frozenset, frozenset]:
+        """Table names and all table/column names of the database, until the version markers change."""
+        known = self._known_identifiers
+        if known is None:
+            inspector = inspect(self._engine)
+            table_names = set(inspector.get_table_names())
+            names = set(table_names)
+            for table_name in table_names:
+                names.update(column["name"] for column in inspector.get_columns(table_name))
+            known = self._known_identifiers = (frozenset(table_names), frozenset(names))
+        return known
+
+    def prepare(self, sql: str) -> dict | None:
+        """Canonicalizes `sql`, returning None when the query must not be cached."""
+        table_names, identifiers = self._identifiers()
+        canonical = canonicalize_sql(sql, identifiers)
+        tokens = canonical["key"].split(" ")
+        if tokens[0] not in ("select", "with"):
+            return None
+        # Also catch tables listed after a comma in FROM, which the tokenizer doesn't track
+        canonical["tables"] |= table_names.intersection(tokens)
+        if not canonical["tables"] or not canonical["tables"].issubset(self.tables):
+            return None
+        return canonical
+
+    def get(self, canonical: dict) -> dict | None:
+        """Returns the cached table ({"columns", "rows", "row_count", "truncated"}) or None."""
+        versions = self._current_versions()
+        with self._lock:
+            entry = self._entries.get(canonical["key"])
+            if entry is not None:
+                stale = any(entry["versions"].get(t) != versions.get(t) for t in entry["versions"])
+                expired = entry["expires_at"] is not None and time.monotonic() > entry["expires_at"]
+                if stale or expired:
+                    del self._entries[canonical["key"]]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(canonical["key"])
+            self.hits += 1
+        # Stored column names use placeholders for aliases, map them back to this query's names
+        table = dict(entry["table"])
+        table["columns"] = [canonical["aliases"].get(c, c) for c in table["columns"]]
+        return table
+
+    def put(self, canonical: dict, table: dict, versions: dict):
+        """Stores a table fetched while the tables were at `versions` (read before executing)."""
+        if len(table["rows"]) > self.max_rows:
+            return
+        placeholders = {name: placeholder for placeholder, name in canonical["aliases"].items()}
+        expires_at = time.monotonic() + self.volatile_ttl_seconds if canonical["volatile"] else None
+        stored = dict(table)
+        stored["columns"] = [placeholders.get(c, c) for c in table["columns"]]
+        with self._lock:
+            self._entries[canonical["key"]] = {
+                "table": stored,
+                "versions": {t: versions.get(t) for t in canonical["tables"]},
+                "expires_at": expires_at,
+            }
+            self._entries.move_to_end(canonical["key"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions_for_write(self) -> dict:
+        """Version markers to tag a result with; always read fresh, never from the memo."""
+        versions = dict(get_table_versions(self._engine, self.tables))
+        self._remember_versions(versions, time.monotonic())
+        return versions
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from haystack import Document, component, tracing
+
+
+@component
+class HybridRetriever:
+    """
+    Runs the two hybrid retrieval branches at the same time and fuses them.
+
+    The semantic branch (text_embedder -> semantic_retriever) runs in the
+    calling thread while the BM25 branch runs on a worker thread; both result
+    lists are then passed to the joiner. Per-branch timings are returned so
+    the retrieval latency can be compared with the sum of the two branches.
+    """
+
+    def __init__(self, text_embedder, semantic_retriever, bm25_retriever, joiner, max_workers: int = 4):
+        self.text_embedder = text_embedder
+        self.semantic_retriever = semantic_retriever
+        self.bm25_retriever = bm25_retriever
+        self.joiner = joiner
+        # Shared by all sessions, one BM25 lookup per concurrent question
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bm25")
+
+    def warm_up(self):
+        for part in (self.text_embedder, self.semantic_retriever, self.bm25_retriever, self.joiner):
+            if hasattr(part, "warm_up"):
+                part.warm_up()
+
+    @staticmethod
+    def _span(name: str, part, parent_span=None):
+        """Child span of the `retrieval` component, so traces show each branch."""
+        return tracing.tracer.trace(
+            "haystack.component.run",
+            tags={"haystack.component.name": name, "haystack.component.type": type(part).__name__},
+            parent_span=parent_span
+        )
+
+    def _run_bm25(self, query: str, parent_span=None):
+        start = time.perf_counter()
+        # Worker thread: the span's parent has to be passed explicitly
+        with self._span("bm25_retriever", self.bm25_retriever, parent_span) as span:
+            documents = self.bm25_retriever.run(query=query)["documents"]
+            span.set_content_tag("haystack.component.output", {"documents": documents})
+        return documents, time.perf_counter() - start
+
+    @component.output_types(documents=list[Document], timings=dict)
+    def run(self, query: str, query_embedding: Optional[list[float]] = None):
+        start = time.perf_counter()
+        bm25_future = self._executor.submit(self._run_bm25, query, tracing.tracer.current_span())
+
+        embed_time = 0.0
+        if query_embedding is None:
+            embed_start = time.perf_counter()
+            with self._span("text_embedder", self.text_embedder):
+                query_embedding = self.text_embedder.run(text=query)["embedding"]
+            embed_time = time.perf_counter() - embed_start
+        search_start = time.perf_counter()
+        with self._span("semantic_retriever", self.semantic_retriever) as span:
+            semantic_docs = self.semantic_retriever.run(query_embedding=query_embedding)["documents"]
+            span.set_content_tag("haystack.component.output", {"documents": semantic_docs})
+        search_time = time.perf_counter() - search_start
+
+        bm25_docs, bm25_time = bm25_future.result()
+        branches_done = time.perf_counter()
+
+        with self._span("joiner", self.joiner) as span:
+            documents = self.joiner.run(documents=[semantic_docs, bm25_docs])["documents"]
+            span.set_content_tag("haystack.component.output", {"documents": documents})
+        end = time.perf_counter()
+
+        timings = {
+            "text_embedder": embed_time,
+            "semantic_retriever": search_time,
+            "semantic_branch": embed_time + search_time,
+            "bm25_retriever": bm25_time,
+            "bm25_branch": bm25_time,
+            # Wall time until both branches finished, ideally max() of the two branches
+            "branches_wall": branches_done - start,
+            "joiner": end - branches_done,
+            "total": end - start,
+        }
+        return {"documents": documents, "timings": timings}
@@ -0,0 +1,215 @@
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import inspect, text
+from sqlalchemy.sql import sqltypes
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_FINGERPRINT_SQL = text("""
+    SELECT md5(
+        coalesce((SELECT string_agg(table_name || '.' || column_name || ':' || data_type, ','
+                                    ORDER BY table_name, ordinal_position)
+                  FROM information_schema.columns WHERE table_schema = :schema), '')
+        || '|' ||
+        coalesce((SELECT string_agg(table_name || '.' || constraint_name, ','
+                                    ORDER BY table_name, constraint_name)
+                  FROM information_schema.table_constraints
+                  WHERE table_schema = :schema AND constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY')), '')
+    )
+""")
+
+
+def _stem(word: str) -> str:
+    # Crude plural folding, enough to match "employees" with employee_name
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _terms(value: str) -> set[str]:
+    return {_stem(word) for word in _WORD_RE.findall(str(value).lower())}
+
+
+@dataclass
+class ColumnInfo:
+    name: str
+    type: str
+    references: str | None = None
+    samples: list = field(default_factory=list)
+
+
+@dataclass
+class TableInfo:
+    name: str
+    columns: list[ColumnInfo]
+    primary_key: list[str]
+    # Tables this one points to or is pointed at by
+    neighbours: set[str] = field(default_factory=set)
+
+
+class SchemaCatalog:
+    """
+    Description of the database schema for the SQL prompt, built once and
+    kept until the DDL changes.
+
+    The catalog holds every table with its columns, types, primary and
+    foreign keys, plus a few distinct values of low-cardinality text columns
+    (e.g. statuses or department names). A fingerprint of
+    information_schema is compared at most every `check_interval` seconds and
+    the catalog is rebuilt when it differs (or after `max_age_seconds`, to
+    refresh the sample values).
+
+    `render(question)` only describes the tables whose name, columns or sample
+    values share words with the question, plus their foreign-key neighbours,
+    so the prompt grows with the question rather than with the schema.
+    """
+
+    def __init__(self, engine, schema: str = "public", exclude_tables=(), default_tables=(), max_tables: int = 4,
+                 max_columns: int = 12, sample_values: int = 8, sample_scan_rows: int = 10_000,
+                 check_interval: float = 30.0, max_age_seconds: float = 3600.0):
+        self._engine = engine
+        self.schema = schema
+        self.exclude_tables = set(exclude_tables)
+        self.default_tables = tuple(default_tables)
+        self.max_tables = max_tables
+        self.max_columns = max_columns
+        self.sample_values = sample_values
+        self.sample_scan_rows = sample_scan_rows
+        self.check_interval = check_interval
+        self.max_age_seconds = max_age_seconds
+
+        self._tables: dict[str, TableInfo] = {}
+        self._fingerprint = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def _current_fingerprint(self) -> str:
+        with self._engine.connect() as connection:
+            return connection.execute(_FINGERPRINT_SQL, {"schema": self.schema}).scalar_one()
+
+    def _samples(self, connection, table: str, column: str) -> list:
+        # Distinct values within the first rows only, so wide tables don't cost a full scan
+        query = text(
+            f'SELECT DISTINCT "{column}" FROM (SELECT "{column}" FROM "{self.schema}"."{table}" '
+            f'WHERE "{column}" IS NOT NULL LIMIT :scan) s LIMIT :limit'
+        )
+        values = connection.execute(query, {"scan": self.sample_scan_rows, "limit": self.sample_values + 1}).scalars().all()
+        # More distinct values than we would show means free text (names, messages), not an enumeration
+        return sorted(values) if len(values) <= self.sample_values else []
+
+    def _build(self) -> dict[str, TableInfo]:
+        inspector = inspect(self._engine)
+        tables = {}
+        with self._engine.connect() as connection:
+            for name in inspector.get_table_names(schema=self.schema):
+                if name in self.exclude_tables:
+                    continue
+                references = {}
+                neighbours = set()
+                for fk in inspector.get_foreign_keys(name, schema=self.schema):
+                    neighbours.add(fk["referred_table"])
+                    for local, remote in zip(fk["constrained_columns"], fk["referred_columns"]):
+                        references[local] = f"{fk['referred_table']}.{remote}"
+                columns = []
+                for column in inspector.get_columns(name, schema=self.schema):
+                    info = ColumnInfo(column["name"], str(column["type"]), references.get(column["name"]))
+                    if isinstance(column["type"], sqltypes.String) and info.references is None:
+                        info.samples = self._samples(connection, name, column["name"])
+                    columns.append(info)
+                primary_key = inspector.get_pk_constraint(name, schema=self.schema).get("constrained_columns") or []
+                tables[name] = TableInfo(name, columns, primary_key, neighbours)
+        # Foreign keys are navigable both ways
+        for table in tables.values():
+            for neighbour in list(table.neighbours):
+                if neighbour in tables:
+                    tables[neighbour].neighbours.add(table.name)
+        for table in tables.values():
+            table.neighbours &= set(tables)
+        return tables
+
+    def tables(self) -> dict[str, TableInfo]:
+        """The catalog, rebuilt first if the DDL fingerprint changed."""
+        now = time.monotonic()
+        with self._lock:
+            if self._tables and now - self._checked_at < self.check_interval:
+                return self._tables
+            fingerprint = self._current_fingerprint()
+            self._checked_at = now
+            if fingerprint != self._fingerprint or now - self._built_at > self.max_age_seconds:
+                self._tables = self._build()
+                self._fingerprint = fingerprint
+                self._built_at = now
+                self.rebuilds += 1
+            return self._tables
+
+    @staticmethod
+    def _score(table: TableInfo, words: set[str]) -> tuple[int, set[str]]:
+        score = 3 * len(_terms(table.name.replace("_", " ")) & words)
+        matched_columns = set()
+        for column in table.columns:
+            hits = 2 * len(_terms(column.name.replace("_", " ")) & words)
+            hits += sum(2 for value in column.samples if _terms(value) and _terms(value) <= words)
+            if hits:
+                matched_columns.add(column.name)
+                score += hits
+        return score, matched_columns
+
+    def select(self, question: str) -> dict[str, set[str]]:
+        """Relevant tables for the question, mapped to the columns the question mentions."""
+        tables = self.tables()
+        words = _terms(question)
+        scored = []
+        for table in tables.values():
+            score, matched = self._score(table, words)
+            if score:
+                scored.append((score, table.name, matched))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        selected = {name: matched for _, name, matched in scored[:self.max_tables]}
+        if not selected:
+            selected = {name: set() for name in self.default_tables if name in tables}
+        # Join partners, so a question about departments can still reach violations and vice versa
+        for name in list(selected):
+            for neighbour in sorted(tables[name].neighbours):
+                selected.setdefault(neighbour, set())
+        return selected
+
+    def _columns_for(self, table: TableInfo, matched: set[str]) -> list[ColumnInfo]:
+        if len(table.columns) <= self.max_columns:
+            return table.columns
+        keep = set(table.primary_key) | matched | {c.name for c in table.columns if c.references}
+        for column in table.columns:
+            if len(keep) >= self.max_columns:
+                break
+            keep.add(column.name)
+        return [c for c in table.columns if c.name in keep]
+
+    def render(self, question: str) -> tuple[str, list[str]]:
+        """The schema text for the prompt and the names of the tables it describes."""
+        tables = self.tables()
+        selected = self.select(question)
+        parts = []
+        for name, matched in selected.items():
+            table = tables[name]
+            columns = self._columns_for(table, matched)
+            schema_str = f'Table "{name}" has the following columns:\n'
+            for column in columns:
+                line = f"- {column.name} ({column.type})"
+                if column.name in table.primary_key:
+                    line += " primary key"
+                if column.references:
+                    line += f" references {column.references}"
+                if column.samples:
+                    line += " values: " + ", ".join(f"'{value}'" for value in column.samples)
+                schema_str += line + "\n"
+            if len(columns) < len(table.columns):
+                schema_str += f"- ... {len(table.columns) - len(columns)} more columns not shown\n"
+            parts.append(schema_str)
+        return "\n".join(parts), list(selected)
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class _CacheEntry:
+    question: str
+    embedding: np.ndarray
+    data_version: tuple
+    payload: dict
+    created_at: float
+    literals: frozenset = frozenset()
+
+
+def _normalize(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by the question embedding.
+
+    A lookup returns the stored pipeline outputs of the most similar cached
+    question when its cosine similarity reaches `threshold`, it was stored
+    under the same data version and with the same `literals` (the department,
+    status, date, ... values of the question, see TemplateStore.literals).
+    Questions that differ only in such a value embed almost identically, the
+    literals keep them apart. Entries are evicted least-recently-used once
+    `max_size` is reached, after `ttl_seconds`, or as soon as the data version
+    they were computed against is no longer current.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_size: int = 256, ttl_seconds: float = 3600.0):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    def _evict(self, now: float, data_version: tuple):
+        expired = [
+            key for key, entry in self._entries.items()
+            if now - entry.created_at > self.ttl_seconds or entry.data_version != data_version
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, embedding, data_version: tuple, literals: frozenset = frozenset()) -> dict | None:
+        """Returns {"question", "similarity", "payload"} for a hit, otherwise None."""
+        query = _normalize(embedding)
+        with self._lock:
+            self._evict(time.time(), data_version)
+
+            best_key, best_similarity = None, -1.0
+            for key, entry in self._entries.items():
+                if entry.literals != literals:
+                    continue
+                similarity = float(np.dot(query, entry.embedding))
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None or best_similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self._entries[best_key]
+            return {"question": entry.question, "similarity": best_similarity, "payload": entry.payload}
+
+    def store(self, question: str, embedding, data_version: tuple, payload: dict, literals: frozenset = frozenset()):
+        key = self._key(question)
+        with self._lock:
+            self._entries[key] = _CacheEntry(
+                question=question,
+                embedding=_normalize(embedding),
+                data_version=data_version,
+                payload=payload,
+                created_at=time.time(),
+                literals=frozenset(literals),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,84 @@
+import json
+import re
+import threading
+
+from sqlalchemy import text
+
+_TRAILING_LIMIT_RE = re.compile(r"\b(limit\s+\d+|fetch\s+(first|next)\s+\d+\s+rows?\s+only)(\s+offset\s+\d+)?\s*$", re.I)
+
+
+class QueryRejected(Exception):
+    """Raised by CostGuard.check for a query that must not run."""
+
+
+class CostGuard:
+    """
+    Pre-flight check of generated SQL based on the planner's estimates.
+
+    `check()` runs EXPLAIN (FORMAT JSON) inside the caller's transaction and
+    looks at the total cost and the estimated row count of the plan. A query
+    over `max_cost` is rejected. A query estimated to return more than
+    `max_rows` rows without a LIMIT of its own is wrapped in one, so Postgres
+    can stop early (or use a top-N sort) instead of producing every row.
+    `begin()` makes the transaction read-only with a local statement_timeout,
+    which also covers the execution that follows.
+    """
+
+    def __init__(self, max_cost: float = 1_000_000.0, max_rows: int = 100_000, limit_rows: int = 1_000,
+                 statement_timeout_ms: int = 10_000):
+        self.max_cost = max_cost
+        self.max_rows = max_rows
+        self.limit_rows = limit_rows
+        self.statement_timeout_ms = statement_timeout_ms
+        self._lock = threading.Lock()
+        self.counts = {"checked": 0, "allowed": 0, "limited": 0, "rejected": 0}
+
+    def begin(self, connection):
+        """First statements of the transaction that runs the query."""
+        connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+        if self.statement_timeout_ms:
+            connection.execute(
+                text("SELECT set_config('statement_timeout', :timeout, true)"),
+                {"timeout": str(int(self.statement_timeout_ms))}
+            )
+
+    @staticmethod
+    def _estimate(connection, sql: str) -> tuple[float, float]:
+        plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+        return float(root["Total Cost"]), float(root["Plan Rows"])
+
+    def _count(self, decision: str):
+        with self._lock:
+            self.counts["checked"] += 1
+            self.counts[decision] += 1
+
+    def check(self, connection, sql: str) -> dict:
+        """
+        Returns {"action", "sql", "cost", "rows"} with the SQL to execute, where
+        action is "allowed" or "limited". Raises QueryRejected when the query
+        is too expensive; EXPLAIN errors (syntax, unknown columns) propagate.
+        """
+        statement = sql.strip().rstrip(";").strip()
+        cost, rows = self._estimate(connection, statement)
+        decision = {"action": "allowed", "sql": statement, "cost": cost, "rows": rows}
+
+        if rows > self.max_rows and not _TRAILING_LIMIT_RE.search(statement):
+            limited = f"SELECT * FROM (\n{statement}\n) AS guarded LIMIT {int(self.limit_rows)}"
+            cost, _ = self._estimate(connection, limited)
+            decision.update(action="limited", sql=limited, cost=cost)
+
+        if cost > self.max_cost:
+            self._count("rejected")
+            raise QueryRejected(
+                f"estimated cost {cost:,.0f} exceeds the limit of {self.max_cost:,.0f} "
+                f"(about {rows:,.0f} rows). Add filters or aggregate the data."
+            )
+        self._count(decision["action"])
+        return decision
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
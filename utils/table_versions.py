@@ -0,0 +1,38 @@
+from sqlalchemy import text
+
+
+def get_table_versions(engine, tables) -> tuple:
+    """
+    Returns a cheap change marker for each table, in the order given.
+
+    The markers come from the 'table_versions' table, which statement-level
+    triggers bump on every INSERT/UPDATE/DELETE/TRUNCATE (see scripts/setup_db.py).
+    On databases created before those triggers existed we fall back to the
+    write counters in pg_stat_user_tables, which may lag by up to a second.
+    """
+    tables = list(tables)
+    with engine.connect() as connection:
+        has_version_table = connection.execute(
+            text("SELECT to_regclass('public.table_versions') IS NOT NULL")
+        ).scalar_one()
+
+        if has_version_table:
+            rows = connection.execute(
+                text("SELECT table_name, version FROM public.table_versions WHERE table_name = ANY(:tables)"),
+                {"tables": tables}
+            ).fetchall()
+        else:
+            rows = connection.execute(
+                text(
+                    """
+                    SELECT relname, n_tup_ins + n_tup_upd + n_tup_del
+                    FROM pg_stat_user_tables
+                    WHERE schemaname = 'public' AND relname = ANY(:tables)
+                    """
+                ),
+                {"tables": tables}
+            ).fetchall()
+
+    versions = {name: version for name, version in rows}
+    # Tables that were never written to have no row yet, treat them as version 0
+    return tuple((name, int(versions.get(name) or 0)) for name in tables)
@@ -0,0 +1,313 @@
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import text
+
+from utils.history import refers_back
+
+_QUOTES_RE = re.compile(r"[\"“”‘’`]")
+_PLACEHOLDER_RE = re.compile(r"\[(\w+)\]")
+# Quoted text, numbers and dates, runs of capitalized words
+_ENTITY_RE = re.compile(
+    r"[\"“”`]([^\"“”`]+)[\"“”`]"
+    r"|(?<!\w)'([^']+)'(?!\w)"
+    r"|(?<![\w.])(\d+(?:[./:-]\d+)*)"
+    r"|\b([A-Z][\w-]*(?:\s+[A-Z][\w-]*)*)"
+)
+
+
+def _normalize(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _phrase_re(phrase: str) -> re.Pattern:
+    # Whole words, spaces match any whitespace, and a plural "s"/"es" is accepted
+    words = r"\s+".join(re.escape(word) for word in phrase.lower().split())
+    return re.compile(rf"(?<!\w){words}(?:e?s)?(?!\w)")
+
+
+def _contains(question: str, phrase: str) -> bool:
+    return _phrase_re(phrase).search(question) is not None
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(_QUOTES_RE.sub("", question).lower().split())
+
+
+def question_entities(question: str) -> list[str]:
+    """
+    Literal values that can be spotted without a vocabulary, lowercased:
+    quoted text, numbers and dates, and capitalized words (names, places)
+    except the first word of a sentence.
+    """
+    entities = []
+    for m in _ENTITY_RE.finditer(question):
+        quoted, single_quoted, number, capitalized = m.groups()
+        if capitalized:
+            words = capitalized.split()
+            if not question[:m.start()].strip() or question[:m.start()].rstrip()[-1] in ".?!":
+                words = words[1:]
+            capitalized = " ".join(w for w in words if w != "I")
+        value = quoted or single_quoted or number or capitalized
+        if value and value.strip():
+            entities.append(" ".join(value.lower().split()))
+    return entities
+
+
+def _quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+@dataclass
+class SqlTemplate:
+    id: str
+    sql: str
+    questions: list[str]
+    keywords: list[list[str]]
+    allow: set[str]
+    slots: set[str]
+    embeddings: np.ndarray | None = None
+
+
+@dataclass
+class _Slot:
+    name: str
+    kind: str
+    # Lowercase phrase -> value put into the SQL (a literal, or a condition for kind "condition")
+    phrases: dict[str, str] = field(default_factory=dict)
+    source: dict | None = None
+
+
+class TemplateStore:
+    """
+    Verified question -> SQL templates that answer recurring questions
+    without the LLM.
+
+    Templates and slot vocabularies come from a JSON file (see
+    data/sql_templates.json). Slot values are recognized in the question by
+    phrase: literal slots (department, status, ...) take their values from
+    the database plus synonyms, condition slots (the time window) map a
+    phrase to a fixed SQL condition. The recognized phrases are replaced by
+    their slot name, e.g. "How many violations are in [status] status?", and
+    that text is compared with the example questions of each template.
+
+    `match()` only returns a template when the question doesn't refer back
+    to an earlier turn, has no name, number, date or quoted value that no
+    slot recognized (question_entities), its keyword groups all occur in
+    the question, every slot it needs was found exactly once, the question
+    has no slot or modifier word ("by", "not", "at least", ...) the template
+    would ignore, and the embedding similarity reaches `threshold`. Anything
+    less goes to the LLM as before. Values are quoted into the SQL, they can
+    only come from the database or the file.
+    """
+
+    def __init__(self, path: str | Path, embedder, engine=None, threshold: float = 0.82,
+                 refresh_interval: float = 300.0, max_slot_values: int = 200):
+        self.path = Path(path)
+        self.embedder = embedder
+        self._engine = engine
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.max_slot_values = max_slot_values
+        self._lock = threading.Lock()
+        self._loaded_values_at = None
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_template: dict[str, int] = {}
+        self.miss_reasons: dict[str, int] = {}
+
+        with open(self.path, encoding="utf-8") as f:
+            spec = json.load(f)
+        self.slots = {
+            name: _Slot(
+                name=name,
+                kind=slot.get("kind", "literal"),
+                phrases={phrase.lower(): value for phrase, value in {**slot.get("values", {}), **slot.get("synonyms", {})}.items()},
+                source=slot.get("source"),
+            )
+            for name, slot in spec.get("slots", {}).items()
+        }
+        self.modifiers = [m.lower() for m in spec.get("modifiers", [])]
+        self.templates = []
+        for item in spec.get("templates", []):
+            slots = set(re.findall(r"\{(\w+)\}", item["sql"]))
+            unknown = slots - set(self.slots)
+            if unknown:
+                raise ValueError(f"Template '{item['id']}' uses unknown slots: {', '.join(sorted(unknown))}")
+            self.templates.append(SqlTemplate(
+                id=item["id"],
+                sql=item["sql"],
+                questions=item["questions"],
+                keywords=[[k.lower() for k in group] for group in item.get("keywords", [])],
+                allow={a.lower() for a in item.get("allow", [])},
+                slots=slots,
+            ))
+
+    def _load_slot_values(self):
+        """Literal slot values from their source columns, refreshed every `refresh_interval` seconds."""
+        now = time.time()
+        if self._engine is None or (self._loaded_values_at is not None and now - self._loaded_values_at < self.refresh_interval):
+            return
+        quote = self._engine.dialect.identifier_preparer.quote
+        with self._engine.connect() as connection:
+            for slot in self.slots.values():
+                if not slot.source:
+                    continue
+                table, column = quote(slot.source["table"]), quote(slot.source["column"])
+                values = connection.execute(
+                    text(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT :limit"),
+                    {"limit": self.max_slot_values}
+                ).scalars().all()
+                for value in values:
+                    slot.phrases.setdefault(str(value).lower(), str(value))
+        self._loaded_values_at = now
+
+    def _embed_templates(self):
+        for template in self.templates:
+            if template.embeddings is None:
+                template.embeddings = np.stack([
+                    _normalize(self.embedder.run(text=question)["embedding"]) for question in template.questions
+                ])
+
+    def warm_up(self):
+        with self._lock:
+            self._load_slot_values()
+            self._embed_templates()
+
+    def _find_slots(self, question: str) -> tuple[dict[str, set[str]], str]:
+        """Slot values mentioned in the question, and the question with each mention replaced by [slot]."""
+        mentions = []
+        for slot in self.slots.values():
+            for phrase, value in slot.phrases.items():
+                for m in _phrase_re(phrase).finditer(question):
+                    mentions.append((m.start(), m.end(), slot.name, value))
+        # Longest mentions win, so "logistics hub" (area) is not also read as "logistics" (department)
+        mentions.sort(key=lambda m: (m[0] - m[1], m[0]))
+        taken, found = [], {}
+        for start, end, name, value in mentions:
+            if any(start < t_end and t_start < end for t_start, t_end, _ in taken):
+                continue
+            taken.append((start, end, name))
+            found.setdefault(name, set()).add(value)
+        masked = question
+        for start, end, name in sorted(taken, reverse=True):
+            masked = masked[:start] + f"[{name}]" + masked[end:]
+        return found, masked
+
+    @staticmethod
+    def _unknown_values(question: str, masked: str) -> list[str]:
+        """question_entities() still present after the slot values were masked."""
+        return [e for e in question_entities(question) if _contains(masked, e)]
+
+    def literals(self, question: str) -> frozenset[str]:
+        """
+        The values the question is about: its slot values ("department=Logistics")
+        plus the question_entities() that no slot recognized. Questions with
+        different literals ask for different rows however similar they read.
+        """
+        with self._lock:
+            self._load_slot_values()
+            found, masked = self._find_slots(_normalize_question(question))
+        values = {f"{name}={value}" for name, slot_values in found.items() for value in slot_values}
+        return frozenset(values | set(self._unknown_values(question, masked)))
+
+    def _rejection(self, template: SqlTemplate, found: dict[str, set[str]], masked: str) -> str | None:
+        """None if the template covers the question, otherwise why not."""
+        if set(found) - template.slots:
+            return "extra_slot"
+        if template.slots - set(found):
+            return "missing_slot"
+        if any(len(found[name]) > 1 for name in template.slots):
+            return "ambiguous_slot"
+        plain = _PLACEHOLDER_RE.sub(" ", masked)
+        if any(_contains(plain, modifier) for modifier in self.modifiers if modifier not in template.allow):
+            return "modifier"
+        return None
+
+    def _render(self, template: SqlTemplate, found: dict[str, set[str]]) -> tuple[str, dict]:
+        values = {name: next(iter(found[name])) for name in template.slots}
+        rendered = {
+            name: value if self.slots[name].kind == "condition" else _quote_literal(value)
+            for name, value in values.items()
+        }
+        return template.sql.format(**rendered), values
+
+    def _miss(self, reason: str, **details) -> dict:
+        self.misses += 1
+        self.miss_reasons[reason] = self.miss_reasons.get(reason, 0) + 1
+        return {"hit": False, "reason": reason, **details}
+
+    def match(self, question: str, question_embedding=None) -> dict:
+        """
+        Returns {"hit": True, "template", "sql", "slots", "similarity", "matched_question"}
+        for a confident match, otherwise {"hit": False, "reason", ...}.
+        `question_embedding` of the unmodified question is reused when no slot was found.
+        """
+        original, question = question, _normalize_question(question)
+        with self._lock:
+            self._load_slot_values()
+            self._embed_templates()
+
+            # Same detection as the semantic cache's follow-up check (utils/history.py)
+            if refers_back(question):
+                return self._miss("follow_up")
+            found, masked = self._find_slots(question)
+            # An employee name, a year, ... that no slot handles would be silently dropped from the SQL
+            unknown = self._unknown_values(original, masked)
+            if unknown:
+                return self._miss("unknown_value", values=unknown)
+            plain = _PLACEHOLDER_RE.sub(" ", masked)
+            candidates = [
+                t for t in self.templates
+                if all(any(_contains(plain, keyword) for keyword in group) for group in t.keywords)
+            ]
+            if not candidates:
+                return self._miss("keywords")
+
+            if masked == question and question_embedding is not None:
+                query = _normalize(question_embedding)
+            else:
+                query = _normalize(self.embedder.run(text=masked)["embedding"])
+            scored = sorted(
+                ((float(np.max(t.embeddings @ query)), t) for t in candidates),
+                key=lambda item: item[0], reverse=True
+            )
+            valid = [(similarity, t) for similarity, t in scored if self._rejection(t, found, masked) is None]
+            if not valid:
+                similarity, nearest = scored[0]
+                return self._miss(self._rejection(nearest, found, masked), nearest=nearest.id, similarity=similarity)
+            similarity, template = valid[0]
+            if similarity < self.threshold:
+                return self._miss("low_similarity", nearest=template.id, similarity=similarity)
+
+            sql, values = self._render(template, found)
+            self.hits += 1
+            self.hits_by_template[template.id] = self.hits_by_template.get(template.id, 0) + 1
+            best = int(np.argmax(template.embeddings @ query))
+            return {
+                "hit": True,
+                "template": template.id,
+                "sql": sql,
+                "slots": values,
+                "similarity": similarity,
+                "matched_question": template.questions[best],
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "size": len(self.templates),
+                "hits_by_template": dict(self.hits_by_template),
+                "miss_reasons": dict(self.miss_reasons),
+            }
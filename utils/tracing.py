@@ -0,0 +1,182 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+from haystack.tracing import Span, Tracer
+from haystack.tracing.tracer import NullSpan
+
+_current_span = contextvars.ContextVar("llm_sql_current_span", default=None)
+_active_trace = contextvars.ContextVar("llm_sql_active_trace", default=None)
+
+
+def _sizes(values) -> dict:
+    """Length of each str/list/dict socket value, the content itself is not kept."""
+    if not isinstance(values, dict):
+        return {}
+    return {key: len(value) for key, value in values.items() if isinstance(value, (str, list, tuple, dict))}
+
+
+def _tokens(outputs) -> dict:
+    """Token counts and Ollama's own timings from the `meta` output of a generator."""
+    metas = outputs.get("meta") if isinstance(outputs, dict) else None
+    if not isinstance(metas, list):
+        return {}
+    tokens = {}
+    for meta in metas:
+        if not isinstance(meta, dict):
+            continue
+        usage = meta.get("usage") or {}
+        for key, name in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+            if usage.get(key) is not None:
+                tokens[name] = tokens.get(name, 0) + usage[key]
+        for key, name in (("prompt_eval_duration", "prefill_ms"), ("eval_duration", "generate_ms")):
+            if meta.get(key):
+                tokens[name] = tokens.get(name, 0.0) + meta[key] / 1e6
+    return tokens
+
+
+class RecordedSpan(Span):
+    def __init__(self, trace: "Trace", name: str, operation: str, parent: "RecordedSpan | None", tags: dict | None):
+        self.trace = trace
+        self.operation = operation
+        self.parent = parent
+        self.tags = dict(tags or {})
+        self.name = trace.unique_name(name)
+        self.thread = threading.current_thread().name
+        self.inputs: dict = {}
+        self.outputs: dict = {}
+        self.tokens: dict = {}
+        self.error = None
+        self.start = self.end = 0.0
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+
+    def set_content_tag(self, key, value):
+        # Sizes instead of content, so spans stay small and don't leak questions or rows
+        if key == "haystack.component.input":
+            self.inputs = _sizes(value)
+        elif key == "haystack.component.output":
+            self.outputs = _sizes(value)
+            self.tokens = _tokens(value)
+
+    def to_dict(self) -> dict:
+        record = {
+            "parent": self.parent.name if self.parent else None,
+            "type": self.tags.get("haystack.component.type"),
+            "start_ms": round(1000 * (self.start - self.trace.origin), 2),
+            "ms": round(1000 * (self.end - self.start), 2),
+            "thread": self.thread,
+        }
+        for key in ("inputs", "outputs", "tokens", "error"):
+            if getattr(self, key):
+                record[key] = getattr(self, key)
+        return record
+
+
+class Trace:
+    """Spans of one question, collected between start_trace() and finish_trace()."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.spans: list[RecordedSpan] = []
+        self._names: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def unique_name(self, name: str) -> str:
+        # Components that run more than once (or nested spans of the same name) get "#2", "#3", ...
+        with self._lock:
+            count = self._names.get(name, 0) + 1
+            self._names[name] = count
+        return name if count == 1 else f"{name}#{count}"
+
+    def add(self, span: RecordedSpan):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        """Compact form for results.jsonl: spans keyed by name, times relative to `started_at`."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {"started_at": self.started_at, "spans": {span.name: span.to_dict() for span in spans}}
+
+
+class SpanRecorder(Tracer):
+    """
+    Haystack tracer that keeps the spans of the current question in memory.
+
+    Once enabled with haystack.tracing.enable_tracing, every pipeline run and
+    component run inside `start_trace()` / `finish_trace()` becomes a span with
+    its start and duration, the sizes of its inputs and outputs (never the
+    content) and, for generators, token counts. Code outside the pipeline can
+    add spans with `tracing.tracer.trace(name)`; work on other threads passes
+    `parent_span` explicitly (see HybridRetriever). Outside a trace no span is
+    recorded.
+    """
+
+    def start_trace(self) -> Trace:
+        trace = Trace()
+        _active_trace.set(trace)
+        _current_span.set(None)
+        return trace
+
+    def finish_trace(self, trace: Trace) -> dict:
+        if _active_trace.get() is trace:
+            _active_trace.set(None)
+        return trace.to_dict()
+
+    @contextlib.contextmanager
+    def trace(self, operation_name, tags=None, parent_span=None):
+        parent = parent_span if isinstance(parent_span, RecordedSpan) else _current_span.get()
+        trace = parent.trace if parent is not None else _active_trace.get()
+        if trace is None:
+            yield NullSpan()
+            return
+        tags = tags or {}
+        # "haystack.pipeline.run" -> "pipeline", component spans by component name
+        name = tags.get("haystack.component.name") or operation_name.removeprefix("haystack.").removesuffix(".run")
+        span = RecordedSpan(trace, name, operation_name, parent, tags)
+        token = _current_span.set(span)
+        span.start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+            trace.add(span)
+
+    def current_span(self):
+        return _current_span.get()
+
+
+def chrome_trace_events(trace: dict, pid: int, label: str) -> list[dict]:
+    """
+    Converts a Trace.to_dict() record into Chrome trace events (one process
+    per question, one thread row per Python thread). The resulting
+    {"traceEvents": [...]} file opens in Perfetto or chrome://tracing.
+    """
+    events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": label}}]
+    threads = {}
+    origin_us = trace["started_at"] * 1e6
+    for name, span in trace.get("spans", {}).items():
+        if span["thread"] not in threads:
+            threads[span["thread"]] = len(threads) + 1
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": threads[span["thread"]],
+                           "args": {"name": span["thread"]}})
+        args = {key: span[key] for key in ("type", "parent", "inputs", "outputs", "tokens", "error") if span.get(key)}
+        events.append({
+            "name": name,
+            "cat": span.get("type") or "span",
+            "ph": "X",
+            "ts": origin_us + 1000 * span["start_ms"],
+            "dur": 1000 * span["ms"],
+            "pid": pid,
+            "tid": threads[span["thread"]],
+            "args": args,
+        })
+    return events